@@ -6,13 +6,24 @@ Extrae TODA la estructura, datos y lógica de negocio
 """
 
 import json
+import sys
 from datetime import datetime
+from pathlib import Path
 
-import openpyxl
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from keyword_scanner import KeywordScanner
+from workbook_session import open_session
+
+# Palabras clave por categoría: un solo escáner para todas las pasadas
+KEYWORDS = KeywordScanner({
+    'bancos': ['bóveda', 'utilidades', 'flete', 'azteca', 'leftie', 'profit', 'banco'],
+    'formulas': ['SUMIF', 'SUMIFS', 'ADEUDO', 'DEUDA', 'ESTATUS', 'PENDIENTE', 'PAGADO', 'ABONO'],
+})
 
 
 def analizar_excel_completo():
-    wb = openpyxl.load_workbook('Administación_General.xlsx', data_only=False)
+    wb = open_session('Administación_General.xlsx').workbook(data_only=False)
 
     print('=' * 80)
     print('ANÁLISIS ULTRA PROFUNDO DEL EXCEL - EXTRACCIÓN COMPLETA DE LÓGICA')
@@ -130,18 +141,16 @@ def analizar_excel_completo():
     print('\n### 4. IDENTIFICAR BANCOS ###')
     if 'DATA' in wb.sheetnames:
         ws_data = wb['DATA']
-        bancos_keywords = ['bóveda', 'utilidades', 'flete', 'azteca', 'leftie', 'profit', 'banco']
 
         for row in ws_data.iter_rows(max_row=50):
             for cell in row:
                 if cell.value and isinstance(cell.value, str):
-                    for keyword in bancos_keywords:
-                        if keyword in cell.value.lower():
-                            resultado['bancos'].append({
-                                'nombre': cell.value,
-                                'celda': cell.coordinate,
-                                'keyword': keyword
-                            })
+                    for keyword in KEYWORDS.found(cell.value, 'bancos'):
+                        resultado['bancos'].append({
+                            'nombre': cell.value,
+                            'celda': cell.coordinate,
+                            'keyword': keyword
+                        })
 
     print(f'Bancos identificados: {len(resultado["bancos"])}')
     for banco in resultado['bancos']:
@@ -149,14 +158,11 @@ def analizar_excel_completo():
 
     # 5. EXTRAER FÓRMULAS CRÍTICAS
     print('\n### 5. FÓRMULAS CRÍTICAS ###')
-    keywords_formulas = ['SUMIF', 'SUMIFS', 'ADEUDO', 'DEUDA', 'ESTATUS', 'PENDIENTE', 'PAGADO', 'ABONO']
-
     for sheet in wb.worksheets:
         for row in sheet.iter_rows():
             for cell in row:
                 if cell.data_type == 'f' and cell.value:
-                    formula = str(cell.value).upper()
-                    if any(keyword in formula for keyword in keywords_formulas):
+                    if KEYWORDS.matches(str(cell.value), 'formulas'):
                         resultado['formulas_criticas'].append({
                             'sheet': sheet.title,
                             'celda': cell.coordinate,
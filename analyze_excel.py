@@ -5,10 +5,24 @@ Análisis del archivo Excel de Administración General
 """
 
 import json
+import sys
 from pathlib import Path
 
-import openpyxl
-import pandas as pd
+from openpyxl.utils.cell import get_column_letter
+
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from keyword_scanner import KeywordScanner
+from workbook_session import open_session
+
+# Palabras clave de lógica de negocio (la primera que aparece en la celda, en este orden)
+BUSINESS_KEYWORDS = [
+    'total', 'costo', 'precio', 'venta', 'compra', 'ganancia', 'margen',
+    'capital', 'banco', 'utilidad', 'gasto', 'ingreso', 'adeudo', 'deuda',
+    'inventario', 'stock', 'cantidad', 'producto', 'cliente', 'proveedor',
+    'distribuidor', 'orden', 'transferencia', 'ventas', 'fletes'
+]
+KEYWORDS = KeywordScanner({'negocio': BUSINESS_KEYWORDS})
 
 
 def analyze_excel(file_path):
@@ -18,8 +32,8 @@ def analyze_excel(file_path):
     print("ANÁLISIS DEL ARCHIVO EXCEL - ADMINISTRACIÓN GENERAL")
     print("="*80)
 
-    # Cargar el archivo Excel
-    workbook = openpyxl.load_workbook(file_path, data_only=False)
+    # Cargar el archivo Excel una sola vez (valores, fórmulas y DataFrames por hoja)
+    session = open_session(file_path)
 
     analysis = {
         'sheets': [],
@@ -29,12 +43,12 @@ def analyze_excel(file_path):
     }
 
     # Analizar cada hoja
-    for sheet_name in workbook.sheetnames:
+    for sheet_name in session.sheetnames:
         print(f"\n{'='*80}")
         print(f"HOJA: {sheet_name}")
         print(f"{'='*80}\n")
 
-        sheet = workbook[sheet_name]
+        sheet = session.snapshot(sheet_name)
         sheet_info = {
             'name': sheet_name,
             'dimensions': f"{sheet.min_row}:{sheet.max_row}, {sheet.min_column}:{sheet.max_column}",
@@ -45,7 +59,7 @@ def analyze_excel(file_path):
 
         # Leer con pandas para ver estructura
         try:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
+            df = session.frame(sheet_name)
             print(f"Dimensiones: {df.shape[0]} filas x {df.shape[1]} columnas")
             print(f"\nColumnas encontradas:")
             for col in df.columns:
@@ -68,17 +82,15 @@ def analyze_excel(file_path):
         print(f"{'='*80}\n")
 
         formula_count = 0
-        for row in sheet.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                    formula = {
-                        'cell': cell.coordinate,
-                        'formula': cell.value,
-                        'value': cell.value
-                    }
-                    sheet_info['formulas'].append(formula)
-                    print(f"  {cell.coordinate}: {cell.value}")
-                    formula_count += 1
+        for coordinate, text in sheet.formulas:
+            formula = {
+                'cell': coordinate,
+                'formula': text,
+                'value': text
+            }
+            sheet_info['formulas'].append(formula)
+            print(f"  {coordinate}: {text}")
+            formula_count += 1
 
         if formula_count == 0:
             print("  No se encontraron fórmulas en esta hoja")
@@ -90,27 +102,22 @@ def analyze_excel(file_path):
         print("ANÁLISIS DE LÓGICA DE NEGOCIO:")
         print(f"{'='*80}\n")
 
-        # Buscar celdas con palabras clave
-        keywords = [
-            'total', 'costo', 'precio', 'venta', 'compra', 'ganancia', 'margen',
-            'capital', 'banco', 'utilidad', 'gasto', 'ingreso', 'adeudo', 'deuda',
-            'inventario', 'stock', 'cantidad', 'producto', 'cliente', 'proveedor',
-            'distribuidor', 'orden', 'transferencia', 'ventas', 'fletes'
-        ]
-
+        # Buscar celdas con palabras clave (una pasada por celda para todas las palabras)
+        # Texto de cada celda como en el libro: la fórmula si la tiene, si no su valor
+        formula_text = dict(sheet.formulas)
         business_cells = []
-        for row in sheet.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str):
-                    cell_lower = str(cell.value).lower()
-                    for keyword in keywords:
-                        if keyword in cell_lower:
-                            business_cells.append({
-                                'cell': cell.coordinate,
-                                'keyword': keyword,
-                                'value': cell.value
-                            })
-                            break
+        for row_idx, row in enumerate(sheet.rows, start=1):
+            for col_idx, value in enumerate(row, start=1):
+                coordinate = f"{get_column_letter(col_idx)}{row_idx}"
+                value = formula_text.get(coordinate, value)
+                if value and isinstance(value, str):
+                    keyword = KEYWORDS.first(value, 'negocio')
+                    if keyword:
+                        business_cells.append({
+                            'cell': coordinate,
+                            'keyword': keyword,
+                            'value': value
+                        })
 
         if business_cells:
             print("Celdas relevantes para lógica de negocio:")
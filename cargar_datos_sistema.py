@@ -1,9 +1,16 @@
 import json
 import sys
 from datetime import datetime
+from pathlib import Path
+
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from dataset_store import DatasetStore
 
 sys.stdout.reconfigure(encoding='utf-8')
 
+SISTEMA_PATH = r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json'
+
 print('CARGANDO DATOS COMPLETOS EN EL SISTEMA')
 print('='*80)
 
@@ -11,9 +18,10 @@ print('='*80)
 with open('datos_excel_completos.json', 'r', encoding='utf-8') as f:
     datos_excel = json.load(f)
 
-# Cargar sistema actual
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'r', encoding='utf-8') as f:
-    sistema = json.load(f)
+# Sistema actual: sólo su índice de claves; los cambios van al registro de cambios
+store = DatasetStore(SISTEMA_PATH)
+if store.replayed_ops:
+    print(f'⚠️  excel_data.json cambió: {store.replayed_ops} cambios sin compactar reaplicados sobre él')
 
 # ==============================================================================
 # 1. CARGAR BANCOS COMPLETOS
@@ -57,7 +65,7 @@ for nombre_banco, datos_banco in datos_excel['bancos'].items():
         'estado': 'negativo' if datos_banco['saldoActual'] < 0 else 'activo'
     }
 
-sistema['bancos'] = bancos_sistema
+store.set('bancos', bancos_sistema)
 print(f'\n  ✓ {len(bancos_sistema)} bancos cargados completamente')
 
 # ==============================================================================
@@ -89,12 +97,12 @@ for salida in almacen_data['salidas']:
         'destino': salida['cliente']
     })
 
-sistema['almacen'] = {
+store.set('almacen', {
     'stockActual': almacen_data['stockActual'],
     'totalEntradas': almacen_data['totalEntradas'],
     'totalSalidas': almacen_data['totalSalidas'],
     'movimientos': movimientos_almacen
-}
+})
 
 print(f'  ✓ Stock actual: {almacen_data["stockActual"]} unidades')
 print(f'  ✓ {len(movimientos_almacen)} movimientos cargados')
@@ -107,40 +115,28 @@ print('\n📋 CARGANDO DISTRIBUIDORES CON DEUDAS...')
 # Crear mapa de distribuidores del Excel
 distribuidores_excel = {d['nombre']: d for d in datos_excel['distribuidores']}
 
-# Actualizar distribuidores existentes o crear nuevos
-distribuidores_sistema = sistema.get('distribuidores', [])
-distribuidores_actualizados = []
-
-# Actualizar existentes
-for dist in distribuidores_sistema:
-    if dist['nombre'] in distribuidores_excel:
-        datos_excel_dist = distribuidores_excel[dist['nombre']]
-        dist['totalComprado'] = datos_excel_dist['costoTotal']
-        dist['totalPagado'] = datos_excel_dist['abonos']
-        dist['adeudo'] = datos_excel_dist['deuda']
-        print(f'  ✓ {dist["nombre"]}: Deuda ${dist["adeudo"]:,.0f}')
-        distribuidores_actualizados.append(dist)
-        del distribuidores_excel[dist['nombre']]
-    else:
-        distribuidores_actualizados.append(dist)
-
-# Agregar distribuidores nuevos del Excel
+# Upsert por nombre: actualizar existentes o crear nuevos
 for nombre, datos in distribuidores_excel.items():
-    nuevo_dist = {
-        'id': f'DIST-{len(distribuidores_actualizados) + 1:03d}',
-        'nombre': nombre,
-        'totalComprado': datos['costoTotal'],
-        'totalPagado': datos['abonos'],
-        'adeudo': datos['deuda'],
-        'ordenesCompra': 0,
-        'estado': 'activo',
-        'ordenes': [],
-        'pagos': []
-    }
-    distribuidores_actualizados.append(nuevo_dist)
-    print(f'  + {nombre}: Deuda ${datos["deuda"]:,.0f}')
-
-sistema['distribuidores'] = distribuidores_actualizados
+    if store.exists('distribuidores', nombre):
+        store.upsert('distribuidores', nombre, update={
+            'totalComprado': datos['costoTotal'],
+            'totalPagado': datos['abonos'],
+            'adeudo': datos['deuda']
+        })
+        print(f'  ✓ {nombre}: Deuda ${datos["deuda"]:,.0f}')
+    else:
+        store.upsert('distribuidores', nombre, insert={
+            'id': f'DIST-{store.count("distribuidores") + 1:03d}',
+            'nombre': nombre,
+            'totalComprado': datos['costoTotal'],
+            'totalPagado': datos['abonos'],
+            'adeudo': datos['deuda'],
+            'ordenesCompra': 0,
+            'estado': 'activo',
+            'ordenes': [],
+            'pagos': []
+        })
+        print(f'  + {nombre}: Deuda ${datos["deuda"]:,.0f}')
 
 # ==============================================================================
 # 4. ACTUALIZAR ÓRDENES DE COMPRA
@@ -163,7 +159,7 @@ for oc in datos_excel['ordenesCompra']:
     }
     compras_sistema.append(compra)
 
-sistema['compras'] = compras_sistema
+store.set('compras', compras_sistema)
 print(f'  ✓ {len(compras_sistema)} órdenes de compra cargadas')
 
 # ==============================================================================
@@ -172,60 +168,53 @@ print(f'  ✓ {len(compras_sistema)} órdenes de compra cargadas')
 print('\n👥 ACTUALIZANDO CLIENTES...')
 
 clientes_excel = {c['nombre']: c for c in datos_excel['clientes']}
-clientes_sistema = sistema.get('clientes', [])
-clientes_actualizados = []
-
-for cli in clientes_sistema:
-    if cli['nombre'] in clientes_excel:
-        datos_cli = clientes_excel[cli['nombre']]
-        cli['totalComprado'] = datos_cli['deuda']
-        cli['totalAbonado'] = datos_cli['abonos']
-        cli['adeudo'] = datos_cli['pendiente']
-        cli['estado'] = 'activo' if datos_cli['pendiente'] > 0 else 'saldado'
-        if datos_cli['observaciones']:
-            cli['observaciones'] = datos_cli['observaciones']
-        clientes_actualizados.append(cli)
-        del clientes_excel[cli['nombre']]
-    else:
-        clientes_actualizados.append(cli)
 
-# Agregar clientes nuevos
+# Upsert por nombre: actualizar existentes o agregar nuevos
 for nombre, datos in clientes_excel.items():
-    nuevo_cli = {
-        'id': f'CLI-{len(clientes_actualizados) + 1:03d}',
-        'nombre': nombre,
-        'totalComprado': datos['deuda'],
-        'totalAbonado': datos['abonos'],
-        'adeudo': datos['pendiente'],
-        'estado': 'activo' if datos['pendiente'] > 0 else 'saldado',
-        'observaciones': datos['observaciones'],
-        'ventas': []
-    }
-    clientes_actualizados.append(nuevo_cli)
+    estado = 'activo' if datos['pendiente'] > 0 else 'saldado'
+    if store.exists('clientes', nombre):
+        actualizacion = {
+            'totalComprado': datos['deuda'],
+            'totalAbonado': datos['abonos'],
+            'adeudo': datos['pendiente'],
+            'estado': estado
+        }
+        if datos['observaciones']:
+            actualizacion['observaciones'] = datos['observaciones']
+        store.upsert('clientes', nombre, update=actualizacion)
+    else:
+        store.upsert('clientes', nombre, insert={
+            'id': f'CLI-{store.count("clientes") + 1:03d}',
+            'nombre': nombre,
+            'totalComprado': datos['deuda'],
+            'totalAbonado': datos['abonos'],
+            'adeudo': datos['pendiente'],
+            'estado': estado,
+            'observaciones': datos['observaciones'],
+            'ventas': []
+        })
 
-sistema['clientes'] = clientes_actualizados
-print(f'  ✓ {len(clientes_actualizados)} clientes actualizados')
+print(f'  ✓ {store.count("clientes")} clientes actualizados')
 
 # ==============================================================================
 # 6. ACTUALIZAR METADATOS
 # ==============================================================================
-sistema['ultimaActualizacion'] = datetime.now().isoformat()
-sistema['version'] = '3.0-excel-completo'
-sistema['estado'] = 'sincronizado-excel'
+store.set('ultimaActualizacion', datetime.now().isoformat())
+store.set('version', '3.0-excel-completo')
+store.set('estado', 'sincronizado-excel')
 
 # ==============================================================================
 # 7. GUARDAR SISTEMA ACTUALIZADO
 # ==============================================================================
 print('\n💾 GUARDANDO SISTEMA ACTUALIZADO...')
 
-# Backup
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.backup.json', 'w', encoding='utf-8') as f:
-    json.dump(sistema, f, ensure_ascii=False, indent=2)
-print('  ✓ Backup creado')
-
-# Guardar
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'w', encoding='utf-8') as f:
-    json.dump(sistema, f, ensure_ascii=False, indent=2)
+# El frontend sólo lee el snapshot: se compacta al terminar (con backup).
+# Con --sin-compactar los cambios quedan en el registro hasta superar el
+# umbral, para corridas repetidas o en lote
+if store.commit(compact=None if '--sin-compactar' in sys.argv else True):
+    print('  ✓ Snapshot compactado (backup: excel_data.backup.json)')
+else:
+    print(f'  ✓ Cambios registrados ({store.pending_ops()} pendientes de compactar: el frontend no los ve hasta entonces)')
 print('  ✓ Sistema actualizado')
 
 # ==============================================================================
@@ -244,12 +233,12 @@ print(f'   - Stock: {almacen_data["stockActual"]} unidades')
 print(f'   - Movimientos: {len(movimientos_almacen)}')
 
 print(f'\n📋 DISTRIBUIDORES:')
-for dist in distribuidores_actualizados:
-    if dist['adeudo'] > 0:
-        print(f'   - {dist["nombre"]}: ${dist["adeudo"]:,.0f}')
+for nombre, datos in distribuidores_excel.items():
+    if datos['deuda'] > 0:
+        print(f'   - {nombre}: ${datos["deuda"]:,.0f}')
 
 print(f'\n🛒 COMPRAS: {len(compras_sistema)} órdenes')
-print(f'👥 CLIENTES: {len(clientes_actualizados)} clientes')
-print(f'📊 VENTAS: {len(sistema.get("ventas", []))} ventas')
+print(f'👥 CLIENTES: {store.count("clientes")} clientes')
+print(f'📊 VENTAS: {store.count("ventas")} ventas')
 
 print(f'\n🎯 SISTEMA LISTO PARA USAR!')
@@ -1,12 +1,17 @@
-import openpyxl
 import json
 import sys
 from datetime import datetime
+from pathlib import Path
+
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from sheet_extent import data_rows
+from workbook_session import open_session
 
 sys.stdout.reconfigure(encoding='utf-8')
 
 excel_path = r'C:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx'
-wb = openpyxl.load_workbook(excel_path, data_only=True)
+wb = open_session(excel_path).workbook(data_only=True)
 
 print('EXTRACCIÓN COMPLETA DEL EXCEL')
 print('='*80)
@@ -131,7 +136,7 @@ for hoja_nombre, config in bancos_config.items():
 
     # Extraer ingresos
     ingresos = []
-    for row in range(4, min(ws.max_row + 1, 200)):  # Limitar a 200 filas
+    for row in data_rows(ws, 4, config['col_ingreso_fecha']):
         fecha = ws.cell(row, config['col_ingreso_fecha']).value
         monto = ws.cell(row, config['col_ingreso_monto']).value
 
@@ -146,7 +151,7 @@ for hoja_nombre, config in bancos_config.items():
 
     # Extraer gastos
     gastos = []
-    for row in range(4, min(ws.max_row + 1, 200)):
+    for row in data_rows(ws, 4, config['col_gasto_fecha']):
         fecha = ws.cell(row, config['col_gasto_fecha']).value
         monto = ws.cell(row, config['col_gasto_monto']).value
 
@@ -182,7 +187,7 @@ rf_almacen = ws_almacen.cell(2, 5).value or 0
 
 # Entradas
 entradas = []
-for row in range(4, min(ws_almacen.max_row + 1, 100)):
+for row in data_rows(ws_almacen, 4, 1):
     oc = ws_almacen.cell(row, 1).value
     if oc and str(oc).startswith('OC'):
         entrada = {
@@ -195,7 +200,7 @@ for row in range(4, min(ws_almacen.max_row + 1, 100)):
 
 # Salidas
 salidas = []
-for row in range(4, min(ws_almacen.max_row + 1, 150)):
+for row in data_rows(ws_almacen, 4, 8):
     cliente = ws_almacen.cell(row, 8).value
     cantidad = ws_almacen.cell(row, 9).value
     if cliente and cantidad:
@@ -226,7 +231,7 @@ ws_dist = wb['Distribuidores']
 distribuidores = []
 
 # Leer columnas 13-16 (Distribuidores, Costo total, Abonos, Pendiente)
-for row in range(4, min(ws_dist.max_row + 1, 50)):
+for row in data_rows(ws_dist, 4, 13):
     nombre = ws_dist.cell(row, 13).value  # Columna M
     costo_total = ws_dist.cell(row, 14).value  # Columna N
     abonos = ws_dist.cell(row, 15).value  # Columna O
@@ -244,7 +249,7 @@ for row in range(4, min(ws_dist.max_row + 1, 50)):
 
 # También extraer las OCs
 ocs = []
-for row in range(4, min(ws_dist.max_row + 1, 50)):
+for row in data_rows(ws_dist, 4, 1):
     oc = ws_dist.cell(row, 1).value
     if oc and str(oc).startswith('OC'):
         oc_data = {
@@ -270,7 +275,7 @@ print('\n👥 EXTRAYENDO CLIENTES...')
 ws_clientes = wb['Clientes']
 clientes = []
 
-for row in range(4, min(ws_clientes.max_row + 1, 100)):
+for row in data_rows(ws_clientes, 4, 5):
     nombre = ws_clientes.cell(row, 5).value
     if nombre and str(nombre).strip() and nombre != 'Primo':
         cliente = {
@@ -294,7 +299,7 @@ print('\n📊 EXTRAYENDO VENTAS...')
 ws_ventas = wb['Control_Maestro']
 ventas = []
 
-for row in range(4, min(ws_ventas.max_row + 1, 150)):
+for row in data_rows(ws_ventas, 4, 1):
     fecha = ws_ventas.cell(row, 1).value
     if fecha:
         venta = {
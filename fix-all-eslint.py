@@ -2,38 +2,51 @@
 """
 Script Quirúrgico para Arreglar TODOS los Errores ESLint
 Fixes: imports no usados, variables, console.log, array keys, etc.
+Los archivos se procesan en paralelo y los que no cambiaron desde la última
+corrida se saltan (caché en .codemodcache/).
 """
 
 import re
-import os
+import sys
 from pathlib import Path
 
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+
+from codemod_runner import DEFAULT_WORKERS, CodemodRunner, source_files, totals
+
 # Configuración
 SRC_DIR = Path("c:/Users/xpovo/Documents/premium-ecosystem/src")
+CACHE_DIR = SRC_DIR.parent / '.codemodcache'
 DRY_RUN = False  # Cambiar a True para solo ver cambios
-
-# Estadísticas
-stats = {
-    "files_processed": 0,
-    "imports_removed": 0,
-    "consoles_removed": 0,
-    "unused_vars_fixed": 0,
-    "array_keys_fixed": 0,
-    "deps_fixed": 0
-}
+WORKERS = DEFAULT_WORKERS
+
+# Patrones compilados una sola vez para todos los archivos
+REACT_MEMBER = re.compile(r'\bReact\.')
+REACT_WITH_NAMED = re.compile(r"import\s+React\s*,\s*\{")
+REACT_DEFAULT = re.compile(r"import\s+React\s+from")
+REACT_DEFAULT_LINE = re.compile(r"import\s+React\s+from\s+['\"]react['\"];?\n")
+CONSOLE_LINE = re.compile(r'^\s*(console\.(log|warn|error|info|debug)\([^)]*\);?)\s*$', re.MULTILINE)
+UNUSED_VARS = [
+    (re.compile(r'\bappName\b'), '_appName'),
+    (re.compile(r'\bappColor\b'), '_appColor'),
+    (re.compile(r'\bidx\b'), '_idx'),
+    (re.compile(r'\blists\b'), '_lists'),
+]
+INDEX_KEY = re.compile(r'key=\{(index|i|idx)\}')
 
 def remove_unused_imports(content, filepath):
     """Elimina imports no usados de React y componentes"""
     changes = 0
 
     # Remover 'React' si no se usa JSX.createElement o React.
-    if "import React" in content and not re.search(r'\bReact\.', content):
+    if "import React" in content and not REACT_MEMBER.search(content):
         # Solo si hay otros imports en la misma línea
-        if re.search(r"import\s+React\s*,\s*\{", content):
-            content = re.sub(r"import\s+React\s*,\s*\{", "import {", content)
+        if REACT_WITH_NAMED.search(content):
+            content = REACT_WITH_NAMED.sub("import {", content)
             changes += 1
-        elif re.search(r"import\s+React\s+from", content):
-            content = re.sub(r"import\s+React\s+from\s+['\"]react['\"];?\n", "", content)
+        elif REACT_DEFAULT.search(content):
+            content = REACT_DEFAULT_LINE.sub("", content)
             changes += 1
 
     return content, changes
@@ -43,7 +56,6 @@ def remove_console_logs(content):
     changes = 0
 
     # Comentar console.log en lugar de eliminar (para debugging)
-    pattern = r'^\s*(console\.(log|warn|error|info|debug)\([^)]*\);?)\s*$'
 
     def replace_console(match):
         nonlocal changes
@@ -51,7 +63,7 @@ def remove_console_logs(content):
         indent = len(match.group(0)) - len(match.group(0).lstrip())
         return ' ' * indent + '// ' + match.group(1)
 
-    content = re.sub(pattern, replace_console, content, flags=re.MULTILINE)
+    content = CONSOLE_LINE.sub(replace_console, content)
 
     return content, changes
 
@@ -60,16 +72,9 @@ def fix_unused_vars(content):
     changes = 0
 
     # Parámetros de función no usados
-    patterns = [
-        (r'\bappName\b', '_appName'),
-        (r'\bappColor\b', '_appColor'),
-        (r'\bidx\b', '_idx'),
-        (r'\blists\b', '_lists'),
-    ]
-
-    for pattern, replacement in patterns:
-        if re.search(pattern, content):
-            content = re.sub(pattern, replacement, content)
+    for pattern, replacement in UNUSED_VARS:
+        if pattern.search(content):
+            content = pattern.sub(replacement, content)
             changes += 1
 
     return content, changes
@@ -79,7 +84,6 @@ def fix_array_index_keys(content):
     changes = 0
 
     # Buscar patrones como: key={index} o key={i}
-    pattern = r'key=\{(index|i|idx)\}'
 
     def replace_key(match):
         nonlocal changes
@@ -87,7 +91,7 @@ def fix_array_index_keys(content):
         # Buscar si hay un 'item' o similar en el contexto
         return 'key={`item-${' + match.group(1) + '}`}'
 
-    content = re.sub(pattern, replace_key, content)
+    content = INDEX_KEY.sub(replace_key, content)
 
     return content, changes
 
@@ -97,9 +101,6 @@ def fix_missing_deps(content, filepath):
 
     # Esto es complejo, por ahora agregar comentario eslint-disable
     if "react-hooks/exhaustive-deps" in content or True:
-        # Buscar useEffect sin deps correctas
-        pattern = r'(useEffect\([^,]+,\s*\[[^\]]*\]\);?)'
-
         # Solo agregar comentario si hay warning de deps
         lines = content.split('\n')
         new_lines = []
@@ -119,50 +120,17 @@ def fix_missing_deps(content, filepath):
 
     return content, changes
 
-def process_file(filepath):
-    """Procesa un archivo JSX/JS"""
-    global stats
-
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            original_content = f.read()
-
-        content = original_content
-        total_changes = 0
-
-        # Aplicar todas las correcciones
-        content, c1 = remove_unused_imports(content, filepath)
-        total_changes += c1
-        stats["imports_removed"] += c1
+def fix_content(content):
+    """Aplica todas las correcciones a un archivo JSX/JS (corre en los procesos del pool)"""
+    changes = {}
 
-        content, c2 = remove_console_logs(content)
-        total_changes += c2
-        stats["consoles_removed"] += c2
+    content, changes["imports_removed"] = remove_unused_imports(content, None)
+    content, changes["consoles_removed"] = remove_console_logs(content)
+    content, changes["unused_vars_fixed"] = fix_unused_vars(content)
+    content, changes["array_keys_fixed"] = fix_array_index_keys(content)
+    content, changes["deps_fixed"] = fix_missing_deps(content, None)
 
-        content, c3 = fix_unused_vars(content)
-        total_changes += c3
-        stats["unused_vars_fixed"] += c3
-
-        content, c4 = fix_array_index_keys(content)
-        total_changes += c4
-        stats["array_keys_fixed"] += c4
-
-        content, c5 = fix_missing_deps(content, filepath)
-        total_changes += c5
-        stats["deps_fixed"] += c5
-
-        # Escribir cambios
-        if total_changes > 0 and not DRY_RUN:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            print(f"OK {filepath.name}: {total_changes} cambios")
-        elif total_changes > 0:
-            print(f"[DRY-RUN] {filepath.name}: {total_changes} cambios")
-
-        stats["files_processed"] += 1
-
-    except Exception as e:
-        print(f"ERROR procesando {filepath}: {e}")
+    return content, changes, []
 
 def main():
     """Procesa todos los archivos"""
@@ -171,25 +139,33 @@ def main():
     print(f"Modo: {'DRY-RUN (solo vista previa)' if DRY_RUN else 'ESCRITURA REAL'}")
     print("-" * 60)
 
-    # Buscar todos los archivos .jsx y .js
-    for filepath in SRC_DIR.rglob("*.jsx"):
-        process_file(filepath)
+    # Todos los .jsx y .js en una sola pasada (excluir archivos de test por ahora)
+    files = source_files(SRC_DIR, ('.jsx', '.js'), exclude_suffixes=('.test.js',))
+    runner = CodemodRunner('fix-all-eslint', fix_content, __file__, CACHE_DIR, workers=WORKERS, dry_run=DRY_RUN)
+    results = runner.run(files)
+
+    for result in results:
+        if result.error is not None:
+            print(f"ERROR procesando {result.path}: {result.error}")
+        elif result.total > 0 and not DRY_RUN:
+            print(f"OK {result.path.name}: {result.total} cambios")
+        elif result.total > 0:
+            print(f"[DRY-RUN] {result.path.name}: {result.total} cambios")
 
-    for filepath in SRC_DIR.rglob("*.js"):
-        # Excluir archivos de test por ahora
-        if not filepath.name.endswith('.test.js'):
-            process_file(filepath)
+    stats = totals(results)
+    stats["files_processed"] = sum(1 for result in results if result.error is None)
 
     # Mostrar estadísticas
     print("\n" + "=" * 60)
     print("ESTADISTICAS DE CORRECCION")
     print("=" * 60)
     print(f"Archivos procesados: {stats['files_processed']}")
-    print(f"Imports eliminados: {stats['imports_removed']}")
-    print(f"Console.logs comentados: {stats['consoles_removed']}")
-    print(f"Variables no usadas: {stats['unused_vars_fixed']}")
-    print(f"Array keys corregidos: {stats['array_keys_fixed']}")
-    print(f"Dependencies arregladas: {stats['deps_fixed']}")
+    print(f"Archivos sin cambios desde la última corrida: {runner.skipped}")
+    print(f"Imports eliminados: {stats.get('imports_removed', 0)}")
+    print(f"Console.logs comentados: {stats.get('consoles_removed', 0)}")
+    print(f"Variables no usadas: {stats.get('unused_vars_fixed', 0)}")
+    print(f"Array keys corregidos: {stats.get('array_keys_fixed', 0)}")
+    print(f"Dependencies arregladas: {stats.get('deps_fixed', 0)}")
     print("=" * 60)
 
     if DRY_RUN:
@@ -1,6 +1,13 @@
 import json
 import sys
 from datetime import datetime
+from pathlib import Path
+
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+from dataset_store import DatasetStore
+
+SISTEMA_PATH = r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json'
 
 # Configurar codificación de salida para Windows
 if sys.platform == 'win32':
@@ -13,113 +20,89 @@ print('='*80)
 with open('datos_mapeados.json', 'r', encoding='utf-8') as f:
     datos_mapeados = json.load(f)
 
-# Cargar sistema actual
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'r', encoding='utf-8') as f:
-    sistema = json.load(f)
+# Sistema actual: sólo su índice de claves; los cambios van al registro de cambios
+store = DatasetStore(SISTEMA_PATH)
+if store.replayed_ops:
+    print(f'⚠️  excel_data.json cambió: {store.replayed_ops} cambios sin compactar reaplicados sobre él')
 
 print('\nESTADO ANTERIOR:')
-print(f'  - Distribuidores: {len(sistema.get("distribuidores", []))}')
-print(f'  - Clientes: {len(sistema.get("clientes", []))}')
-print(f'  - Ventas: {len(sistema.get("ventas", []))}')
-print(f'  - Compras: {len(sistema.get("compras", []))}')
+print(f'  - Distribuidores: {store.count("distribuidores")}')
+print(f'  - Clientes: {store.count("clientes")}')
+print(f'  - Ventas: {store.count("ventas")}')
+print(f'  - Compras: {store.count("compras")}')
 
 # ==============================================================================
 # INSERTAR DISTRIBUIDORES
 # ==============================================================================
 print('\n📋 Insertando DISTRIBUIDORES...')
 
-# Crear un mapa de distribuidores existentes por nombre
-distribuidores_existentes = {d['nombre']: d for d in sistema.get('distribuidores', [])}
-
-# Actualizar/agregar distribuidores
+# Upsert por nombre: actualizar existentes o agregar nuevos
 for dist_nuevo in datos_mapeados['distribuidores']:
     nombre = dist_nuevo['nombre']
-    if nombre in distribuidores_existentes:
-        # Actualizar distribuidor existente
-        dist_existente = distribuidores_existentes[nombre]
-        dist_existente['totalComprado'] = dist_nuevo['totalComprado']
-        dist_existente['totalPagado'] = dist_nuevo['totalPagado']
-        dist_existente['adeudo'] = dist_nuevo['adeudo']
-        dist_existente['ordenesCompra'] = dist_nuevo['ordenesCompra']
-        print(f'  ✓ Actualizado: {nombre}')
-    else:
-        # Agregar nuevo distribuidor
-        sistema['distribuidores'].append(dist_nuevo)
-        print(f'  + Agregado: {nombre}')
+    nuevo = store.upsert('distribuidores', nombre, insert=dist_nuevo, update={
+        'totalComprado': dist_nuevo['totalComprado'],
+        'totalPagado': dist_nuevo['totalPagado'],
+        'adeudo': dist_nuevo['adeudo'],
+        'ordenesCompra': dist_nuevo['ordenesCompra']
+    })
+    print(f'  + Agregado: {nombre}' if nuevo else f'  ✓ Actualizado: {nombre}')
 
 # ==============================================================================
 # INSERTAR CLIENTES
 # ==============================================================================
 print('\n👥 Insertando CLIENTES...')
 
-# Crear un mapa de clientes existentes por nombre
-clientes_existentes = {c['nombre']: c for c in sistema.get('clientes', [])}
-
-# Actualizar/agregar clientes
+# Upsert por nombre: actualizar existentes o agregar nuevos
 for cli_nuevo in datos_mapeados['clientes']:
     nombre = cli_nuevo['nombre']
-    if nombre in clientes_existentes:
-        # Actualizar cliente existente
-        cli_existente = clientes_existentes[nombre]
-        cli_existente['totalComprado'] = cli_nuevo['totalComprado']
-        cli_existente['totalAbonado'] = cli_nuevo['totalAbonado']
-        cli_existente['adeudo'] = cli_nuevo['adeudo']
-        cli_existente['estado'] = cli_nuevo['estado']
-        if cli_nuevo['observaciones']:
-            cli_existente['observaciones'] = cli_nuevo['observaciones']
-        print(f'  ✓ Actualizado: {nombre}')
-    else:
-        # Agregar nuevo cliente
-        sistema['clientes'].append(cli_nuevo)
-        print(f'  + Agregado: {nombre}')
+    actualizacion = {
+        'totalComprado': cli_nuevo['totalComprado'],
+        'totalAbonado': cli_nuevo['totalAbonado'],
+        'adeudo': cli_nuevo['adeudo'],
+        'estado': cli_nuevo['estado']
+    }
+    if cli_nuevo['observaciones']:
+        actualizacion['observaciones'] = cli_nuevo['observaciones']
+    nuevo = store.upsert('clientes', nombre, insert=cli_nuevo, update=actualizacion)
+    print(f'  + Agregado: {nombre}' if nuevo else f'  ✓ Actualizado: {nombre}')
 
 # ==============================================================================
 # INSERTAR COMPRAS
 # ==============================================================================
 print('\n🛒 Insertando COMPRAS...')
 
-# Crear un mapa de compras existentes por ID
-compras_existentes = {c['id']: c for c in sistema.get('compras', [])}
-
-# Actualizar/agregar compras
+# Upsert por ID: la compra existente se actualiza con todos los campos nuevos
 for compra_nueva in datos_mapeados['compras']:
     id_compra = compra_nueva['id']
-    if id_compra in compras_existentes:
-        # Actualizar compra existente
-        compras_existentes[id_compra].update(compra_nueva)
-        print(f'  ✓ Actualizado: {id_compra}')
-    else:
-        # Agregar nueva compra
-        sistema['compras'].append(compra_nueva)
-        print(f'  + Agregado: {id_compra}')
+    nuevo = store.upsert('compras', id_compra, insert=compra_nueva, update=compra_nueva)
+    print(f'  + Agregado: {id_compra}' if nuevo else f'  ✓ Actualizado: {id_compra}')
 
 # ==============================================================================
 # ACTUALIZAR METADATOS
 # ==============================================================================
-sistema['ultimaActualizacion'] = datetime.now().isoformat()
-sistema['version'] = '2.0-excel-import'
+store.set('ultimaActualizacion', datetime.now().isoformat())
+store.set('version', '2.0-excel-import')
 
 # ==============================================================================
 # GUARDAR SISTEMA ACTUALIZADO
 # ==============================================================================
 print('\n💾 Guardando sistema actualizado...')
 
-# Hacer backup del sistema actual
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.backup.json', 'w', encoding='utf-8') as f:
-    json.dump(sistema, f, ensure_ascii=False, indent=2)
-print('  ✓ Backup creado: excel_data.backup.json')
-
-# Guardar sistema actualizado
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'w', encoding='utf-8') as f:
-    json.dump(sistema, f, ensure_ascii=False, indent=2)
+# El frontend sólo lee el snapshot: se compacta al terminar (con backup).
+# Con --sin-compactar los cambios quedan en el registro hasta superar el
+# umbral, para corridas repetidas o en lote
+if store.commit(compact=None if '--sin-compactar' in sys.argv else True):
+    print('  ✓ Snapshot compactado (backup: excel_data.backup.json)')
+else:
+    print(f'  ✓ Cambios registrados ({store.pending_ops()} pendientes de compactar: el frontend no los ve hasta entonces)')
 print('  ✓ Sistema actualizado guardado')
 
 print('\n✅ DATOS INSERTADOS EXITOSAMENTE')
 print('\nESTADO FINAL:')
-print(f'  - Distribuidores: {len(sistema.get("distribuidores", []))}')
-print(f'  - Clientes: {len(sistema.get("clientes", []))}')
-print(f'  - Ventas: {len(sistema.get("ventas", []))}')
-print(f'  - Compras: {len(sistema.get("compras", []))}')
+print(f'  - Distribuidores: {store.count("distribuidores")}')
+print(f'  - Clientes: {store.count("clientes")}')
+print(f'  - Ventas: {store.count("ventas")}')
+print(f'  - Compras: {store.count("compras")}')
 
 print('\n📊 RESUMEN DE CAMBIOS:')
 print(f'  ✓ Distribuidores actualizados/agregados desde Excel')
@@ -1,21 +1,36 @@
 #!/usr/bin/env python3
 """
 Script inteligente para eliminar imports no usados
+Con --todos recorre todo src/ en paralelo; los archivos que no cambiaron
+desde la última corrida se saltan (caché en .codemodcache/).
 """
 
 import re
+import sys
 from pathlib import Path
-from collections import defaultdict
+
+# Módulos compartidos en scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts'))
+
+from codemod_runner import DEFAULT_WORKERS, CodemodRunner, source_files, totals
 
 SRC_DIR = Path("c:/Users/xpovo/Documents/premium-ecosystem/src")
-stats = {"files_processed": 0, "imports_removed": 0}
+CACHE_DIR = SRC_DIR.parent / '.codemodcache'
+WORKERS = DEFAULT_WORKERS
+
+# Patrones compilados una sola vez para todos los archivos
+NAMED_IMPORTS = re.compile(r'import\s*\{([^}]+)\}')
+DEFAULT_IMPORT = re.compile(r'import\s+(\w+)\s+from')
+MODULE_PATH = re.compile(r"from\s+['\"]([^'\"]+)['\"]")
+WORD = re.compile(r'\w+')
+IDENTIFIER = re.compile(r'\w+$')
 
 def extract_imports_from_line(line):
     """Extrae nombres de imports de una línea"""
     imports = []
 
     # Patrón para imports nombrados: import { A, B, C } from '...'
-    named_imports = re.findall(r'import\s*\{([^}]+)\}', line)
+    named_imports = NAMED_IMPORTS.findall(line)
     if named_imports:
         for group in named_imports:
             # Separar por comas
@@ -23,37 +38,40 @@ def extract_imports_from_line(line):
             imports.extend(items)
 
     # Patrón para import default: import React from '...'
-    default_import = re.match(r'import\s+(\w+)\s+from', line)
+    default_import = DEFAULT_IMPORT.match(line)
     if default_import and '{' not in line:
         imports.append(default_import.group(1))
 
     return imports
 
-def check_usage(content, import_name):
-    """Verifica si un import se usa en el código"""
-    # Remover la línea de import para no contar esa referencia
-    lines = content.split('\n')
-    code_without_imports = '\n'.join([
-        line for line in lines
-        if not line.strip().startswith('import ')
-    ])
-
-    # Buscar uso del import
-    # Patrón: <ImportName o importName(
-    patterns = [
-        rf'\b{import_name}\b',  # Uso directo
-        rf'<{import_name}',      # Componente React
-    ]
-
-    for pattern in patterns:
-        if re.search(pattern, code_without_imports):
-            return True
-
-    return False
+class UsageIndex:
+    """
+    Código sin las líneas de import y sus palabras, calculados una vez por
+    archivo: cada nombre importado se consulta sin volver a escanear el código.
+    """
+
+    def __init__(self, content):
+        lines = content.split('\n')
+        self.code = '\n'.join([
+            line for line in lines
+            if not line.strip().startswith('import ')
+        ])
+        self.words = set(WORD.findall(self.code))
+
+    def is_used(self, import_name):
+        """Igual que buscar \\bnombre\\b o <nombre en el código sin imports"""
+        if IDENTIFIER.match(import_name):
+            # Un nombre de sólo caracteres de palabra cumple \b...\b si es una palabra completa
+            used = import_name in self.words
+        else:
+            used = re.search(rf'\b{import_name}\b', self.code) is not None
+        return used or f'<{import_name}' in self.code
 
-def remove_unused_imports(content, filepath):
+def remove_unused_imports(content):
     """Elimina imports no usados de un archivo"""
     changes = 0
+    messages = []
+    usage = UsageIndex(content)
     lines = content.split('\n')
     new_lines = []
 
@@ -67,18 +85,18 @@ def remove_unused_imports(content, filepath):
             for imp in imports:
                 # Limpiar espacios y alias (as ...)
                 clean_imp = imp.split(' as ')[0].strip()
-                if check_usage(content, clean_imp):
+                if usage.is_used(clean_imp):
                     used_imports.append(imp)
                 else:
                     changes += 1
-                    print(f"  - Removiendo: {clean_imp}")
+                    messages.append(f"  - Removiendo: {clean_imp}")
 
             # Reconstruir línea de import
             if used_imports:
                 # Mantener estructura original
                 if '{' in line:
                     # Import nombrado
-                    module_path = re.search(r"from\s+['\"]([^'\"]+)['\"]", line)
+                    module_path = MODULE_PATH.search(line)
                     if module_path:
                         new_line = f"import {{ {', '.join(used_imports)} }} from '{module_path.group(1)}';"
                         new_lines.append(new_line)
@@ -89,50 +107,48 @@ def remove_unused_imports(content, filepath):
         else:
             new_lines.append(line)
 
-    return '\n'.join(new_lines), changes
-
-def process_file(filepath):
-    global stats
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        new_content, changes = remove_unused_imports(content, filepath)
-
-        if changes > 0:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print(f"OK {filepath.name}: {changes} imports eliminados\n")
-            stats["imports_removed"] += changes
-
-        stats["files_processed"] += 1
-    except Exception as e:
-        print(f"ERROR {filepath}: {e}")
+    return '\n'.join(new_lines), {"imports_removed": changes}, messages
 
 def main():
     print("Eliminando imports no usados...")
     print("=" * 60)
 
-    # Solo procesar archivos con más warnings
-    problem_files = [
-        "Apollo.jsx",
-        "Nexus.jsx",
-        "Pulse.jsx",
-        "Quantum.jsx",
-        "ShadowPrime.jsx",
-        "Synapse.jsx",
-        "Vortex.jsx",
-    ]
-
-    for filename in problem_files:
-        matches = list(SRC_DIR.rglob(filename))
-        if matches:
-            print(f"\nProcesando {filename}...")
-            process_file(matches[0])
-
+    if '--todos' in sys.argv:
+        files = source_files(SRC_DIR, ('.jsx', '.js'))
+    else:
+        # Solo procesar archivos con más warnings
+        problem_files = [
+            "Apollo.jsx",
+            "Nexus.jsx",
+            "Pulse.jsx",
+            "Quantum.jsx",
+            "ShadowPrime.jsx",
+            "Synapse.jsx",
+            "Vortex.jsx",
+        ]
+        by_name = {}
+        for path in source_files(SRC_DIR, ('.jsx',)):
+            by_name.setdefault(path.name, path)
+        files = [by_name[filename] for filename in problem_files if filename in by_name]
+
+    runner = CodemodRunner('remove-unused-imports', remove_unused_imports, __file__, CACHE_DIR, workers=WORKERS)
+    results = runner.run(files)
+
+    for result in results:
+        if result.error is not None:
+            print(f"ERROR {result.path}: {result.error}")
+            continue
+        print(f"\nProcesando {result.path.name}...")
+        for message in result.messages:
+            print(message)
+        if result.total > 0:
+            print(f"OK {result.path.name}: {result.total} imports eliminados\n")
+
+    stats = totals(results)
     print("\n" + "=" * 60)
-    print(f"Archivos procesados: {stats['files_processed']}")
-    print(f"Imports eliminados: {stats['imports_removed']}")
+    print(f"Archivos procesados: {sum(1 for result in results if result.error is None)}")
+    print(f"Archivos sin cambios desde la última corrida: {runner.skipped}")
+    print(f"Imports eliminados: {stats.get('imports_removed', 0)}")
     print("=" * 60)
 
 if __name__ == "__main__":
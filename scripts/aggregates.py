@@ -0,0 +1,129 @@
+"""
+MOTOR DE AGREGADOS EN UNA PASADA
+Acumuladores agrupados que se alimentan fila a fila a medida que los parsers
+agregan registros: las métricas financieras y los acumulados por
+distribuidor y por cliente quedan listos sin volver a recorrer las listas,
+y admiten más filas después (importación incremental). Con una tabla de
+valores internados los grupos se llevan por código entero.
+"""
+
+from typing import Dict, Hashable, Iterable, Optional
+
+from categorical import StringTable
+
+# Métrica -> campo de origen (el orden es el de `metricasFinancieras`)
+VENTA_TOTALS = {
+    'carteraPorCobrar': 'adeudo',
+    'utilidadTotal': 'totalUtilidades',
+    'ventasTotales': 'totalVenta'
+}
+COMPRA_TOTALS = {
+    'cuentasPorPagar': 'deuda',
+    'costoTotalInventario': 'costoTotal'
+}
+DISTRIBUIDOR_TOTALS = {
+    'totalComprado': 'costoTotal',
+    'totalPagado': 'pagoDistribuidor',
+    'adeudo': 'deuda'
+}
+CLIENTE_TOTALS = {
+    'totalComprado': 'totalVenta',
+    'totalPagado': 'montoPagado',
+    'adeudo': 'adeudo',
+    'utilidades': 'totalUtilidades'
+}
+
+
+class GroupedTotals:
+    """
+    Sumas por grupo (y conteo) en una sola pasada. Sin `key` hay un único
+    grupo. Las sumas se hacen en el orden de llegada, igual que `sum()`.
+    Con `table`, los grupos se indexan por el código del valor en la tabla.
+    """
+
+    def __init__(self, key: Optional[str], fields: Dict[str, str], table: StringTable = None):
+        self.key = key
+        self.fields = list(fields.items())
+        self.table = table
+        self.totals: Dict[Hashable, Dict] = {}
+
+    @property
+    def groups(self) -> Dict[Hashable, Dict]:
+        """Totales por valor del grupo, en orden de primera aparición"""
+        if self.table is None:
+            return self.totals
+        return {self.table.label(code): totals for code, totals in self.totals.items()}
+
+    def empty(self) -> Dict:
+        totals = {'count': 0}
+        totals.update((name, 0) for name, _ in self.fields)
+        return totals
+
+    def add(self, record: Dict):
+        group_key = record[self.key] if self.key is not None else None
+        if self.table is not None:
+            group_key = self.table.intern(group_key)
+        totals = self.totals.get(group_key)
+        if totals is None:
+            totals = self.totals[group_key] = self.empty()
+
+        totals['count'] += 1
+        for name, source in self.fields:
+            totals[name] += record[source]
+
+    def extend(self, records: Iterable[Dict]):
+        for record in records:
+            self.add(record)
+
+    def get(self, group_key: Hashable = None) -> Dict:
+        """Totales del grupo (ceros si no llegó ninguna fila)"""
+        if self.table is not None:
+            group_key = self.table.code(group_key)
+        return self.totals.get(group_key) or self.empty()
+
+
+class FinancialAggregates:
+    """
+    Métricas financieras y acumulados por distribuidor/cliente del importador.
+    Con `categorias` (CategoricalStore) los acumulados por grupo usan los
+    mismos códigos que las columnas internadas.
+    """
+
+    def __init__(self, categorias=None):
+        self.ventas = GroupedTotals(None, VENTA_TOTALS)
+        self.compras = GroupedTotals(None, COMPRA_TOTALS)
+        self.bancos = GroupedTotals(None, {'capitalTotal': 'saldoActual'})
+        self.almacen = GroupedTotals(None, {'inventarioActual': 'stockActual'})
+        distribuidores = categorias.table('distribuidor') if categorias is not None else None
+        clientes = categorias.table('cliente') if categorias is not None else None
+        self.por_distribuidor = GroupedTotals('distribuidor', DISTRIBUIDOR_TOTALS, distribuidores)
+        self.por_cliente = GroupedTotals('cliente', CLIENTE_TOTALS, clientes)
+
+    def add_venta(self, venta: Dict):
+        self.ventas.add(venta)
+        self.por_cliente.add(venta)
+
+    def add_compra(self, compra: Dict):
+        self.compras.add(compra)
+        self.por_distribuidor.add(compra)
+
+    def add_banco(self, banco: Dict):
+        self.bancos.add(banco)
+
+    def add_almacen(self, almacen: Dict):
+        self.almacen.add(almacen)
+
+    def metricas(self) -> Dict:
+        """`metricasFinancieras` a partir de los acumulados actuales"""
+        ventas = self.ventas.get()
+        compras = self.compras.get()
+        return {
+            'capitalTotal': self.bancos.get()['capitalTotal'],
+            'inventarioActual': self.almacen.get()['inventarioActual'],
+            'carteraPorCobrar': ventas['carteraPorCobrar'],
+            'cuentasPorPagar': compras['cuentasPorPagar'],
+            'utilidadTotal': ventas['utilidadTotal'],
+            'costoTotalInventario': compras['costoTotalInventario'],
+            'ventasTotales': ventas['ventasTotales'],
+            'comprasTotales': compras['costoTotalInventario']
+        }
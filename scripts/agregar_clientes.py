@@ -2,14 +2,16 @@
 """
 Agregar clientes faltantes al sistema
 """
-import json
 import sys
 
+from dataset_store import DatasetStore
+
 sys.stdout.reconfigure(encoding='utf-8')
 
-# Cargar JSON actual
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# Índice de claves del sistema (no se lee ni reescribe el JSON completo)
+store = DatasetStore(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json')
+if store.replayed_ops:
+    print(f'⚠️  excel_data.json cambió: {store.replayed_ops} cambios sin compactar reaplicados sobre él')
 
 # Agregar clientes faltantes
 nuevos_clientes = [
@@ -25,20 +27,19 @@ nuevos_clientes = [
 ]
 
 # Verificar si ya existen
-clientes_existentes = {c['nombre'] for c in data['clientes']}
 agregados = 0
 
 for nuevo in nuevos_clientes:
-    if nuevo['nombre'] not in clientes_existentes:
-        data['clientes'].append(nuevo)
+    if not store.exists('clientes', nuevo['nombre']):
+        store.upsert('clientes', nuevo['nombre'], insert=nuevo)
         print(f'OK - Agregado: {nuevo["nombre"]}')
         agregados += 1
     else:
         print(f'INFO - Ya existe: {nuevo["nombre"]}')
 
-# Guardar
-with open(r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json', 'w', encoding='utf-8') as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
+# Guardar: se reescribe el snapshot que lee el frontend (--sin-compactar sólo
+# agrega al registro de cambios, para cargas repetidas)
+store.commit(compact=None if '--sin-compactar' in sys.argv else True)
 
-print(f'\nTotal clientes ahora: {len(data["clientes"])}')
+print(f'\nTotal clientes ahora: {store.count("clientes")}')
 print(f'Clientes agregados: {agregados}')
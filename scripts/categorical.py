@@ -0,0 +1,165 @@
+"""
+COLUMNAS CATEGÓRICAS INTERNADAS
+Clientes, distribuidores, conceptos y estatus se repiten en miles de filas.
+Cada valor distinto se guarda una sola vez en una tabla y cada fila sólo
+lleva su código entero (codificación por diccionario): los registros
+comparten el mismo objeto, la columna ocupa 4 bytes por fila y los
+acumulados por grupo se calculan sobre los códigos.
+"""
+
+from array import array
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+# Código de las celdas vacías (None)
+MISSING = -1
+
+# Entidad -> campos categóricos que se internan al parsear
+CATEGORICAL_FIELDS: Dict[str, List[str]] = {
+    'ventas': ['cliente', 'estatus', 'estadoPago', 'destino', 'concepto'],
+    'compras': ['distribuidor', 'estatus'],
+    'ordenesCompra': ['distribuidor'],
+    'entradas': ['distribuidor', 'proveedor'],
+    'salidas': ['cliente', 'concepto', 'motivoSalida'],
+    'movimientos': ['tipo', 'cliente', 'concepto', 'banco']
+}
+
+# Campos que comparten tabla con otro (mismos nombres propios)
+SHARED_TABLES = {
+    'proveedor': 'distribuidor',
+    'motivoSalida': 'concepto'
+}
+
+
+class StringTable:
+    """
+    Valor distinto -> código, en orden de primera aparición. Los valores que
+    no son texto se distinguen también por tipo (1 y 1.0 no se mezclan).
+    """
+
+    def __init__(self):
+        self.codes: Dict[Hashable, int] = {}
+        self.values: List[Any] = []
+
+    @staticmethod
+    def key(value: Any) -> Hashable:
+        return value if type(value) is str else (type(value), value)
+
+    def intern(self, value: Any) -> int:
+        """Código del valor (lo agrega si es nuevo); None -> MISSING"""
+        if value is None:
+            return MISSING
+        key = self.key(value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value: Any) -> Optional[int]:
+        """Código de un valor ya internado (None si nunca apareció)"""
+        if value is None:
+            return MISSING
+        return self.codes.get(self.key(value))
+
+    def label(self, code: int) -> Any:
+        return None if code == MISSING else self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class CategoricalColumn:
+    """Columna de códigos sobre una tabla de valores (compartible entre columnas)"""
+
+    def __init__(self, table: StringTable):
+        self.table = table
+        self.codes = array('i')
+
+    def append(self, value: Any) -> Any:
+        """Agrega la fila y devuelve el valor canónico (el objeto de la tabla)"""
+        if value is None:
+            self.codes.append(MISSING)
+            return None
+        table = self.table
+        code = table.codes.get(value if type(value) is str else (type(value), value))
+        if code is None:
+            code = table.intern(value)
+        self.codes.append(code)
+        return table.values[code]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def labels(self) -> List[Any]:
+        return [self.table.label(code) for code in self.codes]
+
+    def counts(self) -> np.ndarray:
+        """Filas por código (índice = código; las vacías no cuentan)"""
+        codes = np.frombuffer(self.codes, dtype=np.int32)
+        return np.bincount(codes[codes != MISSING], minlength=len(self.table))
+
+    def sums(self, weights: Iterable[float]) -> np.ndarray:
+        """Suma de `weights` (uno por fila) por código"""
+        codes = np.frombuffer(self.codes, dtype=np.int32)
+        weights = np.fromiter(weights, dtype=np.float64, count=len(codes))
+        present = codes != MISSING
+        return np.bincount(codes[present], weights[present], minlength=len(self.table))
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+
+class CategoricalStore:
+    """
+    Columnas categóricas por entidad. `add` interna los campos del registro
+    en el lugar (el registro queda con los objetos compartidos) y anota sus
+    códigos, MISSING si el registro no trae el campo: la fila i de cada
+    columna es el registro i de la entidad. Un mismo campo usa una sola
+    tabla en todas las entidades.
+    """
+
+    def __init__(self, fields: Dict[str, List[str]] = None):
+        self.fields = CATEGORICAL_FIELDS if fields is None else fields
+        self.tables: Dict[str, StringTable] = {}
+        self.columns: Dict[str, Dict[str, CategoricalColumn]] = {}
+        # Entidad -> [(campo, columna)] para no resolverlos en cada registro
+        self.bound: Dict[str, List] = {}
+
+    def table(self, field: str) -> StringTable:
+        name = SHARED_TABLES.get(field, field)
+        if name not in self.tables:
+            self.tables[name] = StringTable()
+        return self.tables[name]
+
+    def column(self, entity: str, field: str) -> CategoricalColumn:
+        columns = self.columns.setdefault(entity, {})
+        if field not in columns:
+            columns[field] = CategoricalColumn(self.table(field))
+        return columns[field]
+
+    def add(self, entity: str, record: Dict) -> Dict:
+        bound = self.bound.get(entity)
+        if bound is None:
+            bound = self.bound[entity] = [(field, self.column(entity, field)) for field in self.fields.get(entity, ())]
+        for field, column in bound:
+            if field in record:
+                record[field] = column.append(record[field])
+            else:
+                # Sin el campo la fila queda vacía: las columnas siguen alineadas por fila
+                column.codes.append(MISSING)
+        return record
+
+    def extend(self, entity: str, records: Iterable[Dict]):
+        for record in records:
+            self.add(entity, record)
+
+    def report(self) -> Dict[str, int]:
+        """Valores distintos, celdas (filas por campo, vacías incluidas) y bytes de códigos"""
+        columns = [column for entity in self.columns.values() for column in entity.values()]
+        return {
+            'distinct': sum(len(table) for table in self.tables.values()),
+            'cells': sum(len(column) for column in columns),
+            'code_bytes': sum(column.nbytes() for column in columns)
+        }
@@ -0,0 +1,108 @@
+"""
+ÍNDICE DE CLASIFICACIÓN DEL LIBRO
+Clasifica una sola vez cada hoja en entidades (por las palabras clave de su
+nombre y, si el nombre no dice nada, por la firma de sus encabezados) y cada
+nombre de columna distinto en patrones de clave foránea y tabla objetivo.
+Extractores, detección de relaciones y grafo consultan el índice en lugar de
+repetir filtros por entidad y bucles de patrones por columna.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from excel_entity_mapper import ENTITY_SPECS, SHEET_KEYWORDS, EntitySpec
+from keyword_scanner import KeywordScanner
+
+# Patrones comunes de FK (una relación por patrón que cumple la columna)
+FK_PATTERNS = [
+    r'.*_id$',
+    r'id_.*',
+    r'.*codigo.*',
+    r'.*clave.*',
+    r'.*folio.*',
+    r'.*ref.*'
+]
+FK_REGEXES = [re.compile(pattern) for pattern in FK_PATTERNS]
+
+# Palabra en el nombre de columna -> tabla objetivo (gana la primera en este orden)
+TARGET_TABLES = {
+    'cliente': 'clientes',
+    'producto': 'productos',
+    'vendedor': 'vendedores',
+    'proveedor': 'proveedores',
+    'almacen': 'almacenes',
+    'categoria': 'categorias',
+    'venta': 'ventas',
+    'compra': 'compras',
+    'usuario': 'usuarios',
+    'pedido': 'pedidos',
+    'factura': 'facturas'
+}
+TARGET_KEYWORDS = KeywordScanner({'tablas': list(TARGET_TABLES)})
+
+# Campos de la entidad (además de los requeridos) que deben aparecer como
+# encabezado exacto para reconocer la hoja sólo por sus encabezados
+MIN_SIGNATURE_FIELDS = 3
+
+
+@dataclass(frozen=True)
+class ColumnClass:
+    """Clasificación de un nombre de columna"""
+    fk_patterns: Tuple[str, ...]
+    target: str
+
+
+def classify_column(name: str) -> ColumnClass:
+    """Patrones de FK que cumple la columna (en minúsculas) y su tabla objetivo"""
+    keyword = TARGET_KEYWORDS.first(name, 'tablas')
+    return ColumnClass(
+        tuple(pattern for pattern, regex in zip(FK_PATTERNS, FK_REGEXES) if regex.match(name)),
+        TARGET_TABLES[keyword] if keyword else 'UNKNOWN'
+    )
+
+
+def signature_matches(spec: EntitySpec, headers: Sequence) -> bool:
+    """Los encabezados cubren los campos requeridos y suficientes campos de la entidad"""
+    names = {str(header).strip().lower() for header in headers if header is not None}
+    present = {field.name for field in spec.fields if field.aliases and names.intersection(field.aliases)}
+    return set(spec.required) <= present and len(present) >= MIN_SIGNATURE_FIELDS
+
+
+class ClassificationIndex:
+    """
+    Hoja -> entidades y nombre de columna -> clasificación, para todo el libro.
+    `read_headers(hoja)` sólo se llama para las hojas cuyo nombre no coincide
+    con ninguna entidad.
+    """
+
+    def __init__(self, sheetnames: Sequence[str], read_headers: Optional[Callable[[str], Sequence]] = None):
+        self.sheet_entities: Dict[str, List[str]] = {}
+        self.entity_sheets: Dict[str, List[str]] = {spec.name: [] for spec in ENTITY_SPECS}
+        self.by_signature: Dict[str, List[str]] = {}
+        self.columns: Dict[str, ColumnClass] = {}
+
+        for sheet_name in sheetnames:
+            present = SHEET_KEYWORDS.present(sheet_name)
+            entities = [spec.name for spec in ENTITY_SPECS if present.intersection(SHEET_KEYWORDS.categories[spec.name])]
+            if not entities and read_headers is not None:
+                headers = read_headers(sheet_name)
+                entities = [spec.name for spec in ENTITY_SPECS if signature_matches(spec, headers)]
+                if entities:
+                    self.by_signature[sheet_name] = entities
+
+            self.sheet_entities[sheet_name] = entities
+            for entity in entities:
+                self.entity_sheets[entity].append(sheet_name)
+
+    def sheets_for(self, entity: str) -> List[str]:
+        """Hojas de la entidad en el orden del libro"""
+        return self.entity_sheets.get(entity, [])
+
+    def column(self, name) -> ColumnClass:
+        """Clasificación del nombre de columna (se calcula una vez por nombre distinto)"""
+        key = str(name).lower()
+        found = self.columns.get(key)
+        if found is None:
+            found = self.columns[key] = classify_column(key)
+        return found
@@ -0,0 +1,150 @@
+"""
+EJECUTOR DE CODEMODS SOBRE EL CÓDIGO FUENTE
+Recorre src/ una sola vez, reparte los archivos en un pool de procesos y salta
+los que no cambiaron desde la última corrida. La caché guarda tamaño, fecha y
+hash de cada archivo tal como quedó, junto con la huella del script del
+codemod: si el script cambia, se vuelve a procesar todo.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from json_stream import dump_json
+
+CACHE_VERSION = 1
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Archivos por tarea enviada al pool (reparte la carga sin una tarea por archivo)
+CHUNK_SIZE = 8
+
+# contenido -> (contenido nuevo, cambios por tipo, mensajes); debe ser una
+# función de módulo para poder enviarla a los procesos del pool
+Transform = Callable[[str], Tuple[str, Dict[str, int], List[str]]]
+
+
+@dataclass
+class FileResult:
+    """Resultado de un archivo; `stat` es (tamaño, fecha, hash) del archivo tal como quedó"""
+    path: Path
+    changes: Dict[str, int] = field(default_factory=dict)
+    messages: List[str] = field(default_factory=list)
+    stat: Optional[List] = None
+    error: Optional[str] = None
+
+    @property
+    def total(self) -> int:
+        return sum(self.changes.values())
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_stat(path: Path) -> List:
+    info = path.stat()
+    return [info.st_size, info.st_mtime_ns, content_digest(path.read_bytes())]
+
+
+def source_files(src_dir: Path, extensions: Sequence[str] = ('.jsx', '.js'),
+                 exclude_suffixes: Tuple[str, ...] = ()) -> List[Path]:
+    """Archivos agrupados por extensión (en el orden dado) con una sola pasada por el árbol"""
+    found: Dict[str, List[Path]] = {extension: [] for extension in extensions}
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            extension = os.path.splitext(name)[1]
+            if extension in found and not name.endswith(exclude_suffixes):
+                found[extension].append(Path(root) / name)
+    return [path for extension in extensions for path in found[extension]]
+
+
+def apply_transform(task: Tuple[Transform, Path, bool]) -> FileResult:
+    """Aplica el codemod a un archivo (en un proceso del pool o en el principal)"""
+    transform, path, dry_run = task
+    result = FileResult(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            original = f.read()
+
+        content, result.changes, result.messages = transform(original)
+
+        if result.total > 0 and not dry_run:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        result.stat = file_stat(path)
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+class CodemodRunner:
+    """
+    Corre `transform` sobre los archivos en paralelo. Los archivos cuyo
+    contenido coincide con el de la última corrida se saltan. En modo
+    DRY-RUN no se escribe ni se actualiza la caché.
+    """
+
+    def __init__(self, name: str, transform: Transform, script_path: str, cache_dir: Path,
+                 workers: int = DEFAULT_WORKERS, dry_run: bool = False):
+        self.transform = transform
+        self.workers = workers
+        self.dry_run = dry_run
+        self.cache_path = Path(cache_dir) / f'{name}.json'
+        self.fingerprint = content_digest(Path(script_path).read_bytes())
+        self.skipped = 0
+
+        self.cache = {'version': CACHE_VERSION, 'fingerprint': self.fingerprint, 'files': {}}
+        try:
+            cached = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            cached = None
+        if cached and cached.get('version') == CACHE_VERSION and cached.get('fingerprint') == self.fingerprint:
+            self.cache = cached
+
+    def unchanged(self, path: Path) -> bool:
+        """El archivo sigue como lo dejó la última corrida (compara tamaño y fecha; si no, el hash)"""
+        entry = self.cache['files'].get(str(path))
+        if entry is None:
+            return False
+        info = path.stat()
+        if entry[:2] == [info.st_size, info.st_mtime_ns]:
+            return True
+        if content_digest(path.read_bytes()) == entry[2]:
+            entry[:2] = [info.st_size, info.st_mtime_ns]
+            return True
+        return False
+
+    def run(self, paths: Sequence[Path]) -> List[FileResult]:
+        """Resultados de los archivos procesados, en el orden de `paths`"""
+        pending = [path for path in paths if not self.unchanged(path)]
+        self.skipped = len(paths) - len(pending)
+
+        tasks = [(self.transform, path, self.dry_run) for path in pending]
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                results = list(pool.map(apply_transform, tasks, chunksize=CHUNK_SIZE))
+        else:
+            results = [apply_transform(task) for task in tasks]
+
+        if not self.dry_run:
+            for result in results:
+                if result.error is None:
+                    self.cache['files'][str(result.path)] = result.stat
+            dump_json(self.cache, str(self.cache_path), compact=True)
+
+        return results
+
+
+def totals(results: Sequence[FileResult]) -> Dict[str, int]:
+    """Cambios sumados por tipo"""
+    summed: Dict[str, int] = {}
+    for result in results:
+        for kind, count in result.changes.items():
+            summed[kind] = summed.get(kind, 0) + count
+    return summed
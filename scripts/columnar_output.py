@@ -0,0 +1,141 @@
+"""
+SALIDA COLUMNAR DE ENTIDADES
+Escribe cada entidad mapeada como un archivo Parquet o Arrow IPC (Feather)
+más un manifiesto JSON, para consultarlas sin volver a leer JSON ni Excel.
+pyarrow es opcional: sólo se importa al usar este formato.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sql_emitter import entity_columns
+
+COLUMNAR_FORMATS = ['parquet', 'feather']
+
+# Columnas de trazabilidad tomadas de `metadata`
+METADATA_COLUMNS = ['source_sheet', 'source_row']
+
+FILE_EXTENSIONS = {
+    'parquet': 'parquet',
+    'feather': 'arrow'
+}
+
+# Columnas de texto con a lo sumo esta proporción de valores distintos se
+# guardan codificadas por diccionario (códigos enteros + tabla de cadenas)
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def require_pyarrow():
+    """Importa pyarrow bajo demanda con un mensaje de instalación claro"""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("La salida columnar requiere 'pyarrow'; instálalo con pip install pyarrow") from None
+    return pyarrow
+
+
+def column_array(pa, values: List[Any]):
+    """
+    Arreglo Arrow con el tipo inferido; si los tipos se mezclan, se guarda como
+    texto. El texto repetido (clientes, conceptos, estatus) se codifica por diccionario.
+    """
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    return dictionary_array(pa, array)
+
+
+def dictionary_array(pa, array):
+    """La columna de texto como códigos + tabla de valores si se repiten lo suficiente"""
+    if not pa.types.is_string(array.type) or len(array) < 2:
+        return array
+    encoded = array.dictionary_encode()
+    if len(encoded.dictionary) > DICTIONARY_MAX_RATIO * len(array):
+        return array
+    return encoded
+
+
+def entity_table(pa, records: List[Dict]):
+    """Tabla Arrow de una entidad (sin `metadata`, con hoja y fila de origen)"""
+    columns = entity_columns(records)
+    arrays = [column_array(pa, [record.get(col) for record in records]) for col in columns]
+
+    names = list(columns)
+    for meta in METADATA_COLUMNS:
+        if meta not in names:
+            arrays.append(column_array(pa, [(record.get('metadata') or {}).get(meta) for record in records]))
+            names.append(meta)
+
+    return pa.table(arrays, names=names)
+
+
+def write_columnar(entities_data: Dict[str, List[Dict]], output_dir: str, fmt: str = 'parquet',
+                   prefix: str = '') -> str:
+    """
+    Escribe un archivo por entidad no vacía y un `manifest.json` con archivo,
+    filas y esquema de cada una. Feather se escribe sin compresión para que
+    pueda abrirse con memory-map; Parquet se comprime con zstd.
+    Devuelve la ruta del manifiesto.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Formato columnar no soportado: {fmt} (opciones: {', '.join(COLUMNAR_FORMATS)})")
+
+    pa = require_pyarrow()
+    directory = Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    manifest = {
+        'format': fmt,
+        'generated': datetime.now().isoformat(),
+        'entities': {}
+    }
+
+    for entity_name, records in entities_data.items():
+        if not records:
+            continue
+
+        table = entity_table(pa, records)
+        file_name = f"{prefix}{entity_name}.{FILE_EXTENSIONS[fmt]}"
+        path = directory / file_name
+
+        if fmt == 'parquet':
+            pa.parquet.write_table(table, path, compression='zstd')
+        else:
+            pa.feather.write_feather(table, path, compression='uncompressed')
+
+        manifest['entities'][entity_name] = {
+            'file': file_name,
+            'rows': table.num_rows,
+            'columns': [{'name': field.name, 'type': str(field.type)} for field in table.schema]
+        }
+
+    manifest_path = directory / f"{prefix}manifest.json"
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    return str(manifest_path)
+
+
+def read_columnar(manifest_path: str) -> Dict[str, List[Dict]]:
+    """Entidades escritas por `write_columnar` como listas de registros (acepta el directorio)"""
+    path = Path(manifest_path)
+    if path.is_dir():
+        path = path / 'manifest.json'
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    pa = require_pyarrow()
+    entities = {}
+    for entity_name, entry in manifest['entities'].items():
+        file_path = path.parent / entry['file']
+        if manifest['format'] == 'parquet':
+            table = pa.parquet.read_table(file_path)
+        else:
+            table = pa.feather.read_table(file_path, memory_map=True)
+        entities[entity_name] = table.to_pylist()
+    return entities
@@ -0,0 +1,257 @@
+"""
+ALMACÉN INCREMENTAL DE excel_data.json
+Fusión por clave con semántica upsert: los cambios se agregan a un registro
+de cambios (JSON Lines) junto al snapshot y sólo se reescribe el snapshot
+completo al compactar (por umbral o a pedido). Un índice pequeño de claves y
+conteos responde "¿existe?" / "¿cuántos hay?" sin leer el dataset.
+
+    public/excel_data.json                 snapshot (lo que lee el frontend)
+    public/.excel_data.changes.jsonl       cambios pendientes de compactar
+    public/.excel_data.keys.json           claves por entidad y conteos
+    public/excel_data.backup.json          snapshot anterior a la última compactación
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+from json_stream import dump_json
+
+# Clave primaria estable por entidad
+ENTITY_KEYS = {
+    'distribuidores': 'nombre',
+    'clientes': 'nombre',
+    'compras': 'id'
+}
+
+INDEX_VERSION = 1
+DEFAULT_COMPACT_RATIO = 0.5
+DEFAULT_COMPACT_OPS = 1000
+
+
+def sidecar_path(snapshot: Path, suffix: str) -> Path:
+    return snapshot.with_name(f'.{snapshot.stem}{suffix}')
+
+
+def snapshot_fingerprint(path: Path) -> Optional[List[int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_log(log_path: Path) -> Iterator[Dict]:
+    """Operaciones del registro de cambios en orden (nada si no existe)"""
+    if not log_path.exists():
+        return
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def apply_change(data: Dict, change: Dict, positions: Dict[str, Dict[Hashable, Dict]]):
+    """Aplica una operación del registro sobre el dataset en memoria"""
+    if change['op'] == 'set':
+        data[change['field']] = change['value']
+        positions.pop(change['field'], None)
+        return
+
+    entity = change['entity']
+    records = data.setdefault(entity, [])
+    if entity not in positions:
+        # Igual que {r[clave]: r for r in ...}: con claves repetidas gana la última
+        key_field = ENTITY_KEYS[entity]
+        positions[entity] = {record.get(key_field): record for record in records}
+
+    existing = positions[entity].get(change['key'])
+    if existing is not None:
+        existing.update(change.get('update') or {})
+    elif change.get('insert') is not None:
+        records.append(change['insert'])
+        positions[entity][change['key']] = change['insert']
+
+
+class DatasetStore:
+    """
+    Snapshot + registro de cambios con upsert por clave.
+    Las operaciones se acumulan en memoria hasta `commit`, que las agrega al
+    registro (y compacta si el registro ya pesa demasiado o si se pide).
+    """
+
+    def __init__(self, snapshot_path: str, compact_ratio: float = DEFAULT_COMPACT_RATIO,
+                 compact_ops: int = DEFAULT_COMPACT_OPS):
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = sidecar_path(self.snapshot_path, '.changes.jsonl')
+        self.index_path = sidecar_path(self.snapshot_path, '.keys.json')
+        self.backup_path = self.snapshot_path.with_name(f'{self.snapshot_path.stem}.backup.json')
+        self.compact_ratio = compact_ratio
+        self.compact_ops = compact_ops
+        self.pending: List[Dict] = []
+        # Cambios del registro que se reaplicaron sobre un snapshot reescrito por otro proceso
+        self.replayed_ops = 0
+
+        self.index = self._load_index()
+        self.key_sets = {entity: set(keys) for entity, keys in self.index['keys'].items()}
+
+    # ------------------------------------------------------------------ índice
+
+    def _load_index(self) -> Dict:
+        try:
+            index = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            index = None
+
+        log_bytes = self.log_path.stat().st_size if self.log_path.exists() else 0
+        if (index and index.get('version') == INDEX_VERSION
+                and index.get('snapshot') == snapshot_fingerprint(self.snapshot_path)
+                and index.get('log_bytes') == log_bytes):
+            return index
+
+        # Índice ausente o desactualizado: reconstruirlo leyendo todo una vez.
+        # Si el snapshot cambió (reimportación, checkout, copia o sólo la fecha)
+        # los cambios pendientes no se pierden: son upserts por clave y se
+        # reaplican sobre el snapshot nuevo, igual que al leer el dataset
+        index_snapshot = index.get('snapshot') if index else None
+        rebuilt = self._build_index(self.load(), log_bytes)
+        if index_snapshot is not None and index_snapshot != rebuilt['snapshot']:
+            self.replayed_ops = rebuilt['log_ops']
+        dump_json(rebuilt, str(self.index_path), compact=True)
+        return rebuilt
+
+    def _build_index(self, data: Dict, log_bytes: int, log_ops: Optional[int] = None) -> Dict:
+        if log_ops is None:
+            log_ops = sum(1 for _ in self._read_log())
+        return {
+            'version': INDEX_VERSION,
+            'snapshot': snapshot_fingerprint(self.snapshot_path),
+            'log_bytes': log_bytes,
+            'log_ops': log_ops,
+            'keys': {entity: [record.get(key_field) for record in data.get(entity) or []]
+                     for entity, key_field in ENTITY_KEYS.items()},
+            'counts': {field: len(value) for field, value in data.items() if isinstance(value, list)}
+        }
+
+    def _save_index(self):
+        dump_json(self.index, str(self.index_path), compact=True)
+
+    # --------------------------------------------------------------- consultas
+
+    def exists(self, entity: str, key: Hashable) -> bool:
+        return key in self.key_sets.get(entity, ())
+
+    def count(self, field: str) -> int:
+        """Registros actuales de una lista del dataset (incluye cambios sin compactar)"""
+        if field in ENTITY_KEYS:
+            return len(self.index['keys'].get(field, []))
+        return self.index['counts'].get(field, 0)
+
+    def pending_ops(self) -> int:
+        return self.index['log_ops'] + len(self.pending)
+
+    # ------------------------------------------------------------- operaciones
+
+    def upsert(self, entity: str, key: Hashable, update: Optional[Dict] = None,
+               insert: Optional[Dict] = None) -> bool:
+        """
+        Si la clave existe aplica `update` sobre el registro; si no, agrega
+        `insert` (si se da). Devuelve True si la clave no existía.
+        """
+        if entity not in ENTITY_KEYS:
+            raise ValueError(f"Entidad sin clave definida: {entity} (opciones: {', '.join(ENTITY_KEYS)})")
+
+        inserted = not self.exists(entity, key)
+        self.pending.append({'op': 'upsert', 'entity': entity, 'key': key, 'update': update, 'insert': insert})
+
+        if inserted and insert is not None:
+            self.index['keys'].setdefault(entity, []).append(key)
+            self.key_sets.setdefault(entity, set()).add(key)
+            self.index['counts'][entity] = len(self.index['keys'][entity])
+        return inserted
+
+    def set(self, field: str, value: Any):
+        """Reemplaza un campo de primer nivel completo (bancos, almacen, metadatos...)"""
+        self.pending.append({'op': 'set', 'field': field, 'value': value})
+
+        if isinstance(value, list):
+            self.index['counts'][field] = len(value)
+            if field in ENTITY_KEYS:
+                keys = [record.get(ENTITY_KEYS[field]) for record in value]
+                self.index['keys'][field] = keys
+                self.key_sets[field] = set(keys)
+        else:
+            self.index['counts'].pop(field, None)
+
+    # -------------------------------------------------------- lectura/escritura
+
+    def _read_log(self):
+        return read_log(self.log_path)
+
+    def load(self) -> Dict:
+        """Dataset actual completo: snapshot + cambios del registro + pendientes"""
+        try:
+            data = json.loads(self.snapshot_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            data = {}
+
+        positions = {}
+        for change in self._read_log():
+            apply_change(data, change, positions)
+        for change in self.pending:
+            apply_change(data, change, positions)
+        return data
+
+    def commit(self, compact: Optional[bool] = None) -> bool:
+        """
+        Agrega las operaciones pendientes al registro. Compacta si `compact` es
+        True, o (si es None) cuando el registro supera el umbral. Devuelve True
+        si se compactó.
+        """
+        if self.pending:
+            lines = ''.join(json.dumps(change, ensure_ascii=False, default=str) + '\n'
+                            for change in self.pending)
+            with open(self.log_path, 'a', encoding='utf-8', newline='') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.index['log_ops'] += len(self.pending)
+            self.index['log_bytes'] = self.log_path.stat().st_size
+            self.pending = []
+            self._save_index()
+
+        if compact is None:
+            snapshot = snapshot_fingerprint(self.snapshot_path)
+            snapshot_bytes = snapshot[0] if snapshot else 0
+            compact = (self.index['log_ops'] >= self.compact_ops
+                       or self.index['log_bytes'] > self.compact_ratio * snapshot_bytes)
+
+        if compact and (self.index['log_ops'] or not self.snapshot_path.exists()):
+            self.compact()
+            return True
+        return False
+
+    def compact(self):
+        """Reescribe el snapshot con todos los cambios y vacía el registro"""
+        data = self.load()
+
+        # Respaldo del snapshot anterior sin volver a escribirlo (enlace o copia)
+        if self.snapshot_path.exists():
+            fd, backup_tmp = tempfile.mkstemp(dir=self.backup_path.parent, suffix='.tmp')
+            os.close(fd)
+            os.unlink(backup_tmp)
+            try:
+                os.link(self.snapshot_path, backup_tmp)
+            except OSError:
+                shutil.copy2(self.snapshot_path, backup_tmp)
+            os.replace(backup_tmp, self.backup_path)
+
+        dump_json(data, str(self.snapshot_path))
+        self.log_path.unlink(missing_ok=True)
+        self.pending = []
+        self.index = self._build_index(data, 0, 0)
+        self.key_sets = {entity: set(keys) for entity, keys in self.index['keys'].items()}
+        self._save_index()
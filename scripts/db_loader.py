@@ -0,0 +1,220 @@
+"""
+CARGA DIRECTA A BASE DE DATOS
+Inserta las entidades mapeadas con executemany en transacciones por lotes.
+SQLite funciona sin dependencias; cualquier otro driver DB-API se elige por URL
+(postgresql://, mysql://) y se importa sólo si se usa.
+"""
+
+import importlib
+import json
+import math
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List
+from urllib.parse import unquote, urlparse
+
+from sql_emitter import entity_columns
+
+DEFAULT_DB_BATCH_SIZE = 1000
+
+# Esquema de la URL -> módulo DB-API opcional
+DRIVERS = {
+    'postgresql': 'psycopg2',
+    'postgres': 'psycopg2',
+    'mysql': 'pymysql'
+}
+
+
+def is_sqlite_url(url: str) -> bool:
+    return url.startswith('sqlite:') or '://' not in url
+
+
+def driver_module(url: str):
+    """Módulo DB-API para la URL (sqlite3 si es una ruta o sqlite:///)"""
+    if is_sqlite_url(url):
+        return sqlite3
+
+    scheme = urlparse(url).scheme.split('+')[0]
+    if scheme not in DRIVERS:
+        raise ValueError(f"Esquema de base de datos no soportado: {scheme} (opciones: sqlite, {', '.join(DRIVERS)})")
+
+    try:
+        return importlib.import_module(DRIVERS[scheme])
+    except ImportError:
+        raise RuntimeError(f"Falta el driver '{DRIVERS[scheme]}' para {scheme}://; instálalo con pip") from None
+
+
+def connect(url: str):
+    """Abre una conexión DB-API a partir de la URL"""
+    module = driver_module(url)
+
+    if module is sqlite3:
+        path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url
+        return sqlite3.connect(path or ':memory:', timeout=30)
+
+    if module.__name__ == 'psycopg2':
+        return module.connect(url)
+
+    parsed = urlparse(url)
+    return module.connect(host=parsed.hostname, port=parsed.port or 3306,
+                          user=unquote(parsed.username or ''), password=unquote(parsed.password or ''),
+                          database=parsed.path.lstrip('/'), charset='utf8mb4')
+
+
+def placeholders(paramstyle: str, count: int) -> str:
+    """Marcadores de parámetros según el `paramstyle` del driver"""
+    if paramstyle == 'qmark':
+        return ', '.join('?' * count)
+    if paramstyle == 'numeric':
+        return ', '.join(f':{i}' for i in range(1, count + 1))
+    if paramstyle == 'named':
+        return ', '.join(f':p{i}' for i in range(count))
+    return ', '.join(['%s'] * count)  # format / pyformat
+
+
+def column_type(values: Iterable[Any]) -> str:
+    """Tipo SQL genérico que admite todos los valores no nulos de la columna"""
+    kinds = set()
+    for value in values:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        if isinstance(value, bool):
+            kinds.add('BOOLEAN')
+        elif isinstance(value, int):
+            kinds.add('BIGINT')
+        elif isinstance(value, float):
+            kinds.add('DOUBLE PRECISION')
+        elif isinstance(value, datetime):
+            kinds.add('TIMESTAMP')
+        else:
+            return 'TEXT'
+
+    if kinds == {'BIGINT', 'DOUBLE PRECISION'}:
+        return 'DOUBLE PRECISION'
+    return kinds.pop() if len(kinds) == 1 else 'TEXT'
+
+
+def value_adapter(sqlite: bool) -> Callable[[Any], Any]:
+    """Convierte valores de Python a tipos que todos los drivers aceptan"""
+    def adapt(value: Any) -> Any:
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        if sqlite and isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+    return adapt
+
+
+class ConnectionPool:
+    """Pool mínimo de conexiones: una por hilo activo, reutilizadas entre entidades"""
+
+    def __init__(self, url: str, size: int):
+        self.url = url
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                if self.created < self.size:
+                    self.created += 1
+                    return connect(self.url)
+            return self.idle.get()
+
+    def release(self, connection):
+        self.idle.put(connection)
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def driver_module_of(connection):
+    """Módulo DB-API al que pertenece una conexión"""
+    if isinstance(connection, sqlite3.Connection):
+        return sqlite3
+    return importlib.import_module(type(connection).__module__.split('.')[0])
+
+
+def load_entity(connection, table: str, records: List[Dict], batch_size: int = DEFAULT_DB_BATCH_SIZE,
+                create_tables: bool = True) -> Dict:
+    """Carga una entidad: executemany por lote, un commit por lote"""
+    if batch_size < 1:
+        raise ValueError(f"batch_size debe ser >= 1: {batch_size}")
+    module = driver_module_of(connection)
+    columns = entity_columns(records)
+    adapt = value_adapter(module is sqlite3)
+
+    started = time.perf_counter()
+    cursor = connection.cursor()
+
+    if create_tables:
+        types = [column_type(record.get(col) for record in records) for col in columns]
+        definition = ', '.join(f'{col} {kind}' for col, kind in zip(columns, types))
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({placeholders(module.paramstyle, len(columns))})")
+    named = module.paramstyle == 'named'
+
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        rows = [tuple(adapt(record.get(col)) for col in columns) for record in batch]
+        if named:
+            rows = [{f'p{i}': value for i, value in enumerate(row)} for row in rows]
+        cursor.executemany(sql, rows)
+        connection.commit()
+
+    cursor.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': len(records),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(len(records) / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def load_entities(entities_data: Dict[str, List[Dict]], url: str, batch_size: int = DEFAULT_DB_BATCH_SIZE,
+                  workers: int = 1, create_tables: bool = True) -> Dict[str, Dict]:
+    """
+    Carga todas las entidades no vacías y devuelve estadísticas por entidad.
+    Con workers > 1 las entidades se cargan en paralelo desde un pool de
+    conexiones (SQLite admite un solo escritor: se carga en serie).
+    """
+    entities = [(name, records) for name, records in entities_data.items() if records]
+    if is_sqlite_url(url):
+        workers = 1
+
+    pool = ConnectionPool(url, max(1, workers))
+
+    def load(item):
+        name, records = item
+        connection = pool.acquire()
+        try:
+            return name, load_entity(connection, name, records, batch_size, create_tables)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            pool.release(connection)
+
+    try:
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(load, entities))
+        else:
+            results = [load(item) for item in entities]
+    finally:
+        pool.close()
+
+    return dict(results)
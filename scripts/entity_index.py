@@ -0,0 +1,75 @@
+"""
+ÍNDICES HASH SOBRE ENTIDADES PARSEADAS
+Se construyen una sola vez sobre las listas ya parseadas (ventas, órdenes de
+compra, clientes) y dan búsquedas O(1); cada índice cuenta las claves que no
+encontraron registro para que la calidad del cruce quede visible.
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class HashIndex:
+    """Registros por clave; `keep` decide qué registro gana si la clave se repite"""
+
+    def __init__(self, records: Optional[List[Dict]], key: Callable[[Dict], Hashable], keep: str = 'first'):
+        if keep not in ('first', 'last'):
+            raise ValueError(f"keep debe ser 'first' o 'last', no {keep!r}")
+
+        self.rows: Dict[Hashable, Dict] = {}
+        for record in records or []:
+            record_key = key(record)
+            if keep == 'last' or record_key not in self.rows:
+                self.rows[record_key] = record
+
+        self.lookups = 0
+        self.unmatched_lookups = 0
+        self.unmatched_keys = set()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.rows
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Registro de la clave (o `default`), registrando si hubo coincidencia"""
+        self.lookups += 1
+        record = self.rows.get(key)
+        if record is None:
+            self.unmatched_lookups += 1
+            self.unmatched_keys.add(key)
+            return default
+        return record
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'keys': len(self.rows),
+            'lookups': self.lookups,
+            'matched': self.lookups - self.unmatched_lookups,
+            'unmatched': self.unmatched_lookups,
+            'unmatched_keys': len(self.unmatched_keys)
+        }
+
+
+class EntityIndexes:
+    """
+    Índices compartidos por los parsers:
+    ventas por (cliente, fecha), órdenes de compra por id y clientes por nombre.
+    Con claves repetidas se conserva lo que hacía cada búsqueda lineal:
+    la primera venta encontrada y la última OC del mapa.
+    """
+
+    def __init__(self, ventas: Optional[List[Dict]] = None, ordenes_compra: Optional[List[Dict]] = None,
+                 clientes: Optional[List[Dict]] = None):
+        self.ventas = HashIndex(ventas, lambda venta: (venta.get('cliente'), venta.get('fecha')))
+        self.ordenes_compra = HashIndex(ordenes_compra, lambda oc: oc['id'], keep='last')
+        self.clientes = HashIndex(clientes, lambda cliente: cliente.get('nombre'))
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Estadísticas de cruce por índice (sólo los que se consultaron)"""
+        indexes = {
+            'ventas': self.ventas,
+            'ordenesCompra': self.ordenes_compra,
+            'clientes': self.clientes
+        }
+        return {name: index.stats() for name, index in indexes.items() if index.lookups}
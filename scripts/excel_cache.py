@@ -0,0 +1,128 @@
+"""
+CACHÉ DE ANÁLISIS DIRECCIONADA POR CONTENIDO
+Guarda en disco resultados por hoja (análisis, extracción) bajo una clave
+derivada del hash de la hoja dentro del .xlsx y de la versión del código.
+Las entradas se desalojan por tamaño total en orden LRU.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Al desalojar se baja hasta esta fracción de `max_bytes`, para que las
+# escrituras siguientes no vuelvan a recorrer el directorio enseguida
+EVICT_TO = 0.9
+
+
+class AnalysisCache:
+    """
+    Caché en disco: un archivo pickle por entrada, LRU por fecha de acceso.
+    El tamaño total se lleva en memoria desde el último recorrido del
+    directorio; sólo se vuelve a recorrer cuando supera `max_bytes` (así
+    también se cuentan las entradas escritas por otros procesos).
+    """
+
+    def __init__(self, cache_dir: str, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+
+        # Aplicar el límite también al abrir (puede haberse reducido desde la última vez)
+        self.evict()
+
+    def key(self, namespace: str, digest: str) -> str:
+        """Clave de una entrada: versión del código + tipo de resultado + hash de la hoja"""
+        raw = f'{self.version}\0{namespace}\0{digest}'.encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.pkl'
+
+    def get(self, key: str) -> Optional[Any]:
+        """Devuelve el valor guardado o None; marca la entrada como usada recientemente"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Entrada corrupta o de un formato anterior: se descarta
+            self.total_bytes -= self._size(path)
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """Guarda una entrada de forma atómica y aplica el límite de tamaño"""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        replaced = self._size(path)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self.total_bytes += self._size(path) - replaced
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, namespace: str, digest: str, compute: Callable[[], Any]) -> Any:
+        """Resultado en caché para (namespace, digest) o lo calcula y lo guarda"""
+        key = self.key(namespace, digest)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def evict(self):
+        """
+        Recorre el directorio, recalcula el tamaño total y elimina las entradas
+        usadas hace más tiempo hasta bajar de EVICT_TO * `max_bytes`
+        """
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*.pkl'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            for _, size, path in sorted(entries):
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= target:
+                    break
+
+        self.total_bytes = total
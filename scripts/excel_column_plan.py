@@ -0,0 +1,235 @@
+"""
+PLAN DE RESOLUCIÓN DE COLUMNAS
+Resuelve cada campo lógico (lista de posibles nombres) a columnas físicas una
+sola vez por firma de encabezados y extrae/convierte columnas completas
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def parse_number(value: Any) -> float:
+    """Convierte un valor de texto a número (misma limpieza que `extract_numeric`)"""
+    if value is None:
+        return None
+
+    try:
+        # Limpiar formato de número
+        clean_value = str(value).replace(',', '').replace('$', '').replace('%', '').strip()
+        return float(clean_value)
+    except Exception:
+        return None
+
+
+def parse_date(value: Any) -> str:
+    """Convierte un valor de texto a fecha ISO (misma lógica que `extract_date`)"""
+    if value is None:
+        return None
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    try:
+        date = pd.to_datetime(value)
+        return date.isoformat()
+    except Exception:
+        return None
+
+
+CELL_NULL, CELL_NAT, CELL_STR, CELL_DATETIME, CELL_TIMEDELTA, CELL_OTHER = range(6)
+
+
+def type_kind(kind: type) -> int:
+    if kind is type(None):
+        return CELL_NULL
+    if kind is type(pd.NaT):
+        return CELL_NAT
+    if issubclass(kind, str):
+        return CELL_STR
+    if issubclass(kind, datetime):
+        return CELL_DATETIME
+    if issubclass(kind, timedelta):
+        return CELL_TIMEDELTA
+    return CELL_OTHER
+
+
+def cell_kinds(values: np.ndarray) -> np.ndarray:
+    """Clase de cada celda; se decide una vez por tipo de Python, no por celda"""
+    types = np.frompyfunc(type, 1, 1)(values)
+    codes, uniques = pd.factorize(types.ravel())
+    kinds = np.array([type_kind(kind) for kind in uniques], dtype=np.int8)[codes].reshape(values.shape)
+
+    floats = types == float
+    if floats.any():
+        # Sólo NaN cuenta como nulo entre los float
+        kinds[floats] = np.where(pd.isna(values[floats].astype(float)), CELL_NULL, CELL_OTHER)
+    return kinds
+
+
+def infer_row_types(values: np.ndarray) -> np.ndarray:
+    """
+    Reproduce la inferencia que hace `pd.Series(fila)` dentro de iterrows sobre
+    una matriz de objetos: filas sólo de texto pasan nulos a NaN y filas sólo
+    de fechas (o duraciones) pasan nulos a NaT y fechas a Timestamp.
+    """
+    kinds = cell_kinds(values)
+    present = np.stack([(kinds == kind).any(axis=1) for kind in range(6)], axis=1)
+
+    other = present[:, CELL_OTHER]
+    as_text = present[:, CELL_STR] & ~(present[:, CELL_NAT] | present[:, CELL_DATETIME]
+                                       | present[:, CELL_TIMEDELTA] | other)
+    as_datetime = ((present[:, CELL_DATETIME] | present[:, CELL_NAT])
+                   & ~(present[:, CELL_STR] | present[:, CELL_TIMEDELTA] | other))
+    as_timedelta = present[:, CELL_TIMEDELTA] & ~(present[:, CELL_STR] | present[:, CELL_DATETIME] | other)
+
+    values = values.copy()
+    nulls = kinds == CELL_NULL
+    values[nulls & as_text[:, None]] = np.nan
+    values[(nulls | (kinds == CELL_NAT)) & (as_datetime | as_timedelta)[:, None]] = pd.NaT
+
+    dates = (kinds == CELL_DATETIME) & as_datetime[:, None]
+    if dates.any():
+        values[dates] = [pd.Timestamp(value) for value in values[dates]]
+
+    generic = kinds == CELL_OTHER
+    if generic.any():
+        # to_dict() entrega tipos nativos de Python
+        values[generic] = [value.item() if isinstance(value, np.generic) else value
+                           for value in values[generic]]
+    return values
+
+
+class ColumnPlan:
+    """
+    Posiciones candidatas por campo para una firma de encabezados.
+    El orden reproduce la búsqueda de `extract_field`: por cada nombre,
+    coincidencia exacta, luego sin mayúsculas y luego por contenido.
+    """
+
+    def __init__(self, columns: Sequence):
+        self.columns = list(columns)
+        self.resolved: Dict[Tuple[str, ...], List[int]] = {}
+
+    @classmethod
+    def for_columns(cls, columns: Sequence) -> 'ColumnPlan':
+        """Plan compartido por todas las hojas con los mismos encabezados"""
+        return plan_for_signature(tuple(columns))
+
+    def candidates(self, possible_names: Sequence[str]) -> List[int]:
+        """Posiciones de columna a probar, en orden, para un campo lógico"""
+        key = tuple(possible_names)
+        positions = self.resolved.get(key)
+        if positions is not None:
+            return positions
+
+        positions = []
+        for name in key:
+            if name in self.columns:
+                positions.append(self.columns.index(name))
+
+            lowered = name.lower()
+            positions.extend(idx for idx, col in enumerate(self.columns)
+                             if col and str(col).lower() == lowered)
+            positions.extend(idx for idx, col in enumerate(self.columns)
+                             if col and name in str(col).lower())
+
+        # Una columna repetida no cambia el resultado: basta su primera aparición
+        positions = list(dict.fromkeys(positions))
+        self.resolved[key] = positions
+        return positions
+
+
+# Firmas de encabezados distintas que se recuerdan (se desalojan las menos usadas)
+MAX_PLANS = 256
+
+
+@lru_cache(maxsize=MAX_PLANS)
+def plan_for_signature(signature: Tuple) -> ColumnPlan:
+    return ColumnPlan(signature)
+
+
+class SheetFields:
+    """Extracción columnar de campos sobre un DataFrame de hoja"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.plan = ColumnPlan.for_columns(df.columns)
+        values = df.values
+        if values.dtype.kind in 'mM':
+            # iterrows entrega Timestamp, no datetime64
+            values = df.astype(object).values
+        # Misma matriz que recorre `df.iterrows()` (incluye su conversión de tipos)
+        self.values = values
+        self.length = len(df)
+
+    def raw_rows(self, positions: Sequence[int]) -> List[Dict]:
+        """Filas originales como dict (equivalente a `row.to_dict()` de iterrows)"""
+        values = self.values[positions]
+        if values.dtype == object and values.size:
+            values = infer_row_types(values)
+        return [dict(zip(self.plan.columns, row)) for row in values.tolist()]
+
+    def pick(self, possible_names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Primer valor no nulo por fila entre las columnas candidatas"""
+        picked = np.empty(self.length, dtype=self.values.dtype)
+        pending = np.ones(self.length, dtype=bool)
+
+        for pos in self.plan.candidates(possible_names):
+            column = self.values[:, pos]
+            take = pending & pd.notna(column)
+            picked[take] = column[take]
+            pending &= ~take
+
+        return picked, ~pending
+
+    def text(self, possible_names: Sequence[str]) -> List[Any]:
+        """Equivalente columnar de `extract_field`"""
+        picked, found = self.pick(possible_names)
+        result = np.full(self.length, None, dtype=object)
+        values = picked[found]
+
+        if self.values.dtype == object:
+            result[found] = [str(v).strip() if v else None for v in values]
+        else:
+            # Matriz homogénea (numérica o booleana): convertir sólo los distintos
+            codes, uniques = pd.factorize(values)
+            labels = np.array([None] + [str(v).strip() if v else None for v in uniques],
+                              dtype=object)
+            result[found] = labels[codes + 1]
+
+        return result.tolist()
+
+    def numeric(self, possible_names: Sequence[str]) -> List[Any]:
+        """Equivalente columnar de `extract_numeric`"""
+        picked, found = self.pick(possible_names)
+        result = np.full(self.length, None, dtype=object)
+
+        # str() seguido de float() devuelve el mismo número; 0 queda en None
+        if self.values.dtype.kind in 'fiu':
+            numbers = found
+        elif self.values.dtype == object:
+            types = np.frompyfunc(type, 1, 1)(picked)
+            numbers = found & ((types == float) | (types == int))
+        else:
+            numbers = np.zeros(self.length, dtype=bool)
+
+        if numbers.any():
+            numbers[numbers] = picked[numbers] != 0
+            result[numbers] = picked[numbers].astype(float).tolist()
+
+        rest = found & ~numbers
+        if rest.any():
+            result[rest] = [parse_number(str(v).strip() if v else None) for v in picked[rest]]
+        return result.tolist()
+
+    def date(self, possible_names: Sequence[str]) -> List[Any]:
+        """Equivalente columnar de `extract_date` (se interpreta cada texto distinto una vez)"""
+        texts = self.text(possible_names)
+        parsed = {}
+        for value in texts:
+            if value is not None and value not in parsed:
+                parsed[value] = parse_date(value)
+        return [parsed[value] if value is not None else None for value in texts]
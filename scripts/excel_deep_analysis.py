@@ -3,25 +3,33 @@ ANÁLISIS PROFUNDO Y ADAPTATIVO DEL EXCEL DE ADMINISTRACIÓN GENERAL
 Extracción inteligente basada en estructura real detectada
 """
 
+import argparse
 import json
 import warnings
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
 
-import openpyxl
 import pandas as pd
 
+from excel_cache import DEFAULT_MAX_BYTES, AnalysisCache
+from workbook_session import open_session
+
+# Forma parte de la clave de caché: subirla al cambiar el análisis por hoja
+ANALYZER_VERSION = '1.3.0'
+
 warnings.filterwarnings('ignore')
 
 
 class DeepExcelAnalyzer:
     """Analizador profundo adaptado a la estructura real"""
 
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, cache_dir: str = None, cache_max_bytes: int = DEFAULT_MAX_BYTES):
         self.excel_path = excel_path
-        self.workbook = openpyxl.load_workbook(excel_path, data_only=True)
+        # Un solo parseo del libro: valores, fórmulas y DataFrames salen de la sesión
+        self.session = open_session(excel_path)
         self.results = {}
+        self.cache = AnalysisCache(cache_dir, ANALYZER_VERSION, cache_max_bytes) if cache_dir else None
 
     def analyze_all_sheets(self):
         """Analiza todas las hojas en profundidad"""
@@ -46,7 +54,7 @@ class DeepExcelAnalyzer:
         ]
 
         for sheet_name in sheets:
-            if sheet_name in self.workbook.sheetnames:
+            if sheet_name in self.session.sheetnames:
                 print(f"\n{'='*100}")
                 print(f"📊 HOJA: {sheet_name}")
                 print(f"{'='*100}")
@@ -54,29 +62,54 @@ class DeepExcelAnalyzer:
 
     def analyze_specific_sheet(self, sheet_name: str):
         """Análisis específico por hoja"""
-        sheet = self.workbook[sheet_name]
-
-        # Información básica
-        print(f"Dimensiones: {sheet.max_row} filas x {sheet.max_column} columnas")
-
-        # Leer como DataFrame
-        df = pd.read_excel(self.excel_path, sheet_name=sheet_name, header=None)
+        summary = self.cached_sheet_summary(sheet_name)
+        self.session.release(sheet_name)
+        self.print_sheet_summary(summary)
+
+        if summary['result'] is not None:
+            # Guardar resultados
+            self.results[sheet_name] = summary['result']
+
+    def cached_sheet_summary(self, sheet_name: str) -> Dict:
+        """Resumen de la hoja desde la caché en disco si su contenido no cambió"""
+        if self.cache is None:
+            return self.summarize_sheet(sheet_name)
+
+        digest = self.session.sheet_digest(sheet_name)
+        return self.cache.get_or_compute(f'deep_sheet:{sheet_name}', digest, lambda: self.summarize_sheet(sheet_name))
+
+    def summarize_sheet(self, sheet_name: str) -> Dict:
+        """Calcula estructura, estadísticas y fórmulas de una hoja (sin imprimir)"""
+        snapshot = self.session.snapshot(sheet_name)
+
+        summary = {
+            'dimensions': (snapshot.max_row, snapshot.max_column),
+            'total_columns': 0,
+            'header_row': None,
+            'headers': [],
+            'total_rows': 0,
+            'sample': None,
+            'columns': [],
+            'result': None,
+            'formulas': self.analyze_formulas(sheet_name)
+        }
 
-        # Detectar estructura
-        print(f"\n🔍 ESTRUCTURA DETECTADA:")
-        print(f"Total de columnas: {len(df.columns)}")
+        # Leer como DataFrame (mismas filas ya leídas, sin reabrir el archivo)
+        df = self.session.frame(sheet_name, header=None)
+        summary['total_columns'] = len(df.columns)
 
-        # Buscar fila de encabezados
-        header_row = self.find_header_row(df)
-        print(f"Fila de encabezados: {header_row}")
+        # Fila de encabezados detectada (la primera si ninguna tiene texto suficiente)
+        layout = self.session.layout(sheet_name)
+        header_row = layout.header_row - 1 if layout.header_row else 0
+        summary['header_row'] = header_row
 
         if header_row is not None:
-            # Extraer encabezados
+            # Extraer encabezados; bajo títulos de grupo combinados, 'Grupo / Encabezado'
             headers = df.iloc[header_row].tolist()
-            print(f"\n📋 ENCABEZADOS ENCONTRADOS:")
-            for i, h in enumerate(headers):
-                if pd.notna(h) and str(h).strip():
-                    print(f"  Col {i+1}: {h}")
+            for idx, compound in enumerate(layout.compound[:len(headers)]):
+                if compound is not None and compound != layout.headers[idx]:
+                    headers[idx] = compound
+            summary['headers'] = headers
 
             # Datos desde la siguiente fila
             data_df = df.iloc[header_row+1:].copy()
@@ -87,72 +120,74 @@ class DeepExcelAnalyzer:
 
             # Eliminar filas completamente vacías
             data_df = data_df.dropna(how='all')
+            summary['total_rows'] = len(data_df)
 
-            print(f"\n📊 DATOS:")
-            print(f"Total registros con datos: {len(data_df)}")
-
-            # Muestra de datos
             if len(data_df) > 0:
-                print(f"\n📄 MUESTRA DE DATOS (primeras 5 filas):")
-                print(data_df.head().to_string())
+                summary['sample'] = data_df.head().to_string()
 
                 # Estadísticas por columna
-                print(f"\n📈 ESTADÍSTICAS POR COLUMNA:")
                 for col in data_df.columns:
-                    non_null = data_df[col].notna().sum()
-                    unique = data_df[col].nunique()
-                    print(f"  • {col}")
-                    print(f"    - Valores no nulos: {non_null}")
-                    print(f"    - Valores únicos: {unique}")
-
-                    # Muestra de valores
-                    sample = data_df[col].dropna().head(3).tolist()
-                    if sample:
-                        print(f"    - Muestra: {sample}")
+                    summary['columns'].append({
+                        'name': col,
+                        'non_null': data_df[col].notna().sum(),
+                        'unique': data_df[col].nunique(),
+                        'sample': data_df[col].dropna().head(3).tolist()
+                    })
 
-                # Guardar resultados
-                self.results[sheet_name] = {
+                summary['result'] = {
                     'headers': [h for h in headers if pd.notna(h)],
                     'total_rows': len(data_df),
                     'data': data_df.to_dict('records')
                 }
 
-        # Analizar fórmulas específicas
-        self.analyze_formulas(sheet_name, sheet)
+        return summary
 
-    def find_header_row(self, df: pd.DataFrame) -> int:
-        """Encuentra la fila que contiene los encabezados"""
-        for idx in range(min(10, len(df))):
-            row = df.iloc[idx]
-            # Contar celdas con texto válido
-            text_cells = sum(1 for cell in row if pd.notna(cell) and
-                           isinstance(cell, str) and len(str(cell).strip()) > 0)
+    def print_sheet_summary(self, summary: Dict):
+        """Imprime el resumen de una hoja"""
+        # Información básica
+        print(f"Dimensiones: {summary['dimensions'][0]} filas x {summary['dimensions'][1]} columnas")
 
-            # Si hay suficientes celdas con texto, probablemente es el encabezado
-            if text_cells >= 3:
-                return idx
+        # Detectar estructura
+        print(f"\n🔍 ESTRUCTURA DETECTADA:")
+        print(f"Total de columnas: {summary['total_columns']}")
+        print(f"Fila de encabezados: {summary['header_row']}")
 
-        return 0  # Por defecto la primera fila
+        if summary['header_row'] is not None:
+            print(f"\n📋 ENCABEZADOS ENCONTRADOS:")
+            for i, h in enumerate(summary['headers']):
+                if pd.notna(h) and str(h).strip():
+                    print(f"  Col {i+1}: {h}")
 
-    def analyze_formulas(self, sheet_name: str, sheet):
-        """Analiza fórmulas para entender lógica de negocio"""
-        formula_sheet = openpyxl.load_workbook(self.excel_path, data_only=False)[sheet_name]
-
-        formulas = []
-        for row in formula_sheet.iter_rows():
-            for cell in row:
-                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                    formulas.append({
-                        'cell': cell.coordinate,
-                        'formula': cell.value
-                    })
+            print(f"\n📊 DATOS:")
+            print(f"Total registros con datos: {summary['total_rows']}")
 
+            # Muestra de datos
+            if summary['sample'] is not None:
+                print(f"\n📄 MUESTRA DE DATOS (primeras 5 filas):")
+                print(summary['sample'])
+
+                print(f"\n📈 ESTADÍSTICAS POR COLUMNA:")
+                for column in summary['columns']:
+                    print(f"  • {column['name']}")
+                    print(f"    - Valores no nulos: {column['non_null']}")
+                    print(f"    - Valores únicos: {column['unique']}")
+
+                    # Muestra de valores
+                    if column['sample']:
+                        print(f"    - Muestra: {column['sample']}")
+
+        formulas = summary['formulas']
         if formulas:
             print(f"\n🧮 FÓRMULAS DETECTADAS: {len(formulas)}")
             # Mostrar algunas fórmulas representativas
             for f in formulas[:5]:
                 print(f"  • {f['cell']}: {f['formula']}")
 
+    def analyze_formulas(self, sheet_name: str) -> List[Dict]:
+        """Analiza fórmulas para entender lógica de negocio"""
+        return [{'cell': coordinate, 'formula': formula}
+                for coordinate, formula in self.session.formulas(sheet_name)]
+
     def map_to_flowdistributor(self):
         """Mapea datos a entidades de FlowDistributor"""
         print(f"\n{'='*100}")
@@ -487,9 +522,17 @@ def main():
     print("🚀 ANÁLISIS PROFUNDO Y ADAPTATIVO")
     print("="*100 + "\n")
 
-    excel_path = r"C:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx"
-
-    analyzer = DeepExcelAnalyzer(excel_path)
+    parser = argparse.ArgumentParser(description='Análisis profundo del Excel de Administración General')
+    parser.add_argument('excel_path', nargs='?',
+                        default=r"C:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx")
+    parser.add_argument('--cache-dir',
+                        help='Directorio de caché por hoja; las hojas sin cambios no se vuelven a analizar')
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Tamaño máximo de la caché (se desalojan las entradas menos usadas)')
+    args = parser.parse_args()
+
+    analyzer = DeepExcelAnalyzer(args.excel_path, cache_dir=args.cache_dir,
+                                 cache_max_bytes=args.cache_size_mb * 1024 * 1024)
 
     # Análisis completo
     analyzer.analyze_all_sheets()
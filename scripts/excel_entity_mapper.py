@@ -0,0 +1,281 @@
+"""
+MAPEADOR DECLARATIVO DE ENTIDADES
+Especificación de cada entidad de FlowDistributor (hojas, campos, alias,
+tipos y valores por defecto) y un motor único que construye cada tabla por
+columnas; los diccionarios por fila sólo se materializan a la salida
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from excel_column_plan import SheetFields
+from keyword_scanner import KeywordScanner
+
+
+@dataclass
+class FieldSpec:
+    """Campo de salida: `kind` es text/numeric/date (desde alias), const o now"""
+    name: str
+    kind: str
+    aliases: List[str] = field(default_factory=list)
+    default: Any = None
+
+
+@dataclass
+class EntitySpec:
+    """Entidad: hojas que la contienen, campos en orden y condición para conservar la fila"""
+    name: str
+    label: str
+    sheet_keywords: List[str]
+    fields: List[FieldSpec]
+    required: List[str]
+    require_all: bool = False
+
+
+def text(name: str, *aliases: str, default: Any = None) -> FieldSpec:
+    return FieldSpec(name, 'text', list(aliases), default)
+
+
+def numeric(name: str, *aliases: str) -> FieldSpec:
+    return FieldSpec(name, 'numeric', list(aliases))
+
+
+def date(name: str, *aliases: str) -> FieldSpec:
+    return FieldSpec(name, 'date', list(aliases))
+
+
+def const(name: str, value: Any) -> FieldSpec:
+    return FieldSpec(name, 'const', default=value)
+
+
+def now(name: str) -> FieldSpec:
+    return FieldSpec(name, 'now')
+
+
+ENTITY_SPECS: List[EntitySpec] = [
+    EntitySpec('productos', 'Productos extraídos',
+               ['producto', 'articulo', 'item', 'sku'], [
+                   text('codigo', 'codigo', 'sku', 'clave', 'id'),
+                   text('nombre', 'nombre', 'descripcion', 'producto', 'articulo'),
+                   text('descripcion', 'descripcion', 'detalle', 'descripcion_larga'),
+                   text('categoria', 'categoria', 'familia', 'grupo', 'tipo'),
+                   numeric('precio_base', 'precio', 'precio_base', 'precio_venta', 'pvp'),
+                   numeric('costo', 'costo', 'precio_costo', 'precio_compra'),
+                   numeric('stock_actual', 'stock', 'existencia', 'inventario', 'cantidad'),
+                   numeric('stock_minimo', 'stock_minimo', 'min', 'minimo'),
+                   numeric('stock_maximo', 'stock_maximo', 'max', 'maximo'),
+                   text('unidad_medida', 'unidad', 'unidad_medida', 'um', 'uom'),
+                   text('proveedor', 'proveedor', 'proveedor_principal', 'supplier'),
+                   const('estado', 'activo'),
+                   now('fecha_creacion')
+               ], required=['codigo']),
+    EntitySpec('clientes', 'Clientes extraídos',
+               ['cliente', 'customer', 'cte'], [
+                   text('codigo', 'codigo', 'codigo_cliente', 'id', 'clave'),
+                   text('razon_social', 'razon_social', 'nombre', 'empresa', 'cliente'),
+                   text('rfc', 'rfc', 'tax_id', 'nit'),
+                   text('tipo_cliente', 'tipo', 'tipo_cliente', 'categoria'),
+                   numeric('limite_credito', 'limite_credito', 'credito', 'credit_limit'),
+                   numeric('dias_credito', 'dias_credito', 'plazo', 'payment_terms'),
+                   numeric('descuento', 'descuento', 'discount', 'desc'),
+                   text('direccion', 'direccion', 'address', 'domicilio'),
+                   text('ciudad', 'ciudad', 'city'),
+                   text('estado', 'estado', 'state', 'provincia'),
+                   text('cp', 'cp', 'codigo_postal', 'zip'),
+                   text('telefono', 'telefono', 'phone', 'tel'),
+                   text('email', 'email', 'correo', 'mail'),
+                   text('contacto', 'contacto', 'contact', 'persona_contacto'),
+                   text('vendedor', 'vendedor', 'agente', 'sales_rep'),
+                   const('estado_cuenta', 'activo'),
+                   now('fecha_alta')
+               ], required=['codigo', 'razon_social']),
+    EntitySpec('ventas', 'Ventas extraídas',
+               ['venta', 'pedido', 'factura', 'orden', 'sale'], [
+                   text('folio', 'folio', 'numero', 'orden', 'id', 'invoice'),
+                   date('fecha', 'fecha', 'date', 'fecha_venta'),
+                   text('cliente_codigo', 'cliente', 'codigo_cliente', 'customer'),
+                   text('cliente_nombre', 'nombre_cliente', 'razon_social'),
+                   text('vendedor', 'vendedor', 'agente', 'sales_rep'),
+                   numeric('subtotal', 'subtotal', 'sub_total', 'importe'),
+                   numeric('descuento', 'descuento', 'discount'),
+                   numeric('impuestos', 'impuestos', 'iva', 'tax'),
+                   numeric('total', 'total', 'importe_total', 'grand_total'),
+                   text('tipo_documento', 'tipo', 'tipo_documento', 'document_type'),
+                   text('estado', 'estado', 'status', 'estatus'),
+                   text('forma_pago', 'forma_pago', 'payment_method', 'pago'),
+                   text('observaciones', 'observaciones', 'notas', 'comments')
+               ], required=['folio']),
+    EntitySpec('inventario', 'Inventario extraído',
+               ['inventario', 'stock', 'existencia', 'almacen'], [
+                   text('producto_codigo', 'codigo', 'sku', 'producto'),
+                   text('producto_nombre', 'nombre', 'descripcion', 'articulo'),
+                   text('almacen', 'almacen', 'bodega', 'warehouse'),
+                   text('ubicacion', 'ubicacion', 'location', 'posicion'),
+                   text('lote', 'lote', 'batch', 'serie'),
+                   numeric('cantidad', 'cantidad', 'existencia', 'stock', 'qty'),
+                   numeric('cantidad_reservada', 'reservada', 'reserved'),
+                   numeric('cantidad_disponible', 'disponible', 'available'),
+                   numeric('costo_unitario', 'costo', 'costo_unitario', 'unit_cost'),
+                   numeric('valor_total', 'valor', 'valor_total', 'total_value'),
+                   date('fecha_movimiento', 'fecha', 'fecha_movimiento', 'date'),
+                   text('tipo_movimiento', 'tipo', 'tipo_movimiento', 'movement_type')
+               ], required=['producto_codigo']),
+    EntitySpec('proveedores', 'Proveedores extraídos',
+               ['proveedor', 'supplier', 'vendor'], [
+                   text('codigo', 'codigo', 'id', 'clave'),
+                   text('razon_social', 'razon_social', 'nombre', 'empresa'),
+                   text('rfc', 'rfc', 'tax_id'),
+                   text('contacto', 'contacto', 'contact'),
+                   text('telefono', 'telefono', 'phone'),
+                   text('email', 'email', 'correo'),
+                   text('direccion', 'direccion', 'address'),
+                   numeric('dias_credito', 'dias_credito', 'plazo')
+               ], required=['codigo', 'razon_social']),
+    EntitySpec('compras', 'Compras extraídas',
+               ['compra', 'purchase', 'orden_compra'], [
+                   text('folio', 'folio', 'orden', 'numero'),
+                   date('fecha', 'fecha', 'date'),
+                   text('proveedor_codigo', 'proveedor', 'supplier'),
+                   numeric('total', 'total', 'importe'),
+                   text('estado', 'estado', 'status')
+               ], required=['folio']),
+    EntitySpec('usuarios', 'Usuarios extraídos',
+               ['usuario', 'user', 'empleado', 'vendedor'], [
+                   text('codigo', 'codigo', 'id', 'employee_id'),
+                   text('nombre', 'nombre', 'name'),
+                   text('email', 'email', 'correo'),
+                   text('rol', 'rol', 'role', 'puesto'),
+                   text('departamento', 'departamento', 'area')
+               ], required=['codigo', 'email']),
+    EntitySpec('almacenes', 'Almacenes extraídos',
+               ['almacen', 'bodega', 'warehouse'], [
+                   text('codigo', 'codigo', 'id'),
+                   text('nombre', 'nombre', 'name', 'descripcion'),
+                   text('ubicacion', 'ubicacion', 'location', 'direccion')
+               ], required=['codigo']),
+    EntitySpec('categorias', 'Categorías extraídas',
+               ['categoria', 'familia', 'grupo', 'category'], [
+                   text('codigo', 'codigo', 'id'),
+                   text('nombre', 'nombre', 'descripcion', 'category'),
+                   text('padre', 'padre', 'parent', 'categoria_padre')
+               ], required=['codigo', 'nombre']),
+    EntitySpec('precios', 'Precios extraídos',
+               ['precio', 'price', 'tarifa', 'lista_precio'], [
+                   text('producto_codigo', 'producto', 'codigo', 'sku'),
+                   text('lista_precio', 'lista', 'tipo_precio', 'price_list'),
+                   numeric('precio', 'precio', 'price', 'valor'),
+                   text('moneda', 'moneda', 'currency', default='MXN'),
+                   date('vigencia_desde', 'vigencia_desde', 'desde', 'valid_from'),
+                   date('vigencia_hasta', 'vigencia_hasta', 'hasta', 'valid_to')
+               ], required=['producto_codigo', 'precio'], require_all=True),
+    EntitySpec('descuentos', 'Descuentos extraídos',
+               ['descuento', 'discount', 'promocion'], [
+                   text('codigo', 'codigo', 'id'),
+                   text('descripcion', 'descripcion', 'nombre'),
+                   text('tipo', 'tipo', 'type'),
+                   numeric('valor', 'valor', 'porcentaje', 'descuento')
+               ], required=['codigo']),
+    EntitySpec('impuestos', 'Impuestos extraídos',
+               ['impuesto', 'tax', 'iva'], [
+                   text('codigo', 'codigo', 'id'),
+                   text('nombre', 'nombre', 'descripcion'),
+                   numeric('tasa', 'tasa', 'porcentaje', 'rate')
+               ], required=['codigo'])
+]
+
+ENTITY_SPECS_BY_NAME: Dict[str, EntitySpec] = {spec.name: spec for spec in ENTITY_SPECS}
+
+# Palabras clave de hoja de todas las entidades en un solo escáner
+SHEET_KEYWORDS = KeywordScanner({spec.name: spec.sheet_keywords for spec in ENTITY_SPECS})
+
+
+def build_columns(spec: EntitySpec, fields: SheetFields, timestamp: str) -> Dict[str, List[Any]]:
+    """Construye la tabla de la entidad columna por columna"""
+    columns = {}
+    for field_spec in spec.fields:
+        if field_spec.kind == 'const':
+            columns[field_spec.name] = [field_spec.default] * fields.length
+        elif field_spec.kind == 'now':
+            columns[field_spec.name] = [timestamp] * fields.length
+        else:
+            values = getattr(fields, field_spec.kind)(field_spec.aliases)
+            if field_spec.default is not None:
+                values = [value or field_spec.default for value in values]
+            columns[field_spec.name] = values
+    return columns
+
+
+def keep_mask(spec: EntitySpec, columns: Dict[str, List[Any]], length: int) -> np.ndarray:
+    """Filas que cumplen la condición de la entidad (veracidad de Python por valor)"""
+    masks = [np.array(columns[name], dtype=object).astype(bool) if length else np.zeros(0, dtype=bool)
+             for name in spec.required]
+    combine = np.logical_and if spec.require_all else np.logical_or
+    return combine.reduce(masks) if len(masks) > 1 else masks[0]
+
+
+def uuid4_batch(count: int) -> List[str]:
+    """`count` UUID versión 4 en texto, generados desde un solo bloque aleatorio"""
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # versión 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # variante RFC 4122
+    digits = raw.tobytes().hex()
+    return [f'{digits[i:i + 8]}-{digits[i + 8:i + 12]}-{digits[i + 12:i + 16]}-'
+            f'{digits[i + 16:i + 20]}-{digits[i + 20:i + 32]}'
+            for i in range(0, 32 * count, 32)]
+
+
+def sheet_rows(spec: EntitySpec, sheet_name: str, df: pd.DataFrame) -> List[Dict]:
+    """
+    Filas conservadas de la hoja con sólo lo que sale de la hoja (cacheable):
+    sin `id`, con los campos `now` en None y sin `import_date` en metadata
+    """
+    fields = SheetFields(df)
+    columns = build_columns(spec, fields, None)
+    keep = np.flatnonzero(keep_mask(spec, columns, fields.length))
+    if len(keep) == 0:
+        return []
+
+    names = list(columns)
+    table = [np.array(columns[name], dtype=object)[keep] for name in names]
+    raw_rows = fields.raw_rows(keep)
+    source_rows = (df.index.to_numpy()[keep] + 2).tolist()
+
+    rows = []
+    for position, values in enumerate(zip(*table)):
+        row = dict(zip(names, values))
+        row['metadata'] = {
+            'source_sheet': sheet_name,
+            'source_row': source_rows[position],
+            'raw_data': raw_rows[position]
+        }
+        rows.append(row)
+    return rows
+
+
+def stamp_records(spec: EntitySpec, rows: List[Dict], timestamp: str = None) -> List[Dict]:
+    """Registros nuevos con los valores de esta corrida: `id` UUID, campos `now` e `import_date`"""
+    timestamp = timestamp or datetime.now().isoformat()
+    stamped = [field_spec.name for field_spec in spec.fields if field_spec.kind == 'now']
+    ids = uuid4_batch(len(rows))
+
+    records = []
+    for record_id, row in zip(ids, rows):
+        record = {'id': record_id}
+        record.update(row)
+        for name in stamped:
+            record[name] = timestamp
+        metadata = row['metadata']
+        record['metadata'] = {
+            'source_sheet': metadata['source_sheet'],
+            'source_row': metadata['source_row'],
+            'import_date': timestamp,
+            'raw_data': metadata['raw_data']
+        }
+        records.append(record)
+    return records
+
@@ -4,25 +4,65 @@ Sistema de importación con 0% errores, trazabilidad completa
 Análisis profundo de estructura, relaciones y lógica de negocio
 """
 
-import json
-import re
-import uuid
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
-import numpy as np
-import openpyxl
 import pandas as pd
+from openpyxl.utils.cell import coordinate_from_string, get_column_letter, range_boundaries
+
+from classification_index import ClassificationIndex
+from columnar_output import COLUMNAR_FORMATS, write_columnar
+from db_loader import DEFAULT_DB_BATCH_SIZE, load_entities
+from excel_cache import DEFAULT_MAX_BYTES, AnalysisCache
+from excel_column_plan import ColumnPlan, parse_date, parse_number
+from excel_entity_mapper import ENTITY_SPECS_BY_NAME, sheet_rows, stamp_records
+from excel_profiling import SAMPLE_ROWS, SheetProfile, infer_column_type
+from excel_streaming import SheetSnapshot, StreamingWorkbookReader
+from formula_graph import FormulaGraph, formula_functions
+from header_layout import SCAN_ROWS
+from inclusion_dependencies import ColumnSketch, discover_inclusions, sketch_frame
+from json_stream import dump_json, iter_arrays
+from sql_emitter import DEFAULT_BATCH_SIZE, SQL_MODES, positive_int, write_entity
+from workbook_session import open_session
+
+# Forma parte de la clave de caché: subirla al cambiar el análisis o la extracción
+IMPORTER_VERSION = '2.4.0'
 
 
 class SurgicalExcelImporter:
     """Importador quirúrgico con análisis completo"""
 
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, streaming: bool = False, workers: int = 1,
+                 cache_dir: str = None, cache_max_bytes: int = DEFAULT_MAX_BYTES):
         self.excel_path = excel_path
-        self.workbook = openpyxl.load_workbook(excel_path, data_only=True)
-        self.full_workbook = openpyxl.load_workbook(excel_path, data_only=False)
+        self.streaming = streaming
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = AnalysisCache(cache_dir, IMPORTER_VERSION, cache_max_bytes) if cache_dir else None
+        self.session = open_session(excel_path)
+        self.workbook_references = None
+        self.formula_graph = None
+        self.index = None
+        self.inclusions = None
+        # Resultados de una lectura de hoja que esperan a su consumidor:
+        # (entidad, hoja) -> filas sin sellar y hoja -> bosquejos de claves
+        self.entity_rows: Dict[Tuple[str, str], List[Dict]] = {}
+        self.sketches: Dict[str, List[ColumnSketch]] = {}
+
+        if streaming:
+            # Una sola pasada por el XML de cada hoja: valores y fórmulas juntos
+            self.workbook = None
+            self.full_workbook = None
+            self.sheetnames = self.session.sheetnames
+        else:
+            self.workbook = self.session.workbook(data_only=True)
+            self.full_workbook = self.session.workbook(data_only=False)
+            self.sheetnames = self.workbook.sheetnames
+
         self.analysis_report = {
             'timestamp': datetime.now().isoformat(),
             'file': excel_path,
@@ -40,21 +80,176 @@ class SurgicalExcelImporter:
         print("🔍 INICIANDO ANÁLISIS QUIRÚRGICO DEL EXCEL")
         print("=" * 80)
 
-        for sheet_name in self.workbook.sheetnames:
+        if self.workers > 1 and len(self.sheetnames) > 1:
+            self.analyze_sheets_parallel()
+            return self.analysis_report
+
+        for sheet_name in self.sheetnames:
             print(f"\n📊 Analizando hoja: {sheet_name}")
             sheet_data = self.analyze_sheet(sheet_name)
             self.analysis_report['sheets'][sheet_name] = sheet_data
 
         return self.analysis_report
 
-    def analyze_sheet(self, sheet_name: str) -> Dict:
-        """Análisis detallado de cada hoja"""
+    def analyze_sheets_parallel(self):
+        """Reparte las hojas en un pool de procesos y combina en el orden del libro"""
+        reader = self.workbook_index()
+        sizes = {name: reader.sheet_size(name) for name in self.sheetnames}
+
+        # Las hojas más grandes se envían primero para que ninguna quede al final
+        by_cost = sorted(self.sheetnames, key=lambda name: sizes[name], reverse=True)
+        max_workers = min(self.workers, len(self.sheetnames))
+        print(f"⚙️  Analizando {len(self.sheetnames)} hojas con {max_workers} procesos")
+
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=init_sheet_worker,
+                                 initargs=(self.excel_path, self.cache_dir, self.cache_max_bytes)) as pool:
+            futures = {name: pool.submit(analyze_sheet_in_worker, name) for name in by_cost}
+
+            for sheet_name in self.sheetnames:
+                print(f"\n📊 Analizando hoja: {sheet_name}")
+                self.analysis_report['sheets'][sheet_name] = futures[sheet_name].result()
+
+    def workbook_index(self) -> StreamingWorkbookReader:
+        """Lector ligero del .xlsx para tamaños y hashes de hojas (también sin streaming)"""
+        return self.session.reader
+
+    def sheet_digest(self, sheet_name: str) -> str:
+        """Hash del contenido de la hoja dentro del .xlsx (se calcula una vez)"""
+        return self.session.sheet_digest(sheet_name)
+
+    def reference_resolver(self) -> FormulaGraph:
+        """Grafo vacío con los nombres definidos y tablas del libro (se leen una vez)"""
+        if self.workbook_references is None:
+            reader = self.workbook_index()
+            self.workbook_references = FormulaGraph(self.sheetnames, reader.defined_names, reader.tables)
+        return self.workbook_references
+
+    def formula_dependency_graph(self) -> FormulaGraph:
+        """Grafo de dependencias de todas las fórmulas analizadas (se arma una vez)"""
+        if self.formula_graph is None:
+            reader = self.workbook_index()
+            graph = FormulaGraph(self.sheetnames, reader.defined_names, reader.tables)
+            for sheet_name, sheet_data in self.analysis_report['sheets'].items():
+                for formula in sheet_data.get('formulas', []):
+                    graph.add_formula(sheet_name, formula['cell'], formula['formula'])
+            self.formula_graph = graph
+        return self.formula_graph
+
+    def classification(self) -> ClassificationIndex:
+        """Hojas -> entidades (nombre o encabezados) y columnas -> FK, una vez por libro"""
+        if self.index is None:
+            self.index = ClassificationIndex(self.sheetnames, self.session.first_row)
+        return self.index
+
+    def cached(self, namespace: str, sheet_name: str, compute: Callable[[], Any],
+               resolves_references: bool = False) -> Any:
+        """
+        Resultado por hoja desde la caché en disco (si está activa) o calculado.
+        Con `resolves_references` la clave incluye también los nombres definidos
+        y tablas del libro, que cambian lo que resuelven las fórmulas de la hoja.
+        """
+        if self.cache is None:
+            return compute()
+        digest = self.sheet_digest(sheet_name)
+        if resolves_references:
+            digest = f'{digest}:{self.workbook_index().references_digest()}'
+        # El nombre forma parte de la clave: los resultados lo incluyen (source_sheet)
+        return self.cache.get_or_compute(f'{namespace}:{sheet_name}', digest, compute)
+
+    def load_sheet_snapshot(self, sheet_name: str) -> SheetSnapshot:
+        """Obtiene valores, fórmulas y metadatos de una hoja desde el libro openpyxl"""
         sheet = self.workbook[sheet_name]
         formula_sheet = self.full_workbook[sheet_name]
 
+        snapshot = SheetSnapshot(
+            name=sheet_name,
+            max_row=sheet.max_row,
+            max_column=sheet.max_column,
+            rows=list(sheet.values)
+        )
+
+        for row in formula_sheet.iter_rows():
+            for cell in row:
+                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
+                    snapshot.formulas.append((cell.coordinate, cell.value))
+
+        if hasattr(sheet, 'data_validations'):
+            for dv in sheet.data_validations.dataValidation:
+                snapshot.validations.append({
+                    'cells': str(dv.sqref),
+                    'type': dv.type,
+                    'formula1': dv.formula1,
+                    'formula2': dv.formula2,
+                    'allow_blank': dv.allowBlank
+                })
+
+        if hasattr(sheet, 'merged_cells'):
+            snapshot.merged_cells = [str(mc) for mc in sheet.merged_cells.ranges]
+
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.comment:
+                    snapshot.comments.append({
+                        'cell': cell.coordinate,
+                        'comment': cell.comment.text
+                    })
+
+        return snapshot
+
+    def read_sheet_frame(self, sheet_name: str) -> pd.DataFrame:
+        """Lee la hoja como DataFrame (encabezados en la primera fila), una vez por sesión"""
+        return self.session.frame(sheet_name)
+
+    def analyze_sheet(self, sheet_name: str) -> Dict:
+        """Análisis detallado de cada hoja (reutiliza la caché si la hoja no cambió)"""
+        analysis = self.cached('analyze_sheet', sheet_name, lambda: self.build_sheet_analysis(sheet_name),
+                               resolves_references=True)
+        self.session.release(sheet_name)
+        return analysis
+
+    def stream_sheet(self, sheet_name: str, profile: SheetProfile) -> SheetSnapshot:
+        """
+        Recorre la hoja fila por fila alimentando `profile`; devuelve dimensiones,
+        fórmulas y metadatos sin la rejilla (`rows` queda vacío)
+        """
+        snapshot = SheetSnapshot(name=sheet_name)
+        for row in self.workbook_index().iter_rows(sheet_name, extras=snapshot):
+            if not row.values:
+                continue
+            profile.add_row(row.index, tuple(row.values.get(col) for col in range(1, max(row.values) + 1)))
+            for col_idx, formula in row.formulas.items():
+                snapshot.formulas.append((f'{get_column_letter(col_idx)}{row.index}', formula))
+
+        # Como en read_sheet: los rangos combinados cuentan en las dimensiones
+        for merged in snapshot.merged_cells:
+            _, _, max_col, max_row = range_boundaries(merged)
+            snapshot.max_row = max(snapshot.max_row, max_row)
+            snapshot.max_column = max(snapshot.max_column, max_col)
+        profile.finish(snapshot.max_row, snapshot.max_column)
+
+        # Ventana de encabezados para session.layout() sin otra pasada
+        self.session.heads[sheet_name] = (profile.dense_head(SCAN_ROWS), snapshot.merged_cells)
+
+        snapshot.max_row = profile.max_row or 1
+        snapshot.max_column = profile.max_column or 1
+        snapshot.comments = self.workbook_index().read_comments(sheet_name)
+        return snapshot
+
+    def build_sheet_analysis(self, sheet_name: str) -> Dict:
+        """Calcula el análisis detallado de una hoja (con --streaming, fila por fila)"""
+        profile = SheetProfile()
+        if self.streaming:
+            snapshot = self.stream_sheet(sheet_name, profile)
+        else:
+            snapshot = self.load_sheet_snapshot(sheet_name)
+            for index, row in enumerate(snapshot.rows, 1):
+                profile.add_row(index, row)
+            profile.finish()
+
         analysis = {
             'name': sheet_name,
-            'dimensions': f"{sheet.max_row} filas x {sheet.max_column} columnas",
+            'dimensions': f"{snapshot.max_row} filas x {snapshot.max_column} columnas",
             'headers': [],
             'data_types': {},
             'formulas': [],
@@ -70,199 +265,120 @@ class SurgicalExcelImporter:
             'business_rules': []
         }
 
-        # Detectar encabezados
-        first_row = list(sheet.iter_rows(min_row=1, max_row=1, values_only=True))[0]
-        analysis['headers'] = [h for h in first_row if h is not None]
-
-        # Analizar tipos de datos por columna
-        for idx, header in enumerate(analysis['headers'], 1):
-            col_letter = openpyxl.utils.get_column_letter(idx)
-            col_data = [cell.value for cell in sheet[col_letter][1:] if cell.value is not None]
-
-            data_type = self.detect_data_type(col_data)
-            analysis['data_types'][header] = {
-                'type': data_type,
-                'nullable': None in [cell.value for cell in sheet[col_letter][1:]],
-                'unique_values': len(set(col_data)),
-                'sample_values': col_data[:5] if col_data else []
-            }
-
-        # Extraer fórmulas
-        for row in formula_sheet.iter_rows(min_row=2):
-            for cell in row:
-                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                    analysis['formulas'].append({
-                        'cell': cell.coordinate,
-                        'formula': cell.value,
-                        'dependencies': self.extract_formula_dependencies(cell.value)
-                    })
+        # Encabezados (fila 1) y perfil de cada columna, calculados por bloques de filas
+        analysis['headers'] = profile.headers
+        analysis['data_types'] = profile.profiles()
 
-        # Detectar validaciones de datos
-        if hasattr(sheet, 'data_validations'):
-            for dv in sheet.data_validations.dataValidation:
-                analysis['validations'].append({
-                    'cells': str(dv.sqref),
-                    'type': dv.type,
-                    'formula1': dv.formula1,
-                    'formula2': dv.formula2,
-                    'allow_blank': dv.allowBlank
-                })
+        # Extraer fórmulas (desde la fila 2)
+        for coordinate, formula in snapshot.formulas:
+            if coordinate_from_string(coordinate)[1] < 2:
+                continue
+            analysis['formulas'].append({
+                'cell': coordinate,
+                'formula': formula,
+                'dependencies': self.extract_formula_dependencies(formula, sheet_name, coordinate)
+            })
 
-        # Celdas combinadas
-        if hasattr(sheet, 'merged_cells'):
-            analysis['merged_cells'] = [str(mc) for mc in sheet.merged_cells.ranges]
-
-        # Comentarios
-        for cell in sheet:
-            if hasattr(cell, 'comment') and cell.comment:
-                analysis['comments'].append({
-                    'cell': cell.coordinate,
-                    'comment': cell.comment.text
-                })
+        # Validaciones de datos, celdas combinadas y comentarios
+        analysis['validations'] = snapshot.validations
+        analysis['merged_cells'] = snapshot.merged_cells
+        analysis['comments'] = snapshot.comments
 
-        # Extraer datos completos
-        df = pd.DataFrame(sheet.values)
-        if len(df) > 0:
-            df.columns = df.iloc[0]
-            df = df[1:]
+        if profile.max_row:
+            # Encabezados y primeras filas con los tipos de pandas de la hoja completa
+            head = profile.frame_head()
 
             # Muestra de datos
-            analysis['data_sample'] = df.head(10).to_dict('records')
+            analysis['data_sample'] = head.head(min(SAMPLE_ROWS, profile.data_rows)).to_dict('records')
 
             # Estadísticas
-            analysis['statistics'] = {
-                'total_rows': len(df),
-                'total_columns': len(df.columns),
-                'null_counts': df.isnull().sum().to_dict(),
-                'duplicate_rows': df.duplicated().sum()
-            }
+            analysis['statistics'] = profile.statistics(head.columns)
 
             # Detectar relaciones (claves foráneas potenciales)
-            analysis['relationships_detected'] = self.detect_relationships(df, sheet_name)
+            analysis['relationships_detected'] = self.detect_relationships(head.columns, profile, sheet_name)
 
         return analysis
 
     def detect_data_type(self, values: List) -> str:
         """Detecta el tipo de dato predominante"""
-        if not values:
-            return 'EMPTY'
-
-        types_count = {
-            'DATE': 0,
-            'DATETIME': 0,
-            'NUMERIC': 0,
-            'INTEGER': 0,
-            'DECIMAL': 0,
-            'CURRENCY': 0,
-            'PERCENTAGE': 0,
-            'TEXT': 0,
-            'BOOLEAN': 0,
-            'EMAIL': 0,
-            'PHONE': 0,
-            'UUID': 0
-        }
+        return infer_column_type(values)
 
-        for val in values:
-            if val is None:
-                continue
+    def extract_formula_dependencies(self, formula: str, sheet_name: str = None, coordinate: str = None) -> List[str]:
+        """Referencias de una fórmula (celdas, rangos, otras hojas, tablas y nombres definidos)"""
+        return [text for text, _ in self.reference_resolver().references(formula, sheet_name, coordinate)]
 
-            if isinstance(val, datetime):
-                types_count['DATETIME'] += 1
-            elif isinstance(val, (int, np.integer)):
-                types_count['INTEGER'] += 1
-            elif isinstance(val, (float, np.floating)):
-                types_count['DECIMAL'] += 1
-            elif isinstance(val, bool):
-                types_count['BOOLEAN'] += 1
-            elif isinstance(val, str):
-                if re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', val, re.I):
-                    types_count['UUID'] += 1
-                elif re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', val):
-                    types_count['EMAIL'] += 1
-                elif re.match(r'^\+?[\d\s\-\(\)]+$', val):
-                    types_count['PHONE'] += 1
-                elif '%' in val:
-                    types_count['PERCENTAGE'] += 1
-                elif any(c in val for c in '$€£¥'):
-                    types_count['CURRENCY'] += 1
-                else:
-                    types_count['TEXT'] += 1
-
-        return max(types_count.items(), key=lambda x: x[1])[0]
-
-    def extract_formula_dependencies(self, formula: str) -> List[str]:
-        """Extrae referencias de celdas de una fórmula"""
-        # Patrón para celdas (A1, B2, etc.)
-        cell_pattern = r'\b[A-Z]+\d+\b'
-        # Patrón para rangos (A1:B10)
-        range_pattern = r'\b[A-Z]+\d+:[A-Z]+\d+\b'
-        # Patrón para otras hojas (Sheet1!A1)
-        sheet_pattern = r'\b\w+![A-Z]+\d+\b'
-
-        dependencies = []
-        dependencies.extend(re.findall(cell_pattern, formula))
-        dependencies.extend(re.findall(range_pattern, formula))
-        dependencies.extend(re.findall(sheet_pattern, formula))
-
-        return list(set(dependencies))
-
-    def detect_relationships(self, df: pd.DataFrame, sheet_name: str) -> List[Dict]:
+    def detect_relationships(self, columns: pd.Index, profile: SheetProfile, sheet_name: str) -> List[Dict]:
         """Detecta relaciones potenciales entre tablas"""
         relationships = []
 
         # Buscar columnas que parecen claves foráneas
-        for col in df.columns:
+        index = self.classification()
+        for position, col in enumerate(columns):
             if col is None:
                 continue
 
-            col_str = str(col).lower()
-
-            # Patrones comunes de FK
-            fk_patterns = [
-                r'.*_id$',
-                r'id_.*',
-                r'.*codigo.*',
-                r'.*clave.*',
-                r'.*folio.*',
-                r'.*ref.*'
-            ]
-
-            for pattern in fk_patterns:
-                if re.match(pattern, col_str):
-                    # Analizar valores únicos y no nulos
-                    unique_ratio = df[col].nunique() / len(df[col].dropna())
-
-                    relationships.append({
-                        'source_sheet': sheet_name,
-                        'source_column': col,
-                        'relationship_type': 'FOREIGN_KEY' if unique_ratio < 0.9 else 'PRIMARY_KEY',
-                        'confidence': unique_ratio,
-                        'target_hint': self.guess_target_table(col_str)
-                    })
+            column = index.column(col)
+            if not column.fk_patterns:
+                continue
+
+            # Analizar valores únicos y no nulos
+            unique_ratio = profile.unique_ratio(position)
+
+            # Una relación por patrón de FK que cumple la columna
+            for _ in column.fk_patterns:
+                relationships.append({
+                    'source_sheet': sheet_name,
+                    'source_column': col,
+                    'relationship_type': 'FOREIGN_KEY' if unique_ratio < 0.9 else 'PRIMARY_KEY',
+                    'confidence': unique_ratio,
+                    'target_hint': column.target
+                })
 
         return relationships
 
+    def key_sketches(self, sheet_name: str) -> List[ColumnSketch]:
+        """Bosquejos de valores de las columnas de la hoja (en caché si la hoja no cambió)"""
+        if sheet_name not in self.sketches:
+            self.sketches[sheet_name] = self.cached('key_sketches', sheet_name,
+                                                    lambda: self.build_key_sketches(sheet_name))
+            self.session.release(sheet_name)
+        return self.sketches[sheet_name]
+
+    def build_key_sketches(self, sheet_name: str) -> List[ColumnSketch]:
+        # Con los encabezados donde estén, no necesariamente en la fila 1
+        header_row = self.session.layout(sheet_name).header_row
+        return sketch_frame(sheet_name, self.session.frame(sheet_name, header=max(header_row - 1, 0)))
+
+    def read_sheet_entities(self, sheet_name: str):
+        """
+        Con una sola lectura del DataFrame de la hoja: filas de cada entidad que
+        la usa y bosquejos de claves. Después se suelta la hoja; los resultados
+        esperan en memoria a extract_entity y key_sketches.
+        """
+        for entity in self.classification().sheet_entities[sheet_name]:
+            spec = ENTITY_SPECS_BY_NAME[entity]
+            self.entity_rows[(entity, sheet_name)] = self.cached(
+                f'entity:{entity}', sheet_name,
+                lambda: sheet_rows(spec, sheet_name, self.read_sheet_frame(sheet_name))
+            )
+        if sheet_name not in self.sketches:
+            self.sketches[sheet_name] = self.cached('key_sketches', sheet_name,
+                                                    lambda: self.build_key_sketches(sheet_name))
+        self.session.release(sheet_name)
+
+    def discover_foreign_keys(self) -> List[Dict]:
+        """Claves foráneas entre hojas por contención de valores (una vez por libro)"""
+        if self.inclusions is None:
+            sketches = [sketch for sheet_name in self.sheetnames for sketch in self.key_sketches(sheet_name)]
+            self.inclusions = discover_inclusions(sketches)
+            self.analysis_report['relationships'] = self.inclusions
+            print(f"🔑 Claves foráneas por contenido: {len(self.inclusions)} "
+                  f"({len(sketches)} columnas candidatas)")
+        return self.inclusions
+
     def guess_target_table(self, column_name: str) -> str:
         """Adivina la tabla objetivo basándose en el nombre de columna"""
-        mappings = {
-            'cliente': 'clientes',
-            'producto': 'productos',
-            'vendedor': 'vendedores',
-            'proveedor': 'proveedores',
-            'almacen': 'almacenes',
-            'categoria': 'categorias',
-            'venta': 'ventas',
-            'compra': 'compras',
-            'usuario': 'usuarios',
-            'pedido': 'pedidos',
-            'factura': 'facturas'
-        }
-
-        for key, value in mappings.items():
-            if key in column_name:
-                return value
-
-        return 'UNKNOWN'
+        return self.classification().column(column_name).target
 
     def map_to_flowdistributor_entities(self) -> Dict:
         """Mapea datos del Excel a entidades de FlowDistributor"""
@@ -286,469 +402,87 @@ class SurgicalExcelImporter:
 
         return mapping
 
-    def extract_productos(self) -> List[Dict]:
-        """Extrae productos del Excel"""
-        productos = []
-
-        # Buscar hojas que contengan productos
-        product_sheets = [s for s in self.workbook.sheetnames
-                         if any(word in s.lower() for word in ['producto', 'articulo', 'item', 'sku'])]
-
-        for sheet_name in product_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                producto = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'sku', 'clave', 'id']),
-                    'nombre': self.extract_field(row, ['nombre', 'descripcion', 'producto', 'articulo']),
-                    'descripcion': self.extract_field(row, ['descripcion', 'detalle', 'descripcion_larga']),
-                    'categoria': self.extract_field(row, ['categoria', 'familia', 'grupo', 'tipo']),
-                    'precio_base': self.extract_numeric(row, ['precio', 'precio_base', 'precio_venta', 'pvp']),
-                    'costo': self.extract_numeric(row, ['costo', 'precio_costo', 'precio_compra']),
-                    'stock_actual': self.extract_numeric(row, ['stock', 'existencia', 'inventario', 'cantidad']),
-                    'stock_minimo': self.extract_numeric(row, ['stock_minimo', 'min', 'minimo']),
-                    'stock_maximo': self.extract_numeric(row, ['stock_maximo', 'max', 'maximo']),
-                    'unidad_medida': self.extract_field(row, ['unidad', 'unidad_medida', 'um', 'uom']),
-                    'proveedor': self.extract_field(row, ['proveedor', 'proveedor_principal', 'supplier']),
-                    'estado': 'activo',
-                    'fecha_creacion': datetime.now().isoformat(),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
+    def extract_entity(self, entity: str) -> List[Dict]:
+        """Extrae una entidad según su especificación declarativa"""
+        spec = ENTITY_SPECS_BY_NAME[entity]
+        rows = []
+        for sheet_name in self.classification().sheets_for(spec.name):
+            if (spec.name, sheet_name) not in self.entity_rows:
+                self.read_sheet_entities(sheet_name)
+            rows.extend(self.entity_rows.pop((spec.name, sheet_name)))
+
+        # IDs y fechas de importación son de esta corrida: nunca salen de la caché
+        records = stamp_records(spec, rows)
 
-                if producto['codigo']:  # Solo agregar si tiene código
-                    productos.append(producto)
+        print(f"✅ {spec.label}: {len(records)}")
+        return records
 
-        print(f"✅ Productos extraídos: {len(productos)}")
-        return productos
+    def extract_productos(self) -> List[Dict]:
+        """Extrae productos del Excel"""
+        return self.extract_entity('productos')
 
     def extract_clientes(self) -> List[Dict]:
         """Extrae clientes del Excel"""
-        clientes = []
-
-        client_sheets = [s for s in self.workbook.sheetnames
-                        if any(word in s.lower() for word in ['cliente', 'customer', 'cte'])]
-
-        for sheet_name in client_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                cliente = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'codigo_cliente', 'id', 'clave']),
-                    'razon_social': self.extract_field(row, ['razon_social', 'nombre', 'empresa', 'cliente']),
-                    'rfc': self.extract_field(row, ['rfc', 'tax_id', 'nit']),
-                    'tipo_cliente': self.extract_field(row, ['tipo', 'tipo_cliente', 'categoria']),
-                    'limite_credito': self.extract_numeric(row, ['limite_credito', 'credito', 'credit_limit']),
-                    'dias_credito': self.extract_numeric(row, ['dias_credito', 'plazo', 'payment_terms']),
-                    'descuento': self.extract_numeric(row, ['descuento', 'discount', 'desc']),
-                    'direccion': self.extract_field(row, ['direccion', 'address', 'domicilio']),
-                    'ciudad': self.extract_field(row, ['ciudad', 'city']),
-                    'estado': self.extract_field(row, ['estado', 'state', 'provincia']),
-                    'cp': self.extract_field(row, ['cp', 'codigo_postal', 'zip']),
-                    'telefono': self.extract_field(row, ['telefono', 'phone', 'tel']),
-                    'email': self.extract_field(row, ['email', 'correo', 'mail']),
-                    'contacto': self.extract_field(row, ['contacto', 'contact', 'persona_contacto']),
-                    'vendedor': self.extract_field(row, ['vendedor', 'agente', 'sales_rep']),
-                    'estado_cuenta': 'activo',
-                    'fecha_alta': datetime.now().isoformat(),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if cliente['codigo'] or cliente['razon_social']:
-                    clientes.append(cliente)
-
-        print(f"✅ Clientes extraídos: {len(clientes)}")
-        return clientes
+        return self.extract_entity('clientes')
 
     def extract_ventas(self) -> List[Dict]:
         """Extrae ventas del Excel"""
-        ventas = []
-
-        sales_sheets = [s for s in self.workbook.sheetnames
-                       if any(word in s.lower() for word in ['venta', 'pedido', 'factura', 'orden', 'sale'])]
-
-        for sheet_name in sales_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                venta = {
-                    'id': str(uuid.uuid4()),
-                    'folio': self.extract_field(row, ['folio', 'numero', 'orden', 'id', 'invoice']),
-                    'fecha': self.extract_date(row, ['fecha', 'date', 'fecha_venta']),
-                    'cliente_codigo': self.extract_field(row, ['cliente', 'codigo_cliente', 'customer']),
-                    'cliente_nombre': self.extract_field(row, ['nombre_cliente', 'razon_social']),
-                    'vendedor': self.extract_field(row, ['vendedor', 'agente', 'sales_rep']),
-                    'subtotal': self.extract_numeric(row, ['subtotal', 'sub_total', 'importe']),
-                    'descuento': self.extract_numeric(row, ['descuento', 'discount']),
-                    'impuestos': self.extract_numeric(row, ['impuestos', 'iva', 'tax']),
-                    'total': self.extract_numeric(row, ['total', 'importe_total', 'grand_total']),
-                    'tipo_documento': self.extract_field(row, ['tipo', 'tipo_documento', 'document_type']),
-                    'estado': self.extract_field(row, ['estado', 'status', 'estatus']),
-                    'forma_pago': self.extract_field(row, ['forma_pago', 'payment_method', 'pago']),
-                    'observaciones': self.extract_field(row, ['observaciones', 'notas', 'comments']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if venta['folio']:
-                    ventas.append(venta)
-
-        print(f"✅ Ventas extraídas: {len(ventas)}")
-        return ventas
+        return self.extract_entity('ventas')
 
     def extract_inventario(self) -> List[Dict]:
         """Extrae inventario del Excel"""
-        inventario = []
-
-        inventory_sheets = [s for s in self.workbook.sheetnames
-                           if any(word in s.lower() for word in ['inventario', 'stock', 'existencia', 'almacen'])]
-
-        for sheet_name in inventory_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                item = {
-                    'id': str(uuid.uuid4()),
-                    'producto_codigo': self.extract_field(row, ['codigo', 'sku', 'producto']),
-                    'producto_nombre': self.extract_field(row, ['nombre', 'descripcion', 'articulo']),
-                    'almacen': self.extract_field(row, ['almacen', 'bodega', 'warehouse']),
-                    'ubicacion': self.extract_field(row, ['ubicacion', 'location', 'posicion']),
-                    'lote': self.extract_field(row, ['lote', 'batch', 'serie']),
-                    'cantidad': self.extract_numeric(row, ['cantidad', 'existencia', 'stock', 'qty']),
-                    'cantidad_reservada': self.extract_numeric(row, ['reservada', 'reserved']),
-                    'cantidad_disponible': self.extract_numeric(row, ['disponible', 'available']),
-                    'costo_unitario': self.extract_numeric(row, ['costo', 'costo_unitario', 'unit_cost']),
-                    'valor_total': self.extract_numeric(row, ['valor', 'valor_total', 'total_value']),
-                    'fecha_movimiento': self.extract_date(row, ['fecha', 'fecha_movimiento', 'date']),
-                    'tipo_movimiento': self.extract_field(row, ['tipo', 'tipo_movimiento', 'movement_type']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if item['producto_codigo']:
-                    inventario.append(item)
-
-        print(f"✅ Inventario extraído: {len(inventario)}")
-        return inventario
+        return self.extract_entity('inventario')
 
     def extract_proveedores(self) -> List[Dict]:
         """Extrae proveedores del Excel"""
-        proveedores = []
-
-        supplier_sheets = [s for s in self.workbook.sheetnames
-                          if any(word in s.lower() for word in ['proveedor', 'supplier', 'vendor'])]
-
-        for sheet_name in supplier_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                proveedor = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id', 'clave']),
-                    'razon_social': self.extract_field(row, ['razon_social', 'nombre', 'empresa']),
-                    'rfc': self.extract_field(row, ['rfc', 'tax_id']),
-                    'contacto': self.extract_field(row, ['contacto', 'contact']),
-                    'telefono': self.extract_field(row, ['telefono', 'phone']),
-                    'email': self.extract_field(row, ['email', 'correo']),
-                    'direccion': self.extract_field(row, ['direccion', 'address']),
-                    'dias_credito': self.extract_numeric(row, ['dias_credito', 'plazo']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if proveedor['codigo'] or proveedor['razon_social']:
-                    proveedores.append(proveedor)
-
-        print(f"✅ Proveedores extraídos: {len(proveedores)}")
-        return proveedores
+        return self.extract_entity('proveedores')
 
     def extract_compras(self) -> List[Dict]:
         """Extrae compras del Excel"""
-        compras = []
-
-        purchase_sheets = [s for s in self.workbook.sheetnames
-                          if any(word in s.lower() for word in ['compra', 'purchase', 'orden_compra'])]
-
-        for sheet_name in purchase_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                compra = {
-                    'id': str(uuid.uuid4()),
-                    'folio': self.extract_field(row, ['folio', 'orden', 'numero']),
-                    'fecha': self.extract_date(row, ['fecha', 'date']),
-                    'proveedor_codigo': self.extract_field(row, ['proveedor', 'supplier']),
-                    'total': self.extract_numeric(row, ['total', 'importe']),
-                    'estado': self.extract_field(row, ['estado', 'status']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if compra['folio']:
-                    compras.append(compra)
-
-        print(f"✅ Compras extraídas: {len(compras)}")
-        return compras
+        return self.extract_entity('compras')
 
     def extract_usuarios(self) -> List[Dict]:
         """Extrae usuarios del Excel"""
-        usuarios = []
-
-        user_sheets = [s for s in self.workbook.sheetnames
-                      if any(word in s.lower() for word in ['usuario', 'user', 'empleado', 'vendedor'])]
-
-        for sheet_name in user_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                usuario = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id', 'employee_id']),
-                    'nombre': self.extract_field(row, ['nombre', 'name']),
-                    'email': self.extract_field(row, ['email', 'correo']),
-                    'rol': self.extract_field(row, ['rol', 'role', 'puesto']),
-                    'departamento': self.extract_field(row, ['departamento', 'area']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if usuario['codigo'] or usuario['email']:
-                    usuarios.append(usuario)
-
-        print(f"✅ Usuarios extraídos: {len(usuarios)}")
-        return usuarios
+        return self.extract_entity('usuarios')
 
     def extract_almacenes(self) -> List[Dict]:
         """Extrae almacenes del Excel"""
-        almacenes = []
-
-        warehouse_sheets = [s for s in self.workbook.sheetnames
-                           if any(word in s.lower() for word in ['almacen', 'bodega', 'warehouse'])]
-
-        for sheet_name in warehouse_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                almacen = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id']),
-                    'nombre': self.extract_field(row, ['nombre', 'name', 'descripcion']),
-                    'ubicacion': self.extract_field(row, ['ubicacion', 'location', 'direccion']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if almacen['codigo']:
-                    almacenes.append(almacen)
-
-        print(f"✅ Almacenes extraídos: {len(almacenes)}")
-        return almacenes
+        return self.extract_entity('almacenes')
 
     def extract_categorias(self) -> List[Dict]:
         """Extrae categorías del Excel"""
-        categorias = []
-
-        category_sheets = [s for s in self.workbook.sheetnames
-                          if any(word in s.lower() for word in ['categoria', 'familia', 'grupo', 'category'])]
-
-        for sheet_name in category_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                categoria = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id']),
-                    'nombre': self.extract_field(row, ['nombre', 'descripcion', 'category']),
-                    'padre': self.extract_field(row, ['padre', 'parent', 'categoria_padre']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if categoria['codigo'] or categoria['nombre']:
-                    categorias.append(categoria)
-
-        print(f"✅ Categorías extraídas: {len(categorias)}")
-        return categorias
+        return self.extract_entity('categorias')
 
     def extract_precios(self) -> List[Dict]:
         """Extrae precios del Excel"""
-        precios = []
-
-        price_sheets = [s for s in self.workbook.sheetnames
-                       if any(word in s.lower() for word in ['precio', 'price', 'tarifa', 'lista_precio'])]
-
-        for sheet_name in price_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                precio = {
-                    'id': str(uuid.uuid4()),
-                    'producto_codigo': self.extract_field(row, ['producto', 'codigo', 'sku']),
-                    'lista_precio': self.extract_field(row, ['lista', 'tipo_precio', 'price_list']),
-                    'precio': self.extract_numeric(row, ['precio', 'price', 'valor']),
-                    'moneda': self.extract_field(row, ['moneda', 'currency']) or 'MXN',
-                    'vigencia_desde': self.extract_date(row, ['vigencia_desde', 'desde', 'valid_from']),
-                    'vigencia_hasta': self.extract_date(row, ['vigencia_hasta', 'hasta', 'valid_to']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if precio['producto_codigo'] and precio['precio']:
-                    precios.append(precio)
-
-        print(f"✅ Precios extraídos: {len(precios)}")
-        return precios
+        return self.extract_entity('precios')
 
     def extract_descuentos(self) -> List[Dict]:
         """Extrae descuentos del Excel"""
-        descuentos = []
-
-        discount_sheets = [s for s in self.workbook.sheetnames
-                          if any(word in s.lower() for word in ['descuento', 'discount', 'promocion'])]
-
-        for sheet_name in discount_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                descuento = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id']),
-                    'descripcion': self.extract_field(row, ['descripcion', 'nombre']),
-                    'tipo': self.extract_field(row, ['tipo', 'type']),
-                    'valor': self.extract_numeric(row, ['valor', 'porcentaje', 'descuento']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if descuento['codigo']:
-                    descuentos.append(descuento)
-
-        print(f"✅ Descuentos extraídos: {len(descuentos)}")
-        return descuentos
+        return self.extract_entity('descuentos')
 
     def extract_impuestos(self) -> List[Dict]:
         """Extrae impuestos del Excel"""
-        impuestos = []
-
-        tax_sheets = [s for s in self.workbook.sheetnames
-                     if any(word in s.lower() for word in ['impuesto', 'tax', 'iva'])]
-
-        for sheet_name in tax_sheets:
-            df = pd.read_excel(self.excel_path, sheet_name=sheet_name)
-
-            for _, row in df.iterrows():
-                impuesto = {
-                    'id': str(uuid.uuid4()),
-                    'codigo': self.extract_field(row, ['codigo', 'id']),
-                    'nombre': self.extract_field(row, ['nombre', 'descripcion']),
-                    'tasa': self.extract_numeric(row, ['tasa', 'porcentaje', 'rate']),
-                    'metadata': {
-                        'source_sheet': sheet_name,
-                        'source_row': _ + 2,
-                        'import_date': datetime.now().isoformat(),
-                        'raw_data': row.to_dict()
-                    }
-                }
-
-                if impuesto['codigo']:
-                    impuestos.append(impuesto)
-
-        print(f"✅ Impuestos extraídos: {len(impuestos)}")
-        return impuestos
+        return self.extract_entity('impuestos')
 
     def extract_field(self, row: pd.Series, possible_names: List[str]) -> Any:
         """Extrae campo buscando en múltiples posibles nombres"""
-        for name in possible_names:
-            # Buscar exacto
-            if name in row.index and pd.notna(row[name]):
-                return str(row[name]).strip() if row[name] else None
-
-            # Buscar case-insensitive
-            for col in row.index:
-                if col and str(col).lower() == name.lower() and pd.notna(row[col]):
-                    return str(row[col]).strip() if row[col] else None
-
-            # Buscar contenga
-            for col in row.index:
-                if col and name in str(col).lower() and pd.notna(row[col]):
-                    return str(row[col]).strip() if row[col] else None
+        # Las columnas candidatas se resuelven una vez por firma de encabezados
+        plan = ColumnPlan.for_columns(row.index)
+        for pos in plan.candidates(possible_names):
+            value = row.iloc[pos]
+            if pd.notna(value):
+                return str(value).strip() if value else None
 
         return None
 
     def extract_numeric(self, row: pd.Series, possible_names: List[str]) -> float:
         """Extrae valor numérico"""
-        value = self.extract_field(row, possible_names)
-        if value is None:
-            return None
-
-        try:
-            # Limpiar formato de número
-            clean_value = str(value).replace(',', '').replace('$', '').replace('%', '').strip()
-            return float(clean_value)
-        except:
-            return None
+        return parse_number(self.extract_field(row, possible_names))
 
     def extract_date(self, row: pd.Series, possible_names: List[str]) -> str:
         """Extrae fecha"""
-        value = self.extract_field(row, possible_names)
-        if value is None:
-            return None
-
-        if isinstance(value, datetime):
-            return value.isoformat()
-
-        try:
-            date = pd.to_datetime(value)
-            return date.isoformat()
-        except:
-            return None
+        return parse_date(self.extract_field(row, possible_names))
 
     def analyze_business_logic(self) -> Dict:
         """Analiza la lógica de negocio del Excel"""
@@ -785,11 +519,19 @@ class SurgicalExcelImporter:
                     'rule': validation['formula1']
                 })
 
+        # Dependencias entre hojas según las referencias de las fórmulas
+        for (source, target), formulas in self.formula_dependency_graph().sheet_links().items():
+            business_logic['dependencies'].append({
+                'sheet': source,
+                'depends_on': target,
+                'formulas': formulas
+            })
+
         return business_logic
 
     def interpret_formula(self, formula: str) -> str:
         """Interpreta la lógica de una fórmula"""
-        formula_upper = formula.upper()
+        functions = formula_functions(formula)
 
         interpretations = {
             'SUM': 'Suma de valores',
@@ -814,9 +556,10 @@ class SurgicalExcelImporter:
             'TODAY': 'Fecha actual'
         }
 
-        for func, description in interpretations.items():
-            if func in formula_upper:
-                return description
+        # La función más externa que se reconozca
+        for func in functions:
+            if func in interpretations:
+                return interpretations[func]
 
         return 'Cálculo personalizado'
 
@@ -830,12 +573,14 @@ class SurgicalExcelImporter:
             'edges': []
         }
 
-        # Crear nodos por cada hoja
+        # Crear nodos por cada hoja, con las entidades que le asignó la clasificación
+        index = self.classification()
         for sheet_name in self.analysis_report['sheets'].keys():
             graph['nodes'].append({
                 'id': sheet_name,
                 'label': sheet_name,
-                'type': 'entity'
+                'type': 'entity',
+                'entities': index.sheet_entities.get(sheet_name, [])
             })
 
         # Crear aristas basadas en relaciones detectadas
@@ -847,9 +592,33 @@ class SurgicalExcelImporter:
                         'to': rel['target_hint'],
                         'type': rel['relationship_type'],
                         'confidence': rel['confidence'],
-                        'column': rel['source_column']
+                        'column': rel['source_column'],
+                        'target_sheets': index.sheets_for(rel['target_hint'])
                     })
 
+        # Aristas por contención de valores entre columnas de distintas hojas
+        for rel in self.discover_foreign_keys():
+            graph['edges'].append({
+                'from': rel['source_sheet'],
+                'to': rel['target_sheet'],
+                'type': 'inclusion_dependency',
+                'confidence': rel['containment'],
+                'column': rel['source_column'],
+                'target_column': rel['target_column']
+            })
+
+        # Aristas por referencias de fórmulas entre hojas
+        formula_graph = self.formula_dependency_graph()
+        for (source, target), formulas in formula_graph.sheet_links().items():
+            graph['edges'].append({
+                'from': source,
+                'to': target,
+                'type': 'formula_reference',
+                'confidence': 1.0,
+                'formulas': formulas
+            })
+        graph['formula_graph'] = formula_graph.summary()
+
         return graph
 
     def generate_migration_plan(self) -> Dict:
@@ -948,8 +717,8 @@ class SurgicalExcelImporter:
             'metadata': {
                 'excel_file': self.excel_path,
                 'analysis_date': datetime.now().isoformat(),
-                'total_sheets': len(self.workbook.sheetnames),
-                'sheets_analyzed': list(self.workbook.sheetnames)
+                'total_sheets': len(self.sheetnames),
+                'sheets_analyzed': list(self.sheetnames)
             },
             'structure_analysis': self.analysis_report,
             'entities_mapped': {
@@ -1034,43 +803,59 @@ class SurgicalExcelImporter:
 
         return quality
 
-    def save_report(self, report: Dict, output_dir: str = 'reports'):
-        """Guarda reporte en múltiples formatos"""
+    def save_report(self, report: Dict, output_dir: str = 'reports', sql_mode: str = 'insert',
+                    sql_batch_size: int = DEFAULT_BATCH_SIZE, output_format: str = 'xlsx',
+                    json_compact: bool = False):
+        """
+        Guarda reporte en múltiples formatos. Con `output_format` parquet o
+        feather los datos mapeados se escriben por entidad en formato columnar
+        (más un manifiesto) en lugar del .xlsx. El JSON se escribe en streaming
+        y de forma atómica; `json_compact` lo omite sin indentación.
+        """
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
         # JSON completo
         json_path = f"{output_dir}/excel_analysis_{timestamp}.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        # Los registros de cada entidad se entregan como iteradores: se escriben uno a uno
+        json_report = dict(report, entities_data=iter_arrays(report['entities_data'], report['entities_data']))
+        dump_json(json_report, json_path, compact=json_compact, default=str)
         print(f"✅ Reporte JSON guardado: {json_path}")
 
-        # Excel con datos mapeados
-        excel_path = f"{output_dir}/flowdistributor_data_{timestamp}.xlsx"
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            for entity_name, records in report['entities_data'].items():
-                if records:
-                    df = pd.DataFrame(records)
-                    # Remover columna metadata para Excel
-                    if 'metadata' in df.columns:
-                        df = df.drop('metadata', axis=1)
-                    df.to_excel(writer, sheet_name=entity_name, index=False)
-        print(f"✅ Excel mapeado guardado: {excel_path}")
+        output_files = {'json': json_path}
+
+        if output_format in COLUMNAR_FORMATS:
+            # Un archivo columnar por entidad + manifiesto
+            data_dir = f"{output_dir}/flowdistributor_data_{timestamp}"
+            manifest_path = write_columnar(report['entities_data'], data_dir, fmt=output_format)
+            print(f"✅ Datos mapeados ({output_format}) guardados: {data_dir}")
+            output_files[output_format] = manifest_path
+        else:
+            # Excel con datos mapeados
+            excel_path = f"{output_dir}/flowdistributor_data_{timestamp}.xlsx"
+            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+                for entity_name, records in report['entities_data'].items():
+                    if records:
+                        df = pd.DataFrame(records)
+                        # Remover columna metadata para Excel
+                        if 'metadata' in df.columns:
+                            df = df.drop('metadata', axis=1)
+                        df.to_excel(writer, sheet_name=entity_name, index=False)
+            print(f"✅ Excel mapeado guardado: {excel_path}")
+            output_files['excel'] = excel_path
 
         # SQL de inserción
         sql_path = f"{output_dir}/migration_sql_{timestamp}.sql"
-        self.generate_sql_inserts(report['entities_data'], sql_path)
+        self.generate_sql_inserts(report['entities_data'], sql_path, mode=sql_mode, batch_size=sql_batch_size)
         print(f"✅ Scripts SQL generados: {sql_path}")
+        output_files['sql'] = sql_path
 
-        return {
-            'json': json_path,
-            'excel': excel_path,
-            'sql': sql_path
-        }
+        return output_files
 
-    def generate_sql_inserts(self, entities_data: Dict, output_path: str):
-        """Genera scripts SQL de inserción"""
+    def generate_sql_inserts(self, entities_data: Dict, output_path: str, mode: str = 'insert',
+                             batch_size: int = DEFAULT_BATCH_SIZE):
+        """Genera scripts SQL de inserción (INSERT multi-fila por lotes o COPY)"""
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write("-- FlowDistributor - Scripts de Migración\n")
             f.write(f"-- Generado: {datetime.now().isoformat()}\n\n")
@@ -1085,30 +870,62 @@ class SurgicalExcelImporter:
                 f.write(f"-- {entity_name.upper()}\n")
                 f.write(f"-- Total registros: {len(records)}\n\n")
 
-                for record in records:
-                    # Remover metadata
-                    clean_record = {k: v for k, v in record.items() if k != 'metadata'}
-
-                    columns = ', '.join(clean_record.keys())
-                    values = ', '.join(
-                        f"'{str(v).replace(chr(39), chr(39)+chr(39))}'" if v is not None else 'NULL'
-                        for v in clean_record.values()
-                    )
-
-                    f.write(f"INSERT INTO {entity_name} ({columns}) VALUES ({values});\n")
+                write_entity(f, entity_name, records, mode=mode, batch_size=batch_size)
 
                 f.write("\n")
 
             f.write("COMMIT;\n")
 
 
+# Importador propio de cada proceso del pool (ver `analyze_sheets_parallel`)
+_worker_importer = None
+
+
+def init_sheet_worker(excel_path: str, cache_dir: str = None, cache_max_bytes: int = DEFAULT_MAX_BYTES):
+    """Cada proceso abre su propio lector de sólo lectura sobre el libro"""
+    global _worker_importer
+    _worker_importer = SurgicalExcelImporter(excel_path, streaming=True,
+                                             cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+
+
+def analyze_sheet_in_worker(sheet_name: str) -> Dict:
+    return _worker_importer.analyze_sheet(sheet_name)
+
+
 def main():
     """Función principal de importación"""
     print("=" * 80)
     print("🚀 FLOWDISTRIBUTOR - IMPORTACIÓN QUIRÚRGICA DE EXCEL")
     print("=" * 80)
 
-    excel_path = r"C:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx"
+    parser = argparse.ArgumentParser(description='Importación quirúrgica de Excel a FlowDistributor')
+    parser.add_argument('excel_path', nargs='?',
+                        default=r"C:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx")
+    parser.add_argument('--streaming', action='store_true',
+                        help='Lee cada hoja en una sola pasada sin cargar el libro dos veces')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos para analizar hojas en paralelo (cada uno con lector en streaming)')
+    parser.add_argument('--cache-dir',
+                        help='Directorio de caché por hoja; las hojas sin cambios no se vuelven a analizar')
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Tamaño máximo de la caché (se desalojan las entradas menos usadas)')
+    parser.add_argument('--sql-mode', choices=SQL_MODES, default='insert',
+                        help='INSERT multi-fila por lotes o COPY FROM STDIN (texto/CSV) de PostgreSQL')
+    parser.add_argument('--sql-batch-size', type=positive_int, default=DEFAULT_BATCH_SIZE,
+                        help='Registros por sentencia INSERT')
+    parser.add_argument('--output-format', choices=['xlsx'] + COLUMNAR_FORMATS, default='xlsx',
+                        help='Datos mapeados en .xlsx o un archivo Parquet/Feather por entidad (requiere pyarrow)')
+    parser.add_argument('--json-compact', action='store_true',
+                        help='Reporte JSON sin indentación (más pequeño y rápido de escribir)')
+    parser.add_argument('--db-url',
+                        help='Carga las entidades directo a la base (ruta/sqlite:///archivo.db, postgresql://, mysql://)')
+    parser.add_argument('--db-batch-size', type=positive_int, default=DEFAULT_DB_BATCH_SIZE,
+                        help='Registros por lote (executemany + commit)')
+    parser.add_argument('--db-workers', type=int, default=1,
+                        help='Conexiones del pool para cargar entidades en paralelo')
+    args = parser.parse_args()
+
+    excel_path = args.excel_path
 
     if not Path(excel_path).exists():
         print(f"❌ Error: No se encuentra el archivo {excel_path}")
@@ -1118,7 +935,9 @@ def main():
     print(f"📊 Iniciando análisis completo...\n")
 
     # Crear importador
-    importer = SurgicalExcelImporter(excel_path)
+    importer = SurgicalExcelImporter(excel_path, streaming=args.streaming, workers=args.workers,
+                                     cache_dir=args.cache_dir,
+                                     cache_max_bytes=args.cache_size_mb * 1024 * 1024)
 
     # Análisis completo
     structure = importer.analyze_complete_structure()
@@ -1127,7 +946,17 @@ def main():
     report = importer.generate_complete_report()
 
     # Guardar reportes
-    output_files = importer.save_report(report)
+    output_files = importer.save_report(report, sql_mode=args.sql_mode, sql_batch_size=args.sql_batch_size,
+                                       output_format=args.output_format, json_compact=args.json_compact)
+
+    # Carga directa a base de datos
+    if args.db_url:
+        print(f"\n🗄️  Cargando entidades en {args.db_url}")
+        load_stats = load_entities(report['entities_data'], args.db_url,
+                                   batch_size=args.db_batch_size, workers=args.db_workers)
+        for entity, stats in load_stats.items():
+            print(f"   • {entity}: {stats['rows']} filas en {stats['seconds']}s "
+                  f"({stats['rows_per_sec']} filas/s)")
 
     # Resumen final
     print("\n" + "=" * 80)
@@ -0,0 +1,313 @@
+"""
+PERFILADO VECTORIZADO DE COLUMNAS
+Lleva las filas de la hoja a bloques columnares de NumPy y calcula tipos,
+nulos, unicidad y muestras por columna sin recorrer celdas en Python.
+`SheetProfile` procesa la hoja por bloques de filas mientras se lee.
+"""
+
+import hashlib
+import re
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Un solo patrón compilado: las alternativas se prueban en el mismo orden
+# que la cadena de elif original y `lastgroup` indica cuál coincidió
+STRING_CLASSIFIER = re.compile(
+    r'(?P<UUID>(?i:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$)'
+    r'|(?P<EMAIL>[\w\.-]+@[\w\.-]+\.\w+$)'
+    r'|(?P<PHONE>\+?[\d\s\-\(\)]+$)'
+    r'|(?P<PERCENTAGE>[\s\S]*%)'
+    r'|(?P<CURRENCY>[\s\S]*[$€£¥])'
+)
+
+# Mismo orden que `detect_data_type`: decide los empates en max()
+TYPE_ORDER = [
+    'DATE', 'DATETIME', 'NUMERIC', 'INTEGER', 'DECIMAL', 'CURRENCY',
+    'PERCENTAGE', 'TEXT', 'BOOLEAN', 'EMAIL', 'PHONE', 'UUID'
+]
+
+STRING_TYPES = ['UUID', 'EMAIL', 'PHONE', 'PERCENTAGE', 'CURRENCY', 'TEXT']
+
+# Resultado de pd.api.types.infer_dtype para columnas homogéneas
+HOMOGENEOUS_TYPES = {
+    'integer': 'INTEGER',
+    'boolean': 'INTEGER',  # bool es subclase de int
+    'floating': 'DECIMAL',
+    'datetime': 'DATETIME'
+}
+
+
+def column_block(rows: Sequence[Tuple], width: int) -> np.ndarray:
+    """Convierte las filas de datos en una matriz de objetos (filas x columnas)"""
+    block = np.empty((len(rows), width), dtype=object)
+    if not rows:
+        return block
+
+    if len({len(row) for row in rows}) == 1:
+        # Filas rectangulares (caso normal): NumPy copia todo el bloque en C
+        dense = np.array(rows, dtype=object)
+        if dense.ndim == 2:
+            common = min(width, dense.shape[1])
+            block[:, :common] = dense[:, :common]
+            return block
+
+    for row_idx, row in enumerate(rows):
+        block[row_idx, :min(len(row), width)] = row[:width]
+    return block
+
+
+def classify_strings(values: np.ndarray) -> Dict[str, int]:
+    """
+    Clasifica cadenas en UUID/EMAIL/PHONE/PERCENTAGE/CURRENCY/TEXT.
+    Sólo se evalúa cada valor distinto una vez; los conteos salen de los códigos.
+    """
+    codes, uniques = pd.factorize(values)
+    labels = [match.lastgroup if match else 'TEXT' for match in map(STRING_CLASSIFIER.match, uniques)]
+
+    per_unique = np.bincount(codes, minlength=len(uniques))
+    counts = dict.fromkeys(STRING_TYPES, 0)
+    for label, count in zip(labels, per_unique):
+        counts[label] += int(count)
+    return counts
+
+
+def type_counts(values: np.ndarray) -> Dict[str, int]:
+    """Cuenta los valores no nulos de una columna por tipo detectado"""
+    counts = dict.fromkeys(TYPE_ORDER, 0)
+    if len(values) == 0:
+        return counts
+
+    inferred = pd.api.types.infer_dtype(values, skipna=False)
+    if inferred in HOMOGENEOUS_TYPES:
+        counts[HOMOGENEOUS_TYPES[inferred]] = len(values)
+        return counts
+    if inferred == 'string':
+        counts.update(classify_strings(values))
+        return counts
+
+    # Columna mixta: agrupar por clase de Python una sola vez
+    series = pd.Series(values, dtype=object)
+    for kind, group in series.groupby(series.map(type), sort=False):
+        if issubclass(kind, datetime):
+            counts['DATETIME'] += len(group)
+        elif issubclass(kind, (int, np.integer)):
+            counts['INTEGER'] += len(group)
+        elif issubclass(kind, (float, np.floating)):
+            counts['DECIMAL'] += len(group)
+        elif issubclass(kind, str):
+            for type_name, count in classify_strings(group.to_numpy()).items():
+                counts[type_name] += count
+
+    return counts
+
+
+def infer_column_type(values: Sequence) -> str:
+    """Tipo de dato predominante de una lista de valores (ignora None)"""
+    values = np.fromiter(values, dtype=object, count=len(values))
+    values = values[values != None]  # noqa: E711 - comparación elemento a elemento
+    if len(values) == 0:
+        return 'EMPTY'
+
+    counts = type_counts(values)
+    return max(counts.items(), key=lambda x: x[1])[0]
+
+
+# Filas por bloque columnar al perfilar mientras se lee la hoja
+CHUNK_ROWS = 4096
+
+# Filas de datos de `data_sample`
+SAMPLE_ROWS = 10
+
+
+def cell_token(value: Any) -> str:
+    """Texto del valor con la igualdad de pandas (1, 1.0 y True coinciden; NaN con NaN)"""
+    if value is None:
+        return 'N'
+    if isinstance(value, str):
+        return 's' + value
+    if isinstance(value, (bool, int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    return f'{type(value).__name__}{value!r}'
+
+
+def row_digest(row: Sequence) -> int:
+    """Hash de 64 bits de una fila sin vacíos a la derecha (para contar duplicadas)"""
+    payload = '\x1f'.join(f'{len(token)}:{token}' for token in map(cell_token, row))
+    return int.from_bytes(hashlib.blake2b(payload.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+
+
+class SheetProfile:
+    """
+    Perfil y estadísticas de una hoja alimentados fila por fila (`add_row`),
+    con el mismo resultado que calcularlos sobre la rejilla densa completa
+    (el DataFrame con la fila 1 como encabezados). Las filas se procesan por
+    bloques de CHUNK_ROWS; sólo crecen los valores distintos por columna y
+    8 bytes por fila para detectar duplicadas.
+    """
+
+    def __init__(self):
+        self.header_row: Tuple = ()
+        self.headers: List = []
+        self.max_row = 0
+        self.max_column = 0
+        self.data_rows = 0
+        self.blank_rows = 0
+        self.head: List[Tuple[int, Tuple]] = []
+        self.chunk: List[Tuple] = []
+        self.digests = array('Q')
+        self.not_null = np.zeros(0, dtype=np.int64)
+        self.type_counts: Dict[int, Dict[str, int]] = {}
+        self.samples: Dict[int, List] = {}
+        self.distinct: Dict[int, Set] = {}
+        # Columna -> valores representativos de cada tipo (deciden el dtype de pandas)
+        self.exemplars: Dict[int, Dict[type, List]] = {}
+
+    def add_row(self, index: int, values: Sequence):
+        """Fila `index` (1 = encabezados) con sus valores desde la columna A"""
+        width = len(values)
+        while width and values[width - 1] is None:
+            width -= 1
+        self.max_row = max(self.max_row, index)
+        self.max_column = max(self.max_column, len(values))
+
+        if index == 1:
+            self.header_row = tuple(values)
+            self.headers = [h for h in values if h is not None]
+            tracked = set(range(len(self.headers)))
+            tracked.update(pos for pos, h in enumerate(values) if h is not None)
+            for pos in tracked:
+                self.type_counts[pos] = dict.fromkeys(TYPE_ORDER, 0)
+                self.samples[pos] = []
+                self.distinct[pos] = set()
+            return
+
+        if index <= SAMPLE_ROWS + 1:
+            self.head.append((index, tuple(values)))
+        if not width:
+            return
+        self.chunk.append(tuple(values[:width]))
+        if len(self.chunk) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        rows, self.chunk = self.chunk, []
+        if not rows:
+            return
+
+        for row in rows:
+            self.digests.append(row_digest(row))
+
+        width = max(len(row) for row in rows)
+        block = column_block(rows, width)
+        not_null = block != None  # noqa: E711 - comparación elemento a elemento
+        if len(self.not_null) < width:
+            self.not_null = np.concatenate([self.not_null, np.zeros(width - len(self.not_null), dtype=np.int64)])
+        self.not_null[:width] += not_null.sum(axis=0)
+
+        for pos in range(width):
+            col_data = block[not_null[:, pos], pos]
+            if not len(col_data):
+                continue
+
+            exemplars = self.exemplars.setdefault(pos, {})
+            kinds = pd.Series(col_data, dtype=object).map(type).to_numpy()
+            for kind in pd.unique(kinds):
+                group = col_data[kinds == kind]
+                found = exemplars.get(kind)
+                values = [group[0]]
+                if issubclass(kind, (int, datetime)):
+                    # Los extremos deciden int64/uint64/object y la resolución de fechas
+                    values += [group.min(), group.max()]
+                if found is None:
+                    exemplars[kind] = values
+                elif len(values) == 3:
+                    exemplars[kind] = [found[0], min(found[1], values[1]), max(found[2], values[2])]
+
+            if pos not in self.type_counts:
+                continue
+            counts = self.type_counts[pos]
+            for type_name, count in type_counts(col_data).items():
+                counts[type_name] += count
+            sample = self.samples[pos]
+            if len(sample) < 5:
+                sample.extend(col_data[:5 - len(sample)].tolist())
+            self.distinct[pos].update(pd.unique(col_data))
+
+    def finish(self, max_row: int = 0, max_column: int = 0):
+        """Cierra el perfil; `max_row`/`max_column` extienden la rejilla (rangos combinados)"""
+        self.flush()
+        self.max_row = max(self.max_row, max_row)
+        self.max_column = max(self.max_column, max_column)
+        self.data_rows = max(self.max_row - 1, 0)
+        self.blank_rows = self.data_rows - len(self.digests)
+
+    def column_nulls(self, pos: int) -> int:
+        return self.data_rows - (int(self.not_null[pos]) if pos < len(self.not_null) else 0)
+
+    def profiles(self) -> Dict:
+        """Tipo, nulos, valores únicos y muestra de cada encabezado (posicional: columna i -> headers[i])"""
+        profiles = {}
+        for idx, header in enumerate(self.headers):
+            counts = self.type_counts[idx]
+            non_null = self.data_rows - self.column_nulls(idx)
+            profiles[header] = {
+                'type': max(counts.items(), key=lambda x: x[1])[0] if non_null else 'EMPTY',
+                'nullable': bool(self.column_nulls(idx)),
+                'unique_values': len(self.distinct[idx]),
+                'sample_values': list(self.samples[idx])
+            }
+        return profiles
+
+    def dense_head(self, rows: int) -> List[Tuple]:
+        """Primeras `rows` filas (hasta SAMPLE_ROWS + 1) como en la rejilla densa"""
+        width = self.max_column
+        present = dict(self.head)
+        present[1] = self.header_row
+        return [tuple(present.get(index, ())) + (None,) * (width - len(present.get(index, ())))
+                for index in range(1, min(self.max_row, rows) + 1)]
+
+    def frame_head(self) -> pd.DataFrame:
+        """
+        DataFrame de encabezados + primeras filas de datos con los mismos dtypes
+        que el de la hoja completa: al final se agregan filas con los valores
+        representativos de cada columna, que bastan para la inferencia de pandas
+        """
+        width = self.max_column
+        rows = self.dense_head(SAMPLE_ROWS + 1)
+
+        extra = []
+        for pos in range(width):
+            values = [value for found in self.exemplars.get(pos, {}).values() for value in found]
+            if self.column_nulls(pos):
+                values.append(None)
+            extra.append(values)
+        for k in range(max((len(values) for values in extra), default=0)):
+            rows.append(tuple(values[k] if k < len(values) else values[0] for values in extra))
+
+        rows = [tuple(row) + (None,) * (width - len(row)) for row in rows]
+        df = pd.DataFrame(rows)
+        df.columns = df.iloc[0]
+        return df[1:]
+
+    def statistics(self, columns: pd.Index) -> Dict:
+        """Igual que las estadísticas del DataFrame completo (`columns` = sus encabezados)"""
+        unique_rows = len(np.unique(np.frombuffer(self.digests, dtype=np.uint64)))
+        duplicates = len(self.digests) - unique_rows + max(self.blank_rows - 1, 0)
+        nulls = pd.Series(np.array([self.column_nulls(pos) for pos in range(len(columns))], dtype=np.int64),
+                          index=columns)
+        return {
+            'total_rows': self.data_rows,
+            'total_columns': len(columns),
+            'null_counts': nulls.to_dict(),
+            'duplicate_rows': np.int64(duplicates)
+        }
+
+    def unique_ratio(self, pos: int) -> float:
+        """nunique / no nulos de la columna, como `df[col].nunique() / len(df[col].dropna())`"""
+        return len(self.distinct[pos]) / (self.data_rows - self.column_nulls(pos))
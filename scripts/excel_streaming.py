@@ -0,0 +1,459 @@
+"""
+LECTOR EN STREAMING DE LIBROS EXCEL (.xlsx)
+Recorre el XML de cada hoja una sola vez y entrega, fila por fila,
+los valores cacheados y el texto de las fórmulas sin abrir el libro dos veces
+"""
+
+import hashlib
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import (
+    column_index_from_string,
+    coordinate_from_string,
+    get_column_letter,
+    range_boundaries
+)
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from mapped_archive import MappedArchive, SharedStringTable
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+ROW_TAG = f'{NS_MAIN}row'
+CELL_TAG = f'{NS_MAIN}c'
+SHEET_DATA_TAG = f'{NS_MAIN}sheetData'
+MERGE_TAG = f'{NS_MAIN}mergeCell'
+VALIDATION_TAG = f'{NS_MAIN}dataValidation'
+
+# Índices de cadenas compartidas en celdas t="s" (con o sin prefijo de espacio de nombres)
+SHARED_STRING_REF = re.compile(rb'<(?:\w+:)?c\b[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+
+
+@dataclass
+class StreamedRow:
+    """Una fila del XML: valores cacheados y fórmulas por índice de columna (1-based)"""
+    index: int
+    values: Dict[int, Any]
+    formulas: Dict[int, str]
+
+
+@dataclass
+class SheetSnapshot:
+    """Resultado de una pasada completa sobre una hoja"""
+    name: str
+    min_row: int = 0
+    min_column: int = 0
+    max_row: int = 0
+    max_column: int = 0
+    rows: List[Tuple] = field(default_factory=list)
+    formulas: List[Tuple[str, str]] = field(default_factory=list)
+    merged_cells: List[str] = field(default_factory=list)
+    validations: List[Dict] = field(default_factory=list)
+    comments: List[Dict] = field(default_factory=list)
+
+
+class StreamingWorkbookReader:
+    """
+    Lector de una sola pasada sobre las partes XML del .xlsx.
+    Con `mapped=True` el archivo se mapea en memoria y las cadenas compartidas
+    van a una tabla compacta (ver mapped_archive): memoria casi constante.
+    """
+
+    def __init__(self, excel_path: str, mapped: bool = False):
+        self.excel_path = excel_path
+        self.archive = MappedArchive(excel_path) if mapped else zipfile.ZipFile(excel_path)
+        self.parts = set(self.archive.namelist())
+        self.epoch = CALENDAR_WINDOWS_1900
+        self.sheet_parts: Dict[str, str] = {}
+        self.defined_names: List[Tuple[str, Optional[str], str]] = []
+        self.tables: List[Dict] = []
+        self.shared_strings: Union[List[str], SharedStringTable] = SharedStringTable() if mapped else []
+        self.uncached_formulas: Dict[str, int] = {}
+        self.date_styles = set()
+        self.timedelta_styles = set()
+
+        self._load_workbook_index()
+        self._load_shared_strings()
+        self._load_styles()
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self.sheet_parts.keys())
+
+    def close(self):
+        self.archive.close()
+
+    def sheet_digest(self, sheet_name: str) -> str:
+        """
+        Hash del contenido efectivo de la hoja: su XML, las cadenas compartidas que
+        referencia, sus partes relacionadas (comentarios...) y los estilos de fecha.
+        No cambia cuando sólo se editan otras hojas del libro.
+        """
+        part = self.sheet_parts[sheet_name]
+        data = self.archive.read(part)
+
+        digest = hashlib.sha256(data)
+        for index in SHARED_STRING_REF.findall(data):
+            digest.update(self.shared_strings[int(index)].encode('utf-8'))
+            digest.update(b'\0')
+
+        for rel_type, path in sorted(self._read_rels(part).values()):
+            if path in self.parts:
+                digest.update(rel_type.encode('utf-8'))
+                digest.update(self.archive.read(path))
+
+        digest.update(repr((self.epoch, sorted(self.date_styles), sorted(self.timedelta_styles))).encode())
+        return digest.hexdigest()
+
+    def references_digest(self) -> str:
+        """
+        Hash de lo que resuelve referencias en cualquier hoja: nombres de hojas,
+        nombres definidos y tablas. Se combina con `sheet_digest` en resultados
+        que dependen de resolver fórmulas.
+        """
+        return hashlib.sha256(repr((self.sheetnames, self.defined_names, self.tables)).encode('utf-8')).hexdigest()
+
+    def sheet_size(self, sheet_name: str) -> int:
+        """Tamaño sin comprimir del XML de la hoja (estimación de su costo)"""
+        return self.archive.getinfo(self.sheet_parts[sheet_name]).file_size
+
+    # ------------------------------------------------------------------
+    # Partes globales del libro
+    # ------------------------------------------------------------------
+
+    def _read_rels(self, part: str) -> Dict[str, Tuple[str, str]]:
+        """Lee el .rels de una parte y devuelve {rId: (tipo, ruta absoluta)}"""
+        folder, name = posixpath.split(part)
+        rels_path = posixpath.join(folder, '_rels', f'{name}.rels')
+        if rels_path not in self.parts:
+            return {}
+
+        rels = {}
+        root = ET.fromstring(self.archive.read(rels_path))
+        for rel in root.iter(f'{NS_PKG_REL}Relationship'):
+            target = rel.get('Target', '')
+            if target.startswith('/'):
+                path = target.lstrip('/')
+            else:
+                path = posixpath.normpath(posixpath.join(folder, target))
+            rels[rel.get('Id')] = (rel.get('Type', ''), path)
+        return rels
+
+    def _load_workbook_index(self):
+        """Relaciona el nombre de cada hoja con su parte xl/worksheets/sheetN.xml"""
+        root = ET.fromstring(self.archive.read('xl/workbook.xml'))
+        rels = self._read_rels('xl/workbook.xml')
+
+        workbook_pr = root.find(f'{NS_MAIN}workbookPr')
+        if workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true'):
+            self.epoch = CALENDAR_MAC_1904
+
+        sheet_order = []
+        for sheet in root.iter(f'{NS_MAIN}sheet'):
+            sheet_order.append(sheet.get('name'))
+            rel_id = sheet.get(f'{NS_REL}id')
+            if rel_id in rels:
+                self.sheet_parts[sheet.get('name')] = rels[rel_id][1]
+
+        # Nombres definidos: (nombre, hoja si es local, referencia)
+        for defined in root.iter(f'{NS_MAIN}definedName'):
+            local_id = defined.get('localSheetId')
+            scope = sheet_order[int(local_id)] if local_id is not None and int(local_id) < len(sheet_order) else None
+            self.defined_names.append((defined.get('name'), scope, defined.text or ''))
+
+        # Tablas (ListObjects) de cada hoja, para las referencias estructuradas
+        for sheet_name, part in self.sheet_parts.items():
+            for rel_type, path in self._read_rels(part).values():
+                if not rel_type.endswith('/table') or path not in self.parts:
+                    continue
+                table = ET.fromstring(self.archive.read(path))
+                columns = table.find(f'{NS_MAIN}tableColumns')
+                self.tables.append({
+                    'name': table.get('displayName') or table.get('name'),
+                    'sheet': sheet_name,
+                    'ref': table.get('ref'),
+                    'columns': [column.get('name') for column in columns.iter(f'{NS_MAIN}tableColumn')]
+                               if columns is not None else [],
+                    'header_rows': int(table.get('headerRowCount', 1)),
+                    'totals_rows': int(table.get('totalsRowCount', 0))
+                })
+
+    def _load_shared_strings(self):
+        """Carga la tabla de cadenas compartidas (texto plano, sin formato)"""
+        if 'xl/sharedStrings.xml' not in self.parts:
+            return
+
+        with self.archive.open('xl/sharedStrings.xml') as source:
+            for event, elem in ET.iterparse(source, events=('end',)):
+                if elem.tag == f'{NS_MAIN}si':
+                    self.shared_strings.append(self._text_content(elem))
+                    elem.clear()
+
+    def _load_styles(self):
+        """Detecta qué estilos de celda corresponden a fechas o duraciones"""
+        if 'xl/styles.xml' not in self.parts:
+            return
+
+        root = ET.fromstring(self.archive.read('xl/styles.xml'))
+        custom_formats = {}
+        num_fmts = root.find(f'{NS_MAIN}numFmts')
+        if num_fmts is not None:
+            for fmt in num_fmts.iter(f'{NS_MAIN}numFmt'):
+                custom_formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode', '')
+
+        cell_xfs = root.find(f'{NS_MAIN}cellXfs')
+        if cell_xfs is None:
+            return
+
+        for style_id, xf in enumerate(cell_xfs.iter(f'{NS_MAIN}xf')):
+            fmt_id = int(xf.get('numFmtId', 0))
+            fmt = custom_formats.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+            if fmt and is_date_format(fmt):
+                self.date_styles.add(style_id)
+                if is_timedelta_format(fmt):
+                    self.timedelta_styles.add(style_id)
+
+    @staticmethod
+    def _text_content(elem) -> str:
+        """Concatena los nodos <t> de un texto enriquecido (ignora fonética <rPh>)"""
+        parts = []
+        for child in elem:
+            if child.tag == f'{NS_MAIN}t':
+                parts.append(child.text or '')
+            elif child.tag == f'{NS_MAIN}r':
+                t = child.find(f'{NS_MAIN}t')
+                if t is not None:
+                    parts.append(t.text or '')
+        return ''.join(parts)
+
+    # ------------------------------------------------------------------
+    # Lectura de hojas
+    # ------------------------------------------------------------------
+
+    def _convert_value(self, cell, raw: Optional[str]) -> Any:
+        """Convierte el <v> de una celda al mismo tipo que devuelve openpyxl"""
+        data_type = cell.get('t', 'n')
+
+        if data_type == 'inlineStr':
+            inline = cell.find(f'{NS_MAIN}is')
+            return self._text_content(inline) if inline is not None else None
+
+        if raw is None:
+            return None
+
+        if data_type == 's':
+            return self.shared_strings[int(raw)]
+        if data_type == 'b':
+            return bool(int(raw))
+        if data_type in ('str', 'e'):
+            return raw
+        if data_type == 'd':
+            return from_ISO8601(raw)
+
+        value = float(raw) if ('.' in raw or 'E' in raw or 'e' in raw) else int(raw)
+        style_id = int(cell.get('s', 0))
+        if style_id in self.date_styles:
+            try:
+                return from_excel(value, self.epoch, timedelta=style_id in self.timedelta_styles)
+            except (OverflowError, ValueError):
+                return value
+        return value
+
+    def iter_rows(self, sheet_name: str, extras: Optional[SheetSnapshot] = None) -> Iterator[StreamedRow]:
+        """
+        Recorre la hoja fila por fila; sólo la fila actual vive en memoria.
+        Si se pasa `extras`, se rellenan ahí las celdas combinadas y validaciones
+        que aparecen después de <sheetData>.
+        """
+        part = self.sheet_parts[sheet_name]
+        shared_formulas: Dict[str, Tuple[str, str]] = {}
+        sheet_data = None
+        row_counter = 0
+
+        with self.archive.open(part) as source:
+            for event, elem in ET.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == SHEET_DATA_TAG:
+                        sheet_data = elem
+                    continue
+
+                if elem.tag == ROW_TAG:
+                    row_counter = int(elem.get('r', row_counter + 1))
+                    values = {}
+                    formulas = {}
+                    col_counter = 0
+
+                    for cell in elem.iter(CELL_TAG):
+                        ref = cell.get('r')
+                        if ref:
+                            column_letter, _ = coordinate_from_string(ref)
+                            col_counter = column_index_from_string(column_letter)
+                        else:
+                            col_counter += 1
+                            ref = f'{get_column_letter(col_counter)}{row_counter}'
+
+                        v = cell.find(f'{NS_MAIN}v')
+                        values[col_counter] = self._convert_value(cell, v.text if v is not None else None)
+
+                        f = cell.find(f'{NS_MAIN}f')
+                        if f is not None:
+                            text = f.text
+                            if f.get('t') == 'shared':
+                                si = f.get('si')
+                                if text:
+                                    shared_formulas[si] = (ref, '=' + text)
+                                elif si in shared_formulas:
+                                    origin, master = shared_formulas[si]
+                                    text = Translator(master, origin=origin).translate_formula(ref)[1:]
+                            if text:
+                                formulas[col_counter] = '=' + text
+
+                    yield StreamedRow(row_counter, values, formulas)
+
+                    # Liberar la fila ya procesada: memoria acotada a una ventana
+                    elem.clear()
+                    if sheet_data is not None:
+                        sheet_data.clear()
+
+                elif extras is not None and elem.tag == MERGE_TAG:
+                    extras.merged_cells.append(elem.get('ref'))
+
+                elif extras is not None and elem.tag == VALIDATION_TAG:
+                    formula1 = elem.find(f'{NS_MAIN}formula1')
+                    formula2 = elem.find(f'{NS_MAIN}formula2')
+                    extras.validations.append({
+                        'cells': elem.get('sqref', ''),
+                        'type': elem.get('type'),
+                        'formula1': formula1.text if formula1 is not None else None,
+                        'formula2': formula2.text if formula2 is not None else None,
+                        'allow_blank': elem.get('allowBlank') in ('1', 'true')
+                    })
+
+    def iter_values(self, sheet_name: str, max_column: int, start_row: int = 1) -> Iterator[Tuple[int, Tuple]]:
+        """
+        (fila, valores de las columnas 1..max_column) de las filas presentes desde
+        `start_row`. Cuenta en `uncached_formulas` las fórmulas sin valor cacheado.
+        """
+        columns = range(1, max_column + 1)
+        uncached = 0
+        try:
+            for row in self.iter_rows(sheet_name):
+                uncached += sum(1 for col in row.formulas if row.values.get(col) is None)
+                if row.index >= start_row:
+                    yield row.index, tuple(row.values.get(col) for col in columns)
+        finally:
+            self.uncached_formulas[sheet_name] = uncached
+
+    def read_comments(self, sheet_name: str) -> List[Dict]:
+        """Lee los comentarios de la hoja desde su parte commentsN.xml"""
+        comments = []
+        for rel_type, path in self._read_rels(self.sheet_parts[sheet_name]).values():
+            if not rel_type.endswith('/comments') or path not in self.parts:
+                continue
+            root = ET.fromstring(self.archive.read(path))
+            for comment in root.iter(f'{NS_MAIN}comment'):
+                text = comment.find(f'{NS_MAIN}text')
+                comments.append({
+                    'cell': comment.get('ref'),
+                    'comment': self._text_content(text) if text is not None else ''
+                })
+        return comments
+
+    def read_sheet(self, sheet_name: str) -> SheetSnapshot:
+        """
+        Una sola pasada por la hoja: valores densos desde A1 (como `sheet.values`),
+        lista de fórmulas y metadatos de la hoja. La rejilla completa queda en
+        memoria (filas x columnas, huecos incluidos); para recorrer la hoja con
+        memoria acotada usar `iter_rows` o `iter_values`.
+        """
+        snapshot = SheetSnapshot(name=sheet_name)
+        sparse_rows = []
+
+        for row in self.iter_rows(sheet_name, extras=snapshot):
+            if not row.values:
+                continue
+            sparse_rows.append((row.index, row.values))
+            snapshot.min_row = min(snapshot.min_row or row.index, row.index)
+            snapshot.min_column = min(snapshot.min_column or min(row.values), min(row.values))
+            snapshot.max_row = max(snapshot.max_row, row.index)
+            snapshot.max_column = max(snapshot.max_column, max(row.values))
+            for col_idx, formula in row.formulas.items():
+                snapshot.formulas.append((f'{get_column_letter(col_idx)}{row.index}', formula))
+
+        # openpyxl crea celdas para todo rango combinado: cuentan en las dimensiones
+        for merged in snapshot.merged_cells:
+            min_col, min_row, max_col, max_row = range_boundaries(merged)
+            snapshot.min_row = min(snapshot.min_row or min_row, min_row)
+            snapshot.min_column = min(snapshot.min_column or min_col, min_col)
+            snapshot.max_row = max(snapshot.max_row, max_row)
+            snapshot.max_column = max(snapshot.max_column, max_col)
+
+        # Rellenar huecos para replicar la rejilla densa de openpyxl
+        width = snapshot.max_column
+        empty_row = (None,) * width
+        next_row = 1
+        for row_idx, values in sparse_rows:
+            while next_row < row_idx:
+                snapshot.rows.append(empty_row)
+                next_row += 1
+            snapshot.rows.append(tuple(values.get(col) for col in range(1, width + 1)))
+            next_row += 1
+        while next_row <= snapshot.max_row:
+            snapshot.rows.append(empty_row)
+            next_row += 1
+
+        # openpyxl reporta una hoja vacía como 1 x 1
+        snapshot.min_row = snapshot.min_row or 1
+        snapshot.min_column = snapshot.min_column or 1
+        snapshot.max_row = snapshot.max_row or 1
+        snapshot.max_column = snapshot.max_column or 1
+        snapshot.comments = self.read_comments(sheet_name)
+        return snapshot
+
+
+def rows_to_frame(rows: Iterable[Tuple], header: Optional[int] = 0) -> pd.DataFrame:
+    """
+    Construye el mismo DataFrame que `pd.read_excel(path, sheet_name=..., header=...)`
+    a partir de las filas desde la 1 (no hace falta rellenarlas a la derecha),
+    sin volver a abrir el archivo.
+    """
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        converted = []
+        for value in row:
+            if value is None:
+                converted.append('')
+            elif isinstance(value, float) and not isinstance(value, bool) and value.is_integer():
+                converted.append(int(value))
+            else:
+                converted.append(value)
+        while converted and converted[-1] == '':
+            converted.pop()
+        if converted:
+            last_row_with_data = row_number
+        data.append(converted)
+
+    data = data[:last_row_with_data + 1]
+    if not data:
+        return pd.DataFrame()
+
+    max_width = max(len(row) for row in data)
+    data = [row + [''] * (max_width - len(row)) for row in data]
+
+    try:
+        return TextParser(data, header=header, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
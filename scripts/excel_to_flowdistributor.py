@@ -4,47 +4,82 @@ Parser de Excel Administración General a formato FlowDistributor
 Convierte todos los datos del Excel a JSON compatible con el sistema
 """
 
-import json
 import sys
 from datetime import datetime
 from pathlib import Path
 
-import openpyxl
+from categorical import CategoricalStore, StringTable
+from entity_index import EntityIndexes
+from excel_streaming import StreamingWorkbookReader
+from formula_eval import recalculate_workbook
+from header_layout import sheet_layout
+from incremental_import import ImportWatermarks
+from json_stream import dump_json, iter_arrays
+from sheet_extent import block_rows
+from workbook_session import open_session
 
 sys.stdout.reconfigure(encoding='utf-8')
 
-def safe_value(cell):
-    """Extrae valor de celda de forma segura"""
-    if cell.value is None:
+# Encabezados esperados (columna -> texto inicial): los datos empiezan en la fila
+# siguiente a la que los contiene; si no aparecen, en la fila 4 documentada
+SHEET_HEADERS = {
+    'Control_Maestro': {1: 'Fecha', 4: 'Cliente'},
+    'Clientes': {5: 'Cliente'},
+    'Distribuidores': {1: 'OC', 3: 'Origen'},
+    'Almacen_Monte': {1: 'OC'}
+}
+BANCO_HEADERS = {1: 'Fecha', 2: 'Cliente'}
+DEFAULT_DATA_ROW = 4
+
+def safe_value(value):
+    """Normaliza el valor de una celda de forma segura"""
+    if value is None:
         return None
-    if isinstance(cell.value, datetime):
-        return cell.value.strftime('%Y-%m-%d')
-    if isinstance(cell.value, (int, float)):
-        return cell.value
-    return str(cell.value).strip()
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (int, float)):
+        return value
+    return str(value).strip()
 
-def parse_control_maestro(ws):
+def sheet_rows(source, sheet_name, start_row, max_col, min_col=1):
+    """
+    Filas (índice, valores de las columnas 1..max_col) de una hoja, una a la vez:
+    del .xlsx mapeado en memoria (--streaming) o del libro openpyxl
+    """
+    if isinstance(source, StreamingWorkbookReader):
+        return source.iter_values(sheet_name, max_col, start_row)
+    return block_rows(source[sheet_name], start_row, min_col, max_col)
+
+def first_data_row(source, sheet_name, anchors):
+    """Primera fila de datos según los encabezados detectados en la hoja"""
+    return sheet_layout(source, sheet_name).data_start(DEFAULT_DATA_ROW, anchors)
+
+def parse_control_maestro(rows, start_row=4, categorias=None):
     """
     Parsea la hoja Control_Maestro - Ventas principales
     Estructura: Fecha | OC Relacionada | Cantidad | Cliente | Bóveda Monte | Precio De Venta |
                 Ingreso | Flete | Flete Utilidad | Utilidad | Estatus | Concepto
+    `rows`: (fila, valores A..L) en orden; datos desde `start_row` (la fila tras
+    los encabezados, o una posterior en importación incremental); `categorias`
+    (CategoricalStore) interna cliente, estatus y concepto
     """
     ventas = []
 
-    # Datos comienzan en fila 4 (después de headers en fila 3)
-    for row_idx in range(4, ws.max_row + 1):
-        fecha = safe_value(ws.cell(row_idx, 1))
-        oc = safe_value(ws.cell(row_idx, 2))
-        cantidad = safe_value(ws.cell(row_idx, 3))
-        cliente = safe_value(ws.cell(row_idx, 4))
-        costo_boveda = safe_value(ws.cell(row_idx, 5))
-        precio_venta = safe_value(ws.cell(row_idx, 6))
-        ingreso = safe_value(ws.cell(row_idx, 7))
-        flete_aplica = safe_value(ws.cell(row_idx, 8))
-        flete_utilidad = safe_value(ws.cell(row_idx, 9))
-        utilidad = safe_value(ws.cell(row_idx, 10))
-        estatus = safe_value(ws.cell(row_idx, 11))
-        concepto = safe_value(ws.cell(row_idx, 12))
+    for row_idx, row in rows:
+        if row_idx < start_row:
+            continue
+        fecha = safe_value(row[0])
+        oc = safe_value(row[1])
+        cantidad = safe_value(row[2])
+        cliente = safe_value(row[3])
+        costo_boveda = safe_value(row[4])
+        precio_venta = safe_value(row[5])
+        ingreso = safe_value(row[6])
+        flete_aplica = safe_value(row[7])
+        flete_utilidad = safe_value(row[8])
+        utilidad = safe_value(row[9])
+        estatus = safe_value(row[10])
+        concepto = safe_value(row[11])
 
         # Solo procesar filas con datos válidos
         if not fecha or not cliente:
@@ -97,25 +132,29 @@ def parse_control_maestro(ws):
             }]
         }
 
+        if categorias is not None:
+            categorias.add('ventas', venta)
         ventas.append(venta)
 
     return ventas
 
-def parse_clientes(ws):
+def parse_clientes(rows, start_row=4):
     """
     Parsea la hoja Clientes
     Estructura: Cliente | Actual | Deuda | Abonos | Pendiente | Observaciones
+    `rows`: (fila, valores A..J) en orden; datos desde `start_row`
     """
     clientes = []
 
-    # Datos comienzan en fila 4
-    for row_idx in range(4, ws.max_row + 1):
-        nombre = safe_value(ws.cell(row_idx, 5))  # Col E
-        actual = safe_value(ws.cell(row_idx, 6))  # Col F
-        deuda = safe_value(ws.cell(row_idx, 7))   # Col G
-        abonos = safe_value(ws.cell(row_idx, 8))  # Col H
-        pendiente = safe_value(ws.cell(row_idx, 9)) # Col I
-        observaciones = safe_value(ws.cell(row_idx, 10)) # Col J
+    for row_idx, row in rows:
+        if row_idx < start_row:
+            continue
+        nombre = safe_value(row[4])  # Col E
+        actual = safe_value(row[5])  # Col F
+        deuda = safe_value(row[6])   # Col G
+        abonos = safe_value(row[7])  # Col H
+        pendiente = safe_value(row[8]) # Col I
+        observaciones = safe_value(row[9]) # Col J
 
         if not nombre or (isinstance(nombre, str) and nombre.startswith('=')):
             continue
@@ -147,28 +186,33 @@ def parse_clientes(ws):
 
     return clientes
 
-def parse_distribuidores(ws):
+def parse_distribuidores(rows, categorias=None, start_row=4):
     """
     Parsea la hoja Distribuidores - Órdenes de Compra
     Estructura: OC | Fecha | Origen | Cantidad | Costo Distribuidor | Costo Transporte |
                 Costo Por Unidad | Stock Actual | Costo Total | Pago a Distribuidor | Deuda
+    `rows`: (fila, valores A..K) en orden; datos desde `start_row`. Los
+    distribuidores se acumulan por el código del nombre (en la tabla de
+    `categorias` si se pasa)
     """
     ordenes = []
     distribuidores_map = {}
+    nombres = categorias.table('distribuidor') if categorias is not None else StringTable()
 
-    # Datos comienzan en fila 4
-    for row_idx in range(4, ws.max_row + 1):
-        oc = safe_value(ws.cell(row_idx, 1))
-        fecha = safe_value(ws.cell(row_idx, 2))
-        origen = safe_value(ws.cell(row_idx, 3))
-        cantidad = safe_value(ws.cell(row_idx, 4))
-        costo_dist = safe_value(ws.cell(row_idx, 5))
-        costo_trans = safe_value(ws.cell(row_idx, 6))
-        costo_unidad = safe_value(ws.cell(row_idx, 7))
-        stock = safe_value(ws.cell(row_idx, 8))
-        costo_total = safe_value(ws.cell(row_idx, 9))
-        pago = safe_value(ws.cell(row_idx, 10))
-        deuda = safe_value(ws.cell(row_idx, 11))
+    for row_idx, row in rows:
+        if row_idx < start_row:
+            continue
+        oc = safe_value(row[0])
+        fecha = safe_value(row[1])
+        origen = safe_value(row[2])
+        cantidad = safe_value(row[3])
+        costo_dist = safe_value(row[4])
+        costo_trans = safe_value(row[5])
+        costo_unidad = safe_value(row[6])
+        stock = safe_value(row[7])
+        costo_total = safe_value(row[8])
+        pago = safe_value(row[9])
+        deuda = safe_value(row[10])
 
         if not oc or not origen:
             continue
@@ -218,212 +262,243 @@ def parse_distribuidores(ws):
             }]
         }
 
+        if categorias is not None:
+            categorias.add('ordenesCompra', orden)
         ordenes.append(orden)
 
         # Agregar al mapa de distribuidores
-        if origen not in distribuidores_map:
-            distribuidores_map[origen] = {
-                'nombre': origen,
+        codigo = nombres.intern(origen)
+        if codigo not in distribuidores_map:
+            distribuidores_map[codigo] = {
+                'nombre': nombres.label(codigo),
                 'totalComprado': 0,
                 'totalPagado': 0,
                 'adeudo': 0,
                 'ordenes': []
             }
 
-        distribuidores_map[origen]['totalComprado'] += costo_total
-        distribuidores_map[origen]['totalPagado'] += pago
-        distribuidores_map[origen]['adeudo'] += deuda
-        distribuidores_map[origen]['ordenes'].append(oc)
+        distribuidores_map[codigo]['totalComprado'] += costo_total
+        distribuidores_map[codigo]['totalPagado'] += pago
+        distribuidores_map[codigo]['adeudo'] += deuda
+        distribuidores_map[codigo]['ordenes'].append(oc)
 
     distribuidores = list(distribuidores_map.values())
 
     return ordenes, distribuidores
 
-def parse_almacen(ws, ordenes_compra=None, ventas=None):
+def parse_entrada_almacen(row_idx, row, indexes):
+    """Entrada de almacén de una fila (columnas A-D) o None si no aplica"""
+    oc = safe_value(row[0])
+    fecha = safe_value(row[1])
+    distribuidor = safe_value(row[2])
+    cantidad = safe_value(row[3])
+
+    if not oc or (isinstance(oc, str) and oc.startswith('=')):
+        return None
+
+    oc = str(oc) if not isinstance(oc, str) else oc
+
+    try:
+        cantidad = float(cantidad) if cantidad else 0
+    except:
+        return None
+
+    # Buscar datos de la OC relacionada
+    oc_data = indexes.ordenes_compra.get(oc, {})
+    costo_unitario = oc_data.get('costoPorUnidad', 0)
+    costo_total = cantidad * costo_unitario if costo_unitario else oc_data.get('costoTotal', 0)
+    proveedor = oc_data.get('distribuidor', distribuidor or '')
+
+    return {
+        'id': f'ENT-{oc}-{row_idx}',
+        'fecha': fecha or '',
+        'ocRelacionada': oc,
+        'distribuidor': distribuidor or '',
+        'proveedor': proveedor,
+        'cantidad': cantidad,
+        'costoUnitario': costo_unitario,
+        'costoTotal': costo_total,
+        'numeroFactura': oc,  # Usar OC como número de factura
+        'nombre': f'Producto {oc}',
+        'productos': [{
+            'nombre': f'Producto {oc}',
+            'cantidad': cantidad
+        }]
+    }
+
+def parse_salida_almacen(row_idx, row, indexes):
+    """Salida de almacén de una fila (columnas G-J) o None si no aplica"""
+    fecha = safe_value(row[6])
+    cliente = safe_value(row[7])
+    cantidad = safe_value(row[8])
+    concepto = safe_value(row[9])
+
+    if not cliente or (isinstance(cliente, str) and cliente.startswith('=')):
+        return None
+
+    cliente = str(cliente) if not isinstance(cliente, str) else cliente
+
+    try:
+        cantidad = float(cantidad) if cantidad else 0
+    except:
+        return None
+
+    # Buscar venta relacionada para obtener precio y valor total
+    venta_relacionada = indexes.ventas.get((cliente, fecha))
+
+    precio_venta = venta_relacionada.get('precioVenta', 0) if venta_relacionada else 0
+    valor_total = venta_relacionada.get('totalVenta', cantidad * precio_venta) if venta_relacionada else 0
+
+    return {
+        'id': f'SAL-{fecha}-{cliente}-{row_idx}',
+        'fecha': fecha or '',
+        'cliente': cliente,
+        'cantidad': cantidad,
+        'concepto': concepto or '',
+        'motivoSalida': concepto or 'Venta',
+        'precioVenta': precio_venta,
+        'valorTotal': valor_total,
+        'nombre': venta_relacionada.get('productos', [{}])[0].get('nombre', 'Producto General') if venta_relacionada else 'Producto General',
+        'productos': [{
+            'nombre': 'Producto General',
+            'cantidad': cantidad
+        }]
+    }
+
+def parse_almacen(rows, ordenes_compra=None, ventas=None, indexes=None, categorias=None, start_row=4):
     """
     Parsea la hoja Almacen_Monte
     Estructura: Ingresos (OC | Cliente | Distribuidor | Cantidad) y Salidas (Fecha | Cliente | Cantidad | Concepto)
     Enriquece entradas con datos de OCs y salidas con datos de ventas
+    (búsquedas O(1) en `indexes`; si no se pasan, se construyen aquí)
+    `rows`: (fila, valores A..J) en orden desde `start_row`; ambos bloques salen
+    de la misma pasada
     """
     entradas = []
     salidas = []
     stock = []
 
-    # Crear mapas para búsqueda rápida
-    oc_map = {oc['id']: oc for oc in (ordenes_compra or [])}
-
-    # Ingresos - empiezan en fila 4, columnas A-D
-    for row_idx in range(4, min(100, ws.max_row + 1)):  # Limitar a 100 para no procesar toda la hoja
-        oc = safe_value(ws.cell(row_idx, 1))
-        fecha = safe_value(ws.cell(row_idx, 2))
-        distribuidor = safe_value(ws.cell(row_idx, 3))
-        cantidad = safe_value(ws.cell(row_idx, 4))
+    if indexes is None:
+        indexes = EntityIndexes(ventas=ventas, ordenes_compra=ordenes_compra)
 
-        if not oc or (isinstance(oc, str) and oc.startswith('=')):
+    # Ingresos (columnas A-D) y salidas (columnas G-J) en las mismas filas
+    for row_idx, row in rows:
+        if row_idx < start_row:
             continue
 
-        oc = str(oc) if not isinstance(oc, str) else oc
+        entrada = parse_entrada_almacen(row_idx, row, indexes)
+        if entrada is not None:
+            if categorias is not None:
+                categorias.add('entradas', entrada)
+            entradas.append(entrada)
 
-        try:
-            cantidad = float(cantidad) if cantidad else 0
-        except:
-            continue
+        salida = parse_salida_almacen(row_idx, row, indexes)
+        if salida is not None:
+            if categorias is not None:
+                categorias.add('salidas', salida)
+            salidas.append(salida)
 
-        # Buscar datos de la OC relacionada
-        oc_data = oc_map.get(oc, {})
-        costo_unitario = oc_data.get('costoPorUnidad', 0)
-        costo_total = cantidad * costo_unitario if costo_unitario else oc_data.get('costoTotal', 0)
-        proveedor = oc_data.get('distribuidor', distribuidor or '')
-
-        entrada = {
-            'id': f'ENT-{oc}-{row_idx}',
-            'fecha': fecha or '',
-            'ocRelacionada': oc,
-            'distribuidor': distribuidor or '',
-            'proveedor': proveedor,
-            'cantidad': cantidad,
-            'costoUnitario': costo_unitario,
-            'costoTotal': costo_total,
-            'numeroFactura': oc,  # Usar OC como número de factura
-            'nombre': f'Producto {oc}',
-            'productos': [{
-                'nombre': f'Producto {oc}',
-                'cantidad': cantidad
-            }]
-        }
+    return {
+        'stock': stock,
+        'entradas': entradas,
+        'salidas': salidas
+    }
 
-        entradas.append(entrada)
+def parse_ingreso_banco(row_idx, row, banco_nombre):
+    """Ingreso de una fila (columnas A-D) o None si no aplica"""
+    fecha = safe_value(row[0])
+    cliente = safe_value(row[1])
+    ingreso = safe_value(row[2])
+    concepto = safe_value(row[3])
 
-    # Salidas - columnas G-J
-    for row_idx in range(4, min(100, ws.max_row + 1)):
-        fecha = safe_value(ws.cell(row_idx, 7))
-        cliente = safe_value(ws.cell(row_idx, 8))
-        cantidad = safe_value(ws.cell(row_idx, 9))
-        concepto = safe_value(ws.cell(row_idx, 10))
+    if not fecha or (isinstance(fecha, str) and fecha.startswith('=')) or not ingreso:
+        return None
 
-        if not cliente or (isinstance(cliente, str) and cliente.startswith('=')):
-            continue
+    fecha = str(fecha) if not isinstance(fecha, str) else fecha
+    cliente = str(cliente) if cliente and not isinstance(cliente, str) else cliente
 
-        cliente = str(cliente) if not isinstance(cliente, str) else cliente
+    try:
+        ingreso = float(ingreso)
+    except:
+        return None
 
-        try:
-            cantidad = float(cantidad) if cantidad else 0
-        except:
-            continue
+    return {
+        'id': f'ING-{banco_nombre}-{fecha}-{row_idx}',
+        'fecha': fecha,
+        'cliente': cliente or 'N/A',
+        'monto': ingreso,  # ✅ Corregido: monto en vez de cantidad
+        'concepto': concepto or '',
+        'tipo': 'Ingreso'  # ✅ Corregido: Ingreso capitalizado
+    }
 
-        # Buscar venta relacionada para obtener precio y valor total
-        venta_relacionada = None
-        if ventas:
-            for venta in ventas:
-                if venta.get('cliente') == cliente and venta.get('fecha') == fecha:
-                    venta_relacionada = venta
-                    break
+def parse_gasto_banco(row_idx, row, banco_nombre):
+    """Gasto de una fila (columnas G-K) o None si no aplica"""
+    fecha = safe_value(row[6])
+    origen = safe_value(row[7])
+    gasto = safe_value(row[8])
+    tc = safe_value(row[9])
+    pesos = safe_value(row[10])
 
-        precio_venta = venta_relacionada.get('precioVenta', 0) if venta_relacionada else 0
-        valor_total = venta_relacionada.get('totalVenta', cantidad * precio_venta) if venta_relacionada else 0
+    if not fecha or (isinstance(fecha, str) and fecha.startswith('=')) or not gasto:
+        return None
 
-        salida = {
-            'id': f'SAL-{fecha}-{cliente}-{row_idx}',
-            'fecha': fecha or '',
-            'cliente': cliente,
-            'cantidad': cantidad,
-            'concepto': concepto or '',
-            'motivoSalida': concepto or 'Venta',
-            'precioVenta': precio_venta,
-            'valorTotal': valor_total,
-            'nombre': venta_relacionada.get('productos', [{}])[0].get('nombre', 'Producto General') if venta_relacionada else 'Producto General',
-            'productos': [{
-                'nombre': 'Producto General',
-                'cantidad': cantidad
-            }]
-        }
+    fecha = str(fecha) if not isinstance(fecha, str) else fecha
+    origen = str(origen) if origen and not isinstance(origen, str) else origen
 
-        salidas.append(salida)
+    try:
+        gasto = float(gasto)
+        tc = float(tc) if tc else 0
+        pesos = float(pesos) if pesos else 0
+    except:
+        return None
 
     return {
-        'stock': stock,
-        'entradas': entradas,
-        'salidas': salidas
+        'id': f'GAS-{banco_nombre}-{fecha}-{row_idx}',
+        'fecha': fecha,
+        'cliente': origen or 'N/A',
+        'monto': gasto,  # ✅ Corregido: monto en vez de cantidad
+        'tc': tc,
+        'pesos': pesos,
+        'concepto': '',
+        'tipo': 'Egreso'  # ✅ Corregido: Egreso capitalizado
     }
 
-def parse_banco(ws, banco_nombre):
+def parse_banco(rows, banco_nombre, start_row=4, categorias=None):
     """
     Parsea hojas de bancos (Bóveda_Monte, Utilidades, Flete_Sur, etc.)
     Estructura: Ingresos (Fecha | Cliente | Ingreso | Concepto) y Gastos (Fecha | Origen | Gasto | TC | Pesos)
+    `rows`: (fila, valores A..K) en orden desde la fila 2 (RF Actual); ingresos y
+    gastos salen de la misma pasada. Datos desde `start_row` (la fila tras los
+    encabezados, o una posterior en importación incremental)
     """
     ingresos = []
     gastos = []
     transferencias = []
+    rf_actual = 0
 
-    # RF Actual está en E2
-    try:
-        rf_actual = ws.cell(2, 5).value
-        rf_actual = float(rf_actual) if rf_actual else 0
-    except:
-        rf_actual = 0
-
-    # Ingresos - columnas A-D, empiezan en fila 4
-    for row_idx in range(4, min(200, ws.max_row + 1)):
-        fecha = safe_value(ws.cell(row_idx, 1))
-        cliente = safe_value(ws.cell(row_idx, 2))
-        ingreso = safe_value(ws.cell(row_idx, 3))
-        concepto = safe_value(ws.cell(row_idx, 4))
-
-        if not fecha or (isinstance(fecha, str) and fecha.startswith('=')) or not ingreso:
-            continue
-
-        fecha = str(fecha) if not isinstance(fecha, str) else fecha
-        cliente = str(cliente) if cliente and not isinstance(cliente, str) else cliente
-
-        try:
-            ingreso = float(ingreso)
-        except:
-            continue
-
-        registro = {
-            'id': f'ING-{banco_nombre}-{fecha}-{row_idx}',
-            'fecha': fecha,
-            'cliente': cliente or 'N/A',
-            'monto': ingreso,  # ✅ Corregido: monto en vez de cantidad
-            'concepto': concepto or '',
-            'tipo': 'Ingreso'  # ✅ Corregido: Ingreso capitalizado
-        }
-
-        ingresos.append(registro)
-
-    # Gastos - columnas G-J (o K dependiendo de la hoja)
-    for row_idx in range(4, min(200, ws.max_row + 1)):
-        fecha = safe_value(ws.cell(row_idx, 7))
-        origen = safe_value(ws.cell(row_idx, 8))
-        gasto = safe_value(ws.cell(row_idx, 9))
-        tc = safe_value(ws.cell(row_idx, 10))
-        pesos = safe_value(ws.cell(row_idx, 11))
-
-        if not fecha or (isinstance(fecha, str) and fecha.startswith('=')) or not gasto:
-            continue
-
-        fecha = str(fecha) if not isinstance(fecha, str) else fecha
-        origen = str(origen) if origen and not isinstance(origen, str) else origen
+    for row_idx, row in rows:
+        # RF Actual está en E2
+        if row_idx == 2:
+            try:
+                rf_actual = float(row[4]) if row[4] else 0
+            except:
+                rf_actual = 0
 
-        try:
-            gasto = float(gasto)
-            tc = float(tc) if tc else 0
-            pesos = float(pesos) if pesos else 0
-        except:
+        if row_idx < start_row:
             continue
 
-        registro = {
-            'id': f'GAS-{banco_nombre}-{fecha}-{row_idx}',
-            'fecha': fecha,
-            'cliente': origen or 'N/A',
-            'monto': gasto,  # ✅ Corregido: monto en vez de cantidad
-            'tc': tc,
-            'pesos': pesos,
-            'concepto': '',
-            'tipo': 'Egreso'  # ✅ Corregido: Egreso capitalizado
-        }
+        # Ingresos - columnas A-D; gastos - columnas G-K
+        ingreso = parse_ingreso_banco(row_idx, row, banco_nombre)
+        if ingreso is not None:
+            if categorias is not None:
+                categorias.add('movimientos', ingreso)
+            ingresos.append(ingreso)
 
-        gastos.append(registro)
+        gasto = parse_gasto_banco(row_idx, row, banco_nombre)
+        if gasto is not None:
+            if categorias is not None:
+                categorias.add('movimientos', gasto)
+            gastos.append(gasto)
 
     return {
         'capitalActual': rf_actual,
@@ -434,17 +509,53 @@ def parse_banco(ws, banco_nombre):
         'transferencias': transferencias
     }
 
+def merge_banco(anterior, nuevo):
+    """Agrega los movimientos nuevos de un banco a los de la importación anterior"""
+    ingresos = anterior['ingresos'] + nuevo['ingresos']
+    gastos = anterior['gastos'] + nuevo['gastos']
+    return {
+        **nuevo,
+        'registros': ingresos + gastos,
+        'ingresos': ingresos,
+        'gastos': gastos,
+        'transferencias': anterior['transferencias'] + nuevo['transferencias']
+    }
+
 def main():
-    """Función principal de conversión"""
+    """
+    Función principal de conversión (--incremental: sólo filas nuevas de ventas y bancos;
+    --no-recalc: no recalcular fórmulas sin valor cacheado; --streaming: leer las hojas
+    fila por fila desde el .xlsx mapeado en memoria, sin cargar el libro con openpyxl)
+    """
 
     excel_path = r'C:\Users\xpovo\Documents\premium-ecosystem\Administación_General.xlsx'
+    output_path = r'C:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json'
+    incremental = '--incremental' in sys.argv
+    streaming = '--streaming' in sys.argv
 
     print("🚀 INICIANDO CONVERSIÓN DE EXCEL A FLOWDISTRIBUTOR")
     print("=" * 80)
 
+    if streaming and incremental:
+        # Las marcas de agua comparan filas ya importadas: necesitan el libro completo
+        print("ℹ️  --incremental usa el libro completo; se ignora --streaming")
+        streaming = False
+
     try:
-        wb = openpyxl.load_workbook(excel_path, data_only=True)
-        print(f"✅ Excel cargado: {len(wb.sheetnames)} hojas encontradas")
+        if streaming:
+            # Memoria casi constante: sólo la fila actual y las cadenas compartidas compactas
+            wb = StreamingWorkbookReader(excel_path, mapped=True)
+            print(f"✅ Excel mapeado en memoria: {len(wb.sheetnames)} hojas encontradas")
+        else:
+            wb = open_session(excel_path).workbook(data_only=True)
+            print(f"✅ Excel cargado: {len(wb.sheetnames)} hojas encontradas")
+
+        # Fórmulas sin valor cacheado (archivo guardado sin recalcular)
+        if not streaming and '--no-recalc' not in sys.argv:
+            recalculo = recalculate_workbook(excel_path, wb)
+            if recalculo['stale']:
+                print(f"🧮 {recalculo['recalculated']} fórmulas sin valor recalculadas"
+                      f" ({recalculo['unsupported']} no soportadas)")
 
         # Estructura completa para FlowDistributor
         flow_data = {
@@ -463,38 +574,64 @@ def main():
             }
         }
 
+        # Marcas de agua de la corrida anterior (hojas que sólo crecen)
+        watermarks = ImportWatermarks(output_path, 'excel_to_flowdistributor') if incremental else None
+
+        # Clientes, distribuidores, conceptos y estatus: un objeto por valor distinto
+        categorias = CategoricalStore()
+
         # 1. Control_Maestro - Ventas
         if 'Control_Maestro' in wb.sheetnames:
             print("\n📊 Procesando Control_Maestro (Ventas)...")
-            flow_data['ventas'] = parse_control_maestro(wb['Control_Maestro'])
+            data_row = first_data_row(wb, 'Control_Maestro', SHEET_HEADERS['Control_Maestro'])
+            start_row = watermarks.first_row(wb['Control_Maestro'], 'Control_Maestro', data_row, 1, 12) if watermarks else data_row
+            ventas = parse_control_maestro(sheet_rows(wb, 'Control_Maestro', start_row, 12), start_row, categorias)
+            if start_row > data_row:
+                print(f"   ↻ Incremental: {len(ventas)} ventas nuevas desde la fila {start_row}")
+                categorias.extend('ventas', watermarks.previous['ventas'])
+                ventas = watermarks.previous['ventas'] + ventas
+            flow_data['ventas'] = ventas
             print(f"   ✓ {len(flow_data['ventas'])} ventas procesadas")
 
         # 2. Clientes
         if 'Clientes' in wb.sheetnames:
             print("\n👥 Procesando Clientes...")
-            flow_data['clientes'] = parse_clientes(wb['Clientes'])
+            data_row = first_data_row(wb, 'Clientes', SHEET_HEADERS['Clientes'])
+            flow_data['clientes'] = parse_clientes(sheet_rows(wb, 'Clientes', data_row, 10, min_col=5), data_row)
             print(f"   ✓ {len(flow_data['clientes'])} clientes procesados")
 
         # 3. Distribuidores y Órdenes de Compra
         if 'Distribuidores' in wb.sheetnames:
             print("\n📦 Procesando Distribuidores y Órdenes de Compra...")
-            ordenes, distribuidores = parse_distribuidores(wb['Distribuidores'])
+            data_row = first_data_row(wb, 'Distribuidores', SHEET_HEADERS['Distribuidores'])
+            ordenes, distribuidores = parse_distribuidores(sheet_rows(wb, 'Distribuidores', data_row, 11), categorias,
+                                                           data_row)
             flow_data['ordenesCompra'] = ordenes
             flow_data['distribuidores'] = distribuidores
             print(f"   ✓ {len(ordenes)} órdenes de compra procesadas")
             print(f"   ✓ {len(distribuidores)} distribuidores procesados")
 
+        # Índices hash sobre lo ya parseado (una sola construcción)
+        indexes = EntityIndexes(
+            ventas=flow_data['ventas'],
+            ordenes_compra=flow_data['ordenesCompra'],
+            clientes=flow_data['clientes']
+        )
+
         # 4. Almacén (enriquecer con datos de OCs y ventas)
         if 'Almacen_Monte' in wb.sheetnames:
             print("\n🏭 Procesando Almacén...")
-            flow_data['almacen'] = parse_almacen(
-                wb['Almacen_Monte'],
-                ordenes_compra=flow_data['ordenesCompra'],
-                ventas=flow_data['ventas']
-            )
+            data_row = first_data_row(wb, 'Almacen_Monte', SHEET_HEADERS['Almacen_Monte'])
+            flow_data['almacen'] = parse_almacen(sheet_rows(wb, 'Almacen_Monte', data_row, 10), indexes=indexes,
+                                                 categorias=categorias, start_row=data_row)
             print(f"   ✓ {len(flow_data['almacen']['entradas'])} entradas procesadas")
             print(f"   ✓ {len(flow_data['almacen']['salidas'])} salidas procesadas")
 
+        # Ventas cuyo cliente no existe en la hoja Clientes
+        if flow_data['clientes']:
+            for venta in flow_data['ventas']:
+                indexes.clientes.get(venta['cliente'])
+
         # 5. Bancos
         bancos_map = {
             'Bóveda_Monte': 'bovedaMonte',
@@ -508,13 +645,32 @@ def main():
         print("\n💰 Procesando Bancos...")
         for sheet_name, key in bancos_map.items():
             if sheet_name in wb.sheetnames:
-                flow_data['bancos'][key] = parse_banco(wb[sheet_name], key)
+                data_row = first_data_row(wb, sheet_name, BANCO_HEADERS)
+                start_row = watermarks.first_row(wb[sheet_name], sheet_name, data_row, 1, 11) if watermarks else data_row
+                banco = parse_banco(sheet_rows(wb, sheet_name, 2, 11), key, start_row, categorias)
+                if start_row > data_row:
+                    print(f"   ↻ {key}: incremental desde la fila {start_row}")
+                    anterior = watermarks.previous['bancos'][key]
+                    categorias.extend('movimientos', anterior['ingresos'] + anterior['gastos'])
+                    banco = merge_banco(anterior, banco)
+                flow_data['bancos'][key] = banco
                 print(f"   ✓ {key}: {len(flow_data['bancos'][key]['ingresos'])} ingresos, {len(flow_data['bancos'][key]['gastos'])} gastos")
 
+        if streaming:
+            sin_valor = sum(wb.uncached_formulas.values())
+            if sin_valor:
+                print(f"\n⚠️  {sin_valor} fórmulas sin valor cacheado se leyeron vacías"
+                      f" (sin --streaming se recalculan)")
+            wb.close()
+
         # Guardar JSON
-        output_path = r'C:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json'
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(flow_data, f, ensure_ascii=False, indent=2)
+        # Escritura atómica: el frontend nunca lee un archivo a medio escribir
+        # Ventas, clientes, OCs, distribuidores y movimientos de almacén como iteradores
+        streamed = iter_arrays(flow_data, ('ventas', 'clientes', 'ordenesCompra', 'distribuidores'))
+        streamed['almacen'] = iter_arrays(flow_data['almacen'], ('stock', 'entradas', 'salidas'))
+        dump_json(streamed, output_path, compact='--compact' in sys.argv)
+        if watermarks:
+            watermarks.save()
 
         print("\n" + "=" * 80)
         print("✅ CONVERSIÓN COMPLETADA EXITOSAMENTE")
@@ -529,6 +685,13 @@ def main():
 
         total_bancos = sum(1 for v in flow_data['bancos'].values() if v is not None)
         print(f"   • Bancos configurados: {total_bancos}")
+        internados = categorias.report()
+        print(f"   • Categorías: {internados['distinct']} valores distintos en {internados['cells']} celdas")
+
+        print("\n🔗 CALIDAD DE CRUCES:")
+        for nombre, cruce in indexes.report().items():
+            print(f"   • {nombre}: {cruce['matched']}/{cruce['lookups']} con coincidencia, "
+                  f"{cruce['unmatched_keys']} claves sin coincidencia")
 
         print("\n🎯 El archivo JSON está listo para importarse en FlowDistributor")
 
@@ -0,0 +1,1057 @@
+"""
+EVALUADOR NATIVO DE FÓRMULAS
+Los importadores leen el libro con `data_only=True`: cada fórmula trae el valor
+que Excel dejó cacheado. Si el archivo lo guardó una herramienta que no
+recalcula, esas celdas llegan en None. Aquí se recalculan sin pasar por Excel:
+sobre el grafo de dependencias (formula_graph) se evalúan en orden topológico
+las fórmulas sin valor y todo lo que depende de ellas, con memoización de
+valores y de rangos, y las funciones de rango (SUMIF/SUMIFS, VLOOKUP...)
+vectorizadas con NumPy o con índices agrupados que se construyen una vez.
+"""
+
+import math
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_DOWN, ROUND_HALF_UP, ROUND_UP, Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from openpyxl.utils.datetime import from_excel, to_excel
+
+from formula_graph import TOKEN, Cell, FormulaGraph, Reference, match_reference, structured_reference
+from sheet_extent import column_extents, forget_extents
+from workbook_session import open_session
+
+# Tokens completos de una fórmula: los de referencias más literales y operadores
+EXPRESSION_TOKEN = re.compile(TOKEN.pattern + r'''
+  | (?P<number>(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:E[+-]?[0-9]+)?)
+  | (?P<error>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A))
+  | (?P<operator><>|<=|>=|[-+*/^&=<>%])
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<separator>,)
+  | (?P<space>\s+)
+''', re.VERBOSE | re.IGNORECASE)
+
+# Último grupo capturado -> tipo de token
+TOKEN_KINDS = {'range': 'reference', 'columns': 'reference', 'rows': 'reference', 'cell': 'reference',
+               'spec': 'structured'}
+
+# Precedencia de operadores binarios (el ^ de Excel asocia por la izquierda)
+BINARY_POWER = {'=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1, '&': 2, '+': 3, '-': 3, '*': 4, '/': 4, '^': 5}
+UNARY_POWER = 6
+PERCENT_POWER = 7
+
+CRITERIA = re.compile(r'^(<=|>=|<>|<|>|=)?(.*)$', re.DOTALL)
+
+
+class ExcelError(Exception):
+    """Valor de error de Excel (#N/A, #DIV/0!...); se propaga como valor"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+class UnsupportedFormula(Exception):
+    """Sintaxis o función que el evaluador no cubre: la celda conserva su valor"""
+
+
+# ----------------------------------------------------------------------------
+# Análisis sintáctico
+# ----------------------------------------------------------------------------
+
+def token_kind(match: re.Match) -> str:
+    return TOKEN_KINDS.get(match.lastgroup, match.lastgroup)
+
+
+class FormulaParser:
+    """Parser de precedencia (Pratt) que produce un árbol de tuplas"""
+
+    def __init__(self, graph: FormulaGraph, sheet: str, cell: Tuple[int, int]):
+        self.graph = graph
+        self.sheet = sheet
+        self.cell = cell
+        self.tokens: List[Tuple[str, re.Match]] = []
+        self.position = 0
+
+    def parse(self, formula: str):
+        text = formula[1:] if formula.startswith('=') else formula
+        end = 0
+        for match in EXPRESSION_TOKEN.finditer(text):
+            if match.start() != end:
+                raise UnsupportedFormula(text[end:match.start()])
+            end = match.end()
+            kind = token_kind(match)
+            if kind != 'space':
+                self.tokens.append((kind, match))
+        if end != len(text):
+            raise UnsupportedFormula(text[end:])
+
+        node = self.expression(0)
+        if self.position != len(self.tokens):
+            raise UnsupportedFormula(self.tokens[self.position][1].group(0))
+        return node
+
+    def peek(self) -> Tuple[Optional[str], Optional[re.Match]]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def advance(self) -> Tuple[str, re.Match]:
+        if self.position >= len(self.tokens):
+            raise UnsupportedFormula('fin inesperado de la fórmula')
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expression(self, right_power: int):
+        left = self.prefix()
+        while True:
+            kind, match = self.peek()
+            if kind != 'operator':
+                return left
+            operator = match.group(0)
+            if operator == '%':
+                if PERCENT_POWER <= right_power:
+                    return left
+                self.advance()
+                left = ('percent', left)
+                continue
+            power = BINARY_POWER[operator]
+            if power <= right_power:
+                return left
+            self.advance()
+            left = ('binary', operator, left, self.expression(power))
+
+    def prefix(self):
+        kind, match = self.advance()
+        text = match.group(0)
+
+        if kind == 'number':
+            value = float(text)
+            return ('value', int(value) if value.is_integer() and 'e' not in text.lower() and '.' not in text
+                    else value)
+        if kind == 'string':
+            return ('value', text[1:-1].replace('""', '"'))
+        if kind == 'error':
+            return ('value', ExcelError(text.upper()))
+        if kind == 'operator' and text in ('-', '+'):
+            operand = self.expression(UNARY_POWER)
+            return ('negate', operand) if text == '-' else operand
+        if kind == 'open':
+            node = self.expression(0)
+            self.expect('close')
+            return node
+        if kind == 'function':
+            return self.call(match.group('function').upper())
+        if kind == 'reference':
+            if match.group('book'):
+                raise UnsupportedFormula(text)
+            return ('reference', self.graph.canonical(match_reference(match, self.sheet)))
+        if kind == 'structured':
+            resolved = structured_reference(match, self.sheet, self.graph.tables, self.cell)
+            return ('reference', resolved) if resolved else ('value', ExcelError('#REF!'))
+        if kind == 'name':
+            upper = text.upper()
+            if upper in ('TRUE', 'FALSE'):
+                return ('value', upper == 'TRUE')
+            return ('name', upper)
+        raise UnsupportedFormula(text)
+
+    def expect(self, kind: str):
+        found, match = self.advance()
+        if found != kind:
+            raise UnsupportedFormula(match.group(0))
+
+    def call(self, name: str):
+        # Prefijos de funciones nuevas guardados en el XML (_xlfn.IFERROR...)
+        for prefix in ('_XLFN.', '_XLWS.'):
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+
+        arguments = []
+        kind, _ = self.peek()
+        if kind == 'close':
+            self.advance()
+            return ('call', name, arguments)
+        while True:
+            kind, _ = self.peek()
+            arguments.append(('missing',) if kind in ('separator', 'close') else self.expression(0))
+            kind, match = self.advance()
+            if kind == 'close':
+                return ('call', name, arguments)
+            if kind != 'separator':
+                raise UnsupportedFormula(match.group(0))
+
+
+# ----------------------------------------------------------------------------
+# Conversión de valores (reglas de Excel)
+# ----------------------------------------------------------------------------
+
+MISSING = object()
+
+DATE_TYPES = (datetime, date, time, timedelta)
+COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b
+}
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_number(value):
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None or value is MISSING:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if is_number(value):
+        return value
+    if isinstance(value, DATE_TYPES):
+        return to_excel(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        raise ExcelError('#VALUE!')
+
+
+def to_text(value) -> str:
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None or value is MISSING:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, DATE_TYPES):
+        value = to_excel(value)
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def to_bool(value) -> bool:
+    if isinstance(value, ExcelError):
+        raise value
+    if isinstance(value, str):
+        if value.upper() in ('TRUE', 'FALSE'):
+            return value.upper() == 'TRUE'
+        raise ExcelError('#VALUE!')
+    return bool(to_number(value))
+
+
+def compare(operator: str, left, right) -> bool:
+    """Comparación de Excel: números < texto < lógicos; texto sin distinguir mayúsculas"""
+    def normalize(value, other):
+        if isinstance(value, ExcelError):
+            raise value
+        if value is None:
+            return '' if isinstance(other, str) else (False if isinstance(other, bool) else 0)
+        if isinstance(value, DATE_TYPES):
+            return to_excel(value)
+        return value
+
+    left, right = normalize(left, right), normalize(right, left)
+    rank = lambda value: 2 if isinstance(value, bool) else (1 if isinstance(value, str) else 0)
+    if rank(left) != rank(right):
+        return COMPARISONS[operator](rank(left), rank(right))
+    if isinstance(left, str):
+        return COMPARISONS[operator](left.casefold(), right.casefold())
+    return COMPARISONS[operator](left, right)
+
+
+def criteria_key(value):
+    """Clave con la que SUMIF/COUNTIF/VLOOKUP comparan por igualdad"""
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if is_number(value):
+        return float(value)
+    if isinstance(value, DATE_TYPES):
+        return float(to_excel(value))
+    text = str(value)
+    try:
+        return float(text)
+    except ValueError:
+        return text.casefold()
+
+
+def parse_criterion(criterion) -> Tuple[str, Any, bool]:
+    """(operador, operando, con comodines) de un criterio de SUMIF"""
+    if isinstance(criterion, ExcelError):
+        raise criterion
+    if criterion is None or criterion is MISSING:
+        return '=', 0.0, False
+    if not isinstance(criterion, str):
+        return '=', criteria_key(criterion), False
+
+    operator, operand = CRITERIA.match(criterion).groups()
+    operator = operator or '='
+    key = criteria_key(operand)
+    wildcard = isinstance(key, str) and operator in ('=', '<>') and re.search(r'(?<!~)[*?]', key) is not None
+    return operator, key, wildcard
+
+
+def wildcard_pattern(text: str) -> re.Pattern:
+    parts = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '~' and index + 1 < len(text):
+            parts.append(re.escape(text[index + 1]))
+            index += 2
+            continue
+        parts.append('.*' if char == '*' else '.' if char == '?' else re.escape(char))
+        index += 1
+    return re.compile(''.join(parts), re.DOTALL)
+
+
+def round_decimal(number: float, digits: int, rounding: str = ROUND_HALF_UP) -> float:
+    """Redondeo decimal como Excel (ROUND redondea 0.5 alejándose de cero)"""
+    exponent = Decimal(1).scaleb(-int(digits))
+    return float(Decimal(repr(float(number))).quantize(exponent, rounding=rounding))
+
+
+class RangeValue:
+    """Valores de un bloque (matriz de objetos) con vistas derivadas memoizadas"""
+
+    def __init__(self, reference: Reference, values: np.ndarray):
+        self.reference = reference
+        self.values = values
+        self._numbers = None
+        self._keys = None
+        self.error: Optional[ExcelError] = None
+        self.lookups: Dict[Tuple[str, int], Dict] = {}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    def numbers(self) -> np.ndarray:
+        """Números (fechas como serial) y NaN para texto, lógicos y vacíos"""
+        if self._numbers is None:
+            flat = self.values.ravel()
+            numbers = np.full(flat.size, np.nan)
+            for index, value in enumerate(flat):
+                if is_number(value):
+                    numbers[index] = value
+                elif isinstance(value, DATE_TYPES):
+                    numbers[index] = to_excel(value)
+                elif isinstance(value, ExcelError) and self.error is None:
+                    self.error = value
+            self._numbers = numbers.reshape(self.values.shape)
+        return self._numbers
+
+    def keys(self) -> np.ndarray:
+        if self._keys is None:
+            flat = self.values.ravel()
+            keys = np.empty(flat.size, dtype=object)
+            keys[:] = [criteria_key(value) for value in flat]
+            self._keys = keys.reshape(self.values.shape)
+        return self._keys
+
+    def checked_numbers(self) -> np.ndarray:
+        """Números presentes; un error dentro del rango se propaga (como en SUM)"""
+        numbers = self.numbers()
+        if self.error is not None:
+            raise self.error
+        return numbers[~np.isnan(numbers)]
+
+    def vector(self) -> np.ndarray:
+        """Fila o columna como vector 1D (MATCH, LOOKUP)"""
+        if 1 not in self.values.shape:
+            raise ExcelError('#N/A')
+        return self.values.ravel()
+
+    def first_positions(self, axis: str, index: int) -> Dict:
+        """Primera posición de cada clave en una columna/fila (búsqueda exacta O(1))"""
+        cache_key = (axis, index)
+        if cache_key not in self.lookups:
+            keys = self.keys()
+            line = keys[:, index] if axis == 'column' else keys[index, :]
+            positions = {}
+            for position, key in enumerate(line):
+                if not isinstance(key, ExcelError):
+                    positions.setdefault(key, position)
+            self.lookups[cache_key] = positions
+        return self.lookups[cache_key]
+
+    def criteria_mask(self, criterion) -> np.ndarray:
+        """Celdas que cumplen el criterio, vectorizado"""
+        operator, operand, wildcard = parse_criterion(criterion)
+        keys = self.keys()
+
+        if operator in ('=', '<>'):
+            if wildcard:
+                pattern = wildcard_pattern(operand)
+                mask = np.fromiter((isinstance(key, str) and pattern.fullmatch(key) is not None
+                                    for key in keys.ravel()), bool, keys.size).reshape(keys.shape)
+            else:
+                mask = np.asarray(keys == operand, dtype=bool)
+            return ~mask if operator == '<>' else mask
+
+        if isinstance(operand, float):
+            with np.errstate(invalid='ignore'):
+                return COMPARISONS[operator](self.numbers(), operand)
+        return np.fromiter((isinstance(key, str) and COMPARISONS[operator](key, operand)
+                            for key in keys.ravel()), bool, keys.size).reshape(keys.shape)
+
+
+# ----------------------------------------------------------------------------
+# Evaluación
+# ----------------------------------------------------------------------------
+
+# Reciben los nodos sin evaluar (evaluación perezosa de ramas)
+LAZY_FUNCTIONS = ('IF', 'IFERROR', 'IFNA', 'ISERROR', 'ISNA')
+
+SUBTOTAL_FUNCTIONS = {1: 'AVERAGE', 2: 'COUNT', 3: 'COUNTA', 4: 'MAX', 5: 'MIN', 6: 'PRODUCT', 9: 'SUM'}
+
+
+class FormulaEvaluator:
+    """
+    Recalcula fórmulas sobre un libro cargado con `data_only=True`.
+    Las celdas que no se recalculan aportan su valor cacheado; las
+    recalculadas quedan en `results` hasta `apply`.
+    """
+
+    def __init__(self, graph: FormulaGraph, workbook,
+                 defined_names: List[Tuple[str, Optional[str], str]] = ()):
+        self.graph = graph
+        self.workbook = workbook
+        self.sheets = {ws.title: ws for ws in workbook.worksheets}
+        self.results: Dict[Cell, Any] = {}
+        self.unsupported: Dict[Cell, str] = {}
+        self.ranges: Dict[Reference, RangeValue] = {}
+        self.grouped: Dict[Tuple, Dict] = {}
+
+        # Nombres definidos que no son referencias (constantes o fórmulas: IVA = 0.16)
+        self.constants = {(scope, name.upper()): text for name, scope, text in defined_names
+                          if (scope, name.upper()) not in graph.names and text}
+        self.constant_values: Dict[Tuple, Any] = {}
+
+        # Límite de cada hoja: última fila/columna con valor o con fórmula
+        self.bounds: Dict[str, Tuple[int, int]] = {}
+        for sheet, ws in self.sheets.items():
+            extents = column_extents(ws)
+            self.bounds[sheet] = (max(extents.values(), default=0), max(extents, default=0))
+        for sheet, col, row in graph.formulas:
+            max_row, max_col = self.bounds.get(sheet, (0, 0))
+            self.bounds[sheet] = (max(max_row, row), max(max_col, col))
+
+    @classmethod
+    def from_file(cls, excel_path: str, workbook) -> 'FormulaEvaluator':
+        """Fórmulas, nombres y tablas desde la sesión compartida del libro; valores desde `workbook`"""
+        session = open_session(excel_path)
+        reader = session.reader
+        graph = FormulaGraph(reader.sheetnames, reader.defined_names, reader.tables)
+        for sheet in reader.sheetnames:
+            for coordinate, formula in session.formulas(sheet):
+                graph.add_formula(sheet, coordinate, formula)
+        return cls(graph, workbook, reader.defined_names)
+
+    # ------------------------------------------------------------- recálculo
+
+    def cached_value(self, sheet: str, col: int, row: int):
+        ws = self.sheets.get(sheet)
+        cell = ws._cells.get((row, col)) if ws is not None else None
+        if cell is None:
+            return None
+        if cell.data_type == 'e' and isinstance(cell.value, str):
+            return ExcelError(cell.value)
+        return cell.value
+
+    def stale_cells(self) -> List[Cell]:
+        """Fórmulas sin valor cacheado (el archivo no se recalculó al guardarse)"""
+        return [cell for cell in self.graph.formulas if self.cached_value(*cell) is None]
+
+    def recalculate(self, cells: Optional[List[Cell]] = None) -> Dict[Cell, Any]:
+        """
+        Recalcula las celdas dadas (por defecto, las fórmulas sin valor) y todo lo
+        que depende de ellas, en orden topológico. Las referencias circulares y
+        las fórmulas no soportadas conservan su valor cacheado.
+        """
+        targets = set(self.stale_cells() if cells is None else cells)
+        targets.update(self.graph.downstream(targets))
+
+        order, _ = self.graph.topological_order()
+        for cell in order:
+            if cell not in targets:
+                continue
+            try:
+                self.results[cell] = self.evaluate_cell(cell)
+            except UnsupportedFormula as error:
+                self.unsupported[cell] = str(error)
+        return self.results
+
+    def apply(self) -> int:
+        """Escribe los valores recalculados en el libro; devuelve cuántas celdas"""
+        for (sheet, col, row), value in self.results.items():
+            cell = self.sheets[sheet].cell(row=row, column=col)
+            if isinstance(value, ExcelError):
+                value = value.code
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+
+            # Como lo dejaría Excel: fecha si la celda tiene formato de fecha, serial si no
+            if is_number(value) and cell.is_date:
+                value = from_excel(value)
+            elif isinstance(value, DATE_TYPES) and not cell.is_date:
+                value = to_excel(value)
+            cell.value = value
+
+        # Celdas que estaban vacías ahora tienen valor: la extensión cacheada ya no vale
+        for sheet in {sheet for sheet, _, _ in self.results}:
+            forget_extents(self.sheets[sheet])
+        return len(self.results)
+
+    def evaluate_cell(self, cell: Cell):
+        sheet, col, row = cell
+        tree = FormulaParser(self.graph, sheet, (col, row)).parse(self.graph.formulas[cell])
+        try:
+            value = self.scalar(self.argument(tree, cell), cell)
+        except ExcelError as error:
+            return error
+        except (ArithmeticError, ValueError):
+            return ExcelError('#NUM!')
+        if isinstance(value, np.generic):
+            value = value.item()
+        return 0 if value is None or value is MISSING else value
+
+    # --------------------------------------------------------------- valores
+
+    def cell_value(self, sheet: str, col: int, row: int):
+        cell = (sheet, col, row)
+        if cell in self.results:
+            return self.results[cell]
+        return self.cached_value(sheet, col, row)
+
+    def clip(self, reference: Reference) -> Reference:
+        """Recorta columnas/filas completas (A:A, 1:1) a la región usada de la hoja"""
+        max_row, max_col = self.bounds.get(reference.sheet, (0, 0))
+        return reference._replace(max_row=max(min(reference.max_row, max_row), reference.min_row),
+                                  max_col=max(min(reference.max_col, max_col), reference.min_col))
+
+    def range_value(self, reference: Reference) -> RangeValue:
+        """Valores del bloque (se arma una vez por rango distinto)"""
+        if reference.sheet not in self.sheets:
+            raise ExcelError('#REF!')
+        reference = self.clip(reference)
+        if reference not in self.ranges:
+            height = reference.max_row - reference.min_row + 1
+            width = reference.max_col - reference.min_col + 1
+            values = np.empty((height, width), dtype=object)
+            for i, row in enumerate(range(reference.min_row, reference.max_row + 1)):
+                for j, col in enumerate(range(reference.min_col, reference.max_col + 1)):
+                    values[i, j] = self.cell_value(reference.sheet, col, row)
+            self.ranges[reference] = RangeValue(reference, values)
+        return self.ranges[reference]
+
+    def resized(self, value: RangeValue, shape: Tuple[int, int]) -> RangeValue:
+        """Rango con la forma de otro a partir de su esquina (sum_range de SUMIF)"""
+        if value.shape == shape:
+            return value
+        reference = value.reference
+        return self.range_value(reference._replace(max_row=reference.min_row + shape[0] - 1,
+                                                   max_col=reference.min_col + shape[1] - 1))
+
+    def scalar(self, value, cell: Cell):
+        """Un solo valor: rangos por intersección implícita con la fila/columna de la fórmula"""
+        if isinstance(value, RangeValue):
+            reference = value.reference
+            if value.values.size == 1:
+                value = value.values[0, 0]
+            elif reference.min_col == reference.max_col and reference.min_row <= cell[2] <= reference.max_row:
+                value = value.values[cell[2] - reference.min_row, 0]
+            elif reference.min_row == reference.max_row and reference.min_col <= cell[1] <= reference.max_col:
+                value = value.values[0, cell[1] - reference.min_col]
+            else:
+                raise ExcelError('#VALUE!')
+        if isinstance(value, ExcelError):
+            raise value
+        return value
+
+    def name_value(self, name: str, cell: Cell):
+        sheet = cell[0]
+        references = self.graph.names.get((sheet, name)) or self.graph.names.get((None, name))
+        if references:
+            if len(references) != 1:
+                raise UnsupportedFormula(name)
+            return self.argument(('reference', references[0]), cell)
+
+        key = (sheet, name) if (sheet, name) in self.constants else (None, name)
+        if key not in self.constants:
+            raise ExcelError('#NAME?')
+        if key not in self.constant_values:
+            tree = FormulaParser(self.graph, key[0] or sheet, None).parse(self.constants[key])
+            self.constant_values[key] = self.scalar(self.argument(tree, cell), cell)
+        return self.constant_values[key]
+
+    def argument(self, node, cell: Cell):
+        """Evalúa un nodo; las referencias quedan como RangeValue (1x1 para celdas)"""
+        kind = node[0]
+        if kind == 'value':
+            if isinstance(node[1], ExcelError):
+                raise node[1]
+            return node[1]
+        if kind == 'reference':
+            reference = node[1]
+            if reference.is_cell:
+                if reference.sheet not in self.sheets:
+                    raise ExcelError('#REF!')
+                return RangeValue(reference, np.array([[self.cell_value(*reference[:3])]], dtype=object))
+            return self.range_value(reference)
+        if kind == 'missing':
+            return MISSING
+        if kind == 'name':
+            return self.name_value(node[1], cell)
+        if kind == 'negate':
+            return -to_number(self.scalar(self.argument(node[1], cell), cell))
+        if kind == 'percent':
+            return to_number(self.scalar(self.argument(node[1], cell), cell)) / 100
+        if kind == 'binary':
+            left = self.scalar(self.argument(node[2], cell), cell)
+            right = self.scalar(self.argument(node[3], cell), cell)
+            return self.binary(node[1], left, right)
+        if kind == 'call':
+            return self.call(node[1], node[2], cell)
+        raise UnsupportedFormula(kind)
+
+    def binary(self, operator: str, left, right):
+        if operator == '&':
+            return to_text(left) + to_text(right)
+        if operator in COMPARISONS:
+            return compare(operator, left, right)
+
+        left, right = to_number(left), to_number(right)
+        if operator == '+':
+            return left + right
+        if operator == '-':
+            return left - right
+        if operator == '*':
+            return left * right
+        if operator == '/':
+            if right == 0:
+                raise ExcelError('#DIV/0!')
+            return left / right
+        result = left ** right
+        if isinstance(result, complex):
+            raise ExcelError('#NUM!')
+        return result
+
+    def call(self, name: str, nodes: List, cell: Cell):
+        function = getattr(self, f'fn_{name.replace(".", "_")}', None)
+        if function is None:
+            raise UnsupportedFormula(name)
+        if name in LAZY_FUNCTIONS:
+            return function(cell, *nodes)
+        return function(cell, *[self.argument(node, cell) for node in nodes])
+
+    # -------------------------------------------------------- auxiliares
+
+    def numbers(self, cell: Cell, arguments) -> np.ndarray:
+        """Números de los argumentos: en rangos se ignoran texto y vacíos (como SUM)"""
+        parts = []
+        for argument in arguments:
+            if argument is MISSING:
+                continue
+            if isinstance(argument, RangeValue):
+                parts.append(argument.checked_numbers().ravel())
+            else:
+                parts.append(np.array([float(to_number(argument))]))
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def integer(self, value, cell: Cell) -> int:
+        return int(to_number(self.scalar(value, cell)))
+
+    def criteria_pairs(self, arguments, shape: Optional[Tuple[int, int]] = None):
+        """[(rango alineado, criterio)] de SUMIFS/COUNTIFS"""
+        if len(arguments) % 2:
+            raise ExcelError('#VALUE!')
+        pairs = []
+        for criteria_range, criterion in zip(arguments[::2], arguments[1::2]):
+            if not isinstance(criteria_range, RangeValue):
+                raise ExcelError('#VALUE!')
+            if shape is None:
+                shape = criteria_range.shape
+            elif criteria_range.shape != shape:
+                raise ExcelError('#VALUE!')
+            pairs.append((criteria_range, criterion))
+        return pairs
+
+    def conditional(self, cell: Cell, pairs, sum_range: Optional[RangeValue]) -> Tuple[float, int]:
+        """(suma, conteo) de las filas que cumplen todos los criterios"""
+        criteria = [self.scalar(criterion, cell) if criterion is not MISSING else None
+                    for _, criterion in pairs]
+        parsed = [parse_criterion(criterion) for criterion in criteria]
+
+        # Sólo igualdades: índice agrupado por clave, armado una vez por combinación de rangos
+        if all(operator == '=' and not wildcard for operator, _, wildcard in parsed):
+            group_key = (tuple(values.reference for values, _ in pairs),
+                         sum_range.reference if sum_range is not None else None)
+            if group_key not in self.grouped:
+                self.grouped[group_key] = self.build_groups(pairs, sum_range)
+            total, count, error = self.grouped[group_key].get(tuple(operand for _, operand, _ in parsed),
+                                                               (0.0, 0, None))
+            if error is not None:
+                raise error
+            return float(total), count
+
+        mask = np.ones(pairs[0][0].shape, dtype=bool)
+        for (values, _), criterion in zip(pairs, criteria):
+            mask &= values.criteria_mask(criterion)
+        if sum_range is None:
+            return 0.0, int(mask.sum())
+        numbers = sum_range.numbers()
+        selected = sum_range.values[mask]
+        for value in selected:
+            if isinstance(value, ExcelError):
+                raise value
+        return float(np.nansum(numbers[mask])), int(mask.sum())
+
+    def build_groups(self, pairs, sum_range: Optional[RangeValue]) -> Dict[Tuple, List]:
+        keys = [values.keys().ravel() for values, _ in pairs]
+        numbers = sum_range.numbers().ravel() if sum_range is not None else None
+        raw = sum_range.values.ravel() if sum_range is not None else None
+
+        groups = {}
+        for index, key in enumerate(zip(*keys)):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0.0, 0, None]
+            group[1] += 1
+            if numbers is not None:
+                if not math.isnan(numbers[index]):
+                    group[0] += numbers[index]
+                elif isinstance(raw[index], ExcelError) and group[2] is None:
+                    group[2] = raw[index]
+        return {key: tuple(group) for key, group in groups.items()}
+
+    # ------------------------------------------------------------ funciones
+
+    def fn_SUM(self, cell, *arguments):
+        return float(np.sum(self.numbers(cell, arguments)))
+
+    def fn_PRODUCT(self, cell, *arguments):
+        numbers = self.numbers(cell, arguments)
+        return float(np.prod(numbers)) if numbers.size else 0.0
+
+    def fn_AVERAGE(self, cell, *arguments):
+        numbers = self.numbers(cell, arguments)
+        if not numbers.size:
+            raise ExcelError('#DIV/0!')
+        return float(np.mean(numbers))
+
+    def fn_MAX(self, cell, *arguments):
+        numbers = self.numbers(cell, arguments)
+        return float(np.max(numbers)) if numbers.size else 0.0
+
+    def fn_MIN(self, cell, *arguments):
+        numbers = self.numbers(cell, arguments)
+        return float(np.min(numbers)) if numbers.size else 0.0
+
+    def fn_COUNT(self, cell, *arguments):
+        count = 0
+        for argument in arguments:
+            if isinstance(argument, RangeValue):
+                count += int(np.count_nonzero(~np.isnan(argument.numbers())))
+            elif is_number(argument) or isinstance(argument, (bool,) + DATE_TYPES):
+                count += 1
+        return count
+
+    def fn_COUNTA(self, cell, *arguments):
+        count = 0
+        for argument in arguments:
+            if isinstance(argument, RangeValue):
+                count += sum(1 for value in argument.values.ravel() if value is not None)
+            elif argument is not MISSING:
+                count += 1
+        return count
+
+    def fn_SUBTOTAL(self, cell, function_number, *arguments):
+        name = SUBTOTAL_FUNCTIONS.get(self.integer(function_number, cell) % 100)
+        if name is None:
+            raise UnsupportedFormula(f'SUBTOTAL({function_number})')
+        return getattr(self, f'fn_{name}')(cell, *arguments)
+
+    def fn_SUMIF(self, cell, criteria_range, criterion, sum_range=MISSING):
+        if not isinstance(criteria_range, RangeValue):
+            raise ExcelError('#VALUE!')
+        if sum_range is MISSING:
+            sum_range = criteria_range
+        elif not isinstance(sum_range, RangeValue):
+            raise ExcelError('#VALUE!')
+        sum_range = self.resized(sum_range, criteria_range.shape)
+        return self.conditional(cell, [(criteria_range, criterion)], sum_range)[0]
+
+    def fn_SUMIFS(self, cell, sum_range, *arguments):
+        if not isinstance(sum_range, RangeValue):
+            raise ExcelError('#VALUE!')
+        return self.conditional(cell, self.criteria_pairs(arguments, sum_range.shape), sum_range)[0]
+
+    def fn_COUNTIF(self, cell, criteria_range, criterion):
+        return self.fn_COUNTIFS(cell, criteria_range, criterion)
+
+    def fn_COUNTIFS(self, cell, *arguments):
+        return self.conditional(cell, self.criteria_pairs(arguments), None)[1]
+
+    def fn_AVERAGEIF(self, cell, criteria_range, criterion, average_range=MISSING):
+        if average_range is MISSING:
+            average_range = criteria_range
+        average_range = self.resized(average_range, criteria_range.shape)
+        pairs = [(criteria_range, criterion)]
+        total, _ = self.conditional(cell, pairs, average_range)
+        mask = criteria_range.criteria_mask(self.scalar(criterion, cell))
+        count = int(np.count_nonzero(~np.isnan(average_range.numbers()[mask])))
+        if not count:
+            raise ExcelError('#DIV/0!')
+        return total / count
+
+    def fn_IF(self, cell, condition, when_true=('value', True), when_false=('value', False)):
+        branch = when_true if to_bool(self.scalar(self.argument(condition, cell), cell)) else when_false
+        result = self.argument(branch, cell)
+        return 0 if result is MISSING else result
+
+    def fn_IFERROR(self, cell, value, fallback):
+        try:
+            return self.scalar(self.argument(value, cell), cell)
+        except ExcelError:
+            return self.argument(fallback, cell)
+
+    def fn_IFNA(self, cell, value, fallback):
+        try:
+            return self.scalar(self.argument(value, cell), cell)
+        except ExcelError as error:
+            if error.code != '#N/A':
+                raise
+            return self.argument(fallback, cell)
+
+    def fn_ISERROR(self, cell, value):
+        try:
+            self.scalar(self.argument(value, cell), cell)
+        except ExcelError:
+            return True
+        return False
+
+    def fn_ISNA(self, cell, value):
+        try:
+            self.scalar(self.argument(value, cell), cell)
+        except ExcelError as error:
+            return error.code == '#N/A'
+        return False
+
+    def fn_ISBLANK(self, cell, value):
+        return self.scalar(value, cell) is None
+
+    def fn_ISNUMBER(self, cell, value):
+        return is_number(self.scalar(value, cell))
+
+    def fn_ISTEXT(self, cell, value):
+        return isinstance(self.scalar(value, cell), str)
+
+    def logical_values(self, cell, arguments) -> List[bool]:
+        values = []
+        for argument in arguments:
+            if isinstance(argument, RangeValue):
+                for value in argument.values.ravel():
+                    if isinstance(value, ExcelError):
+                        raise value
+                    if isinstance(value, bool) or is_number(value):
+                        values.append(bool(value))
+            elif argument is not MISSING:
+                values.append(to_bool(argument))
+        if not values:
+            raise ExcelError('#VALUE!')
+        return values
+
+    def fn_AND(self, cell, *arguments):
+        return all(self.logical_values(cell, arguments))
+
+    def fn_OR(self, cell, *arguments):
+        return any(self.logical_values(cell, arguments))
+
+    def fn_NOT(self, cell, value):
+        return not to_bool(self.scalar(value, cell))
+
+    def fn_VLOOKUP(self, cell, lookup_value, table, column, approximate=True):
+        if not isinstance(table, RangeValue):
+            raise ExcelError('#VALUE!')
+        lookup_value = self.scalar(lookup_value, cell)
+        column = self.integer(column, cell)
+        if column < 1:
+            raise ExcelError('#VALUE!')
+        if column > table.shape[1]:
+            raise ExcelError('#REF!')
+
+        approximate = approximate is MISSING or to_bool(self.scalar(approximate, cell))
+        if approximate:
+            position = self.approximate_position(table.values[:, 0], lookup_value)
+        else:
+            position = table.first_positions('column', 0).get(criteria_key(lookup_value))
+        if position is None:
+            raise ExcelError('#N/A')
+        return table.values[position, column - 1]
+
+    def approximate_position(self, line: np.ndarray, lookup_value) -> Optional[int]:
+        """Última posición con valor <= buscado (datos ordenados, como Excel)"""
+        position = None
+        for index, value in enumerate(line):
+            if value is None or isinstance(value, ExcelError):
+                continue
+            if compare('<=', value, lookup_value):
+                position = index
+            else:
+                break
+        return position
+
+    def fn_MATCH(self, cell, lookup_value, lookup_range, match_type=1):
+        if not isinstance(lookup_range, RangeValue):
+            raise ExcelError('#N/A')
+        lookup_value = self.scalar(lookup_value, cell)
+        match_type = 1 if match_type is MISSING else self.integer(match_type, cell)
+
+        if match_type == 0:
+            axis = 'column' if lookup_range.shape[1] == 1 else 'row'
+            if 1 not in lookup_range.shape:
+                raise ExcelError('#N/A')
+            position = lookup_range.first_positions(axis, 0).get(criteria_key(lookup_value))
+        elif match_type == 1:
+            position = self.approximate_position(lookup_range.vector(), lookup_value)
+        else:
+            raise UnsupportedFormula('MATCH(..., -1)')
+        if position is None:
+            raise ExcelError('#N/A')
+        return position + 1
+
+    def fn_INDEX(self, cell, values, row, column=MISSING):
+        if not isinstance(values, RangeValue):
+            raise ExcelError('#VALUE!')
+        row = self.integer(row, cell)
+        column = 1 if column is MISSING else self.integer(column, cell)
+        height, width = values.shape
+        if height == 1 and column == 1 and row > 1:
+            row, column = 1, row
+        if row < 1 or column < 1:
+            raise UnsupportedFormula('INDEX con fila/columna 0')
+        if row > height or column > width:
+            raise ExcelError('#REF!')
+        return values.values[row - 1, column - 1]
+
+    def fn_ROUND(self, cell, number, digits=0):
+        digits = 0 if digits is MISSING else self.integer(digits, cell)
+        return round_decimal(to_number(self.scalar(number, cell)), digits)
+
+    def fn_ROUNDUP(self, cell, number, digits=0):
+        digits = 0 if digits is MISSING else self.integer(digits, cell)
+        return round_decimal(to_number(self.scalar(number, cell)), digits, rounding=ROUND_UP)
+
+    def fn_ROUNDDOWN(self, cell, number, digits=0):
+        digits = 0 if digits is MISSING else self.integer(digits, cell)
+        return round_decimal(to_number(self.scalar(number, cell)), digits, rounding=ROUND_DOWN)
+
+    def fn_ABS(self, cell, number):
+        return abs(to_number(self.scalar(number, cell)))
+
+    def fn_INT(self, cell, number):
+        return math.floor(to_number(self.scalar(number, cell)))
+
+    def fn_MOD(self, cell, number, divisor):
+        divisor = to_number(self.scalar(divisor, cell))
+        if divisor == 0:
+            raise ExcelError('#DIV/0!')
+        return to_number(self.scalar(number, cell)) % divisor
+
+    def fn_CONCATENATE(self, cell, *arguments):
+        return ''.join(to_text(self.scalar(argument, cell)) for argument in arguments)
+
+    def fn_CONCAT(self, cell, *arguments):
+        parts = []
+        for argument in arguments:
+            if isinstance(argument, RangeValue):
+                parts.extend(to_text(value) for value in argument.values.ravel())
+            else:
+                parts.append(to_text(argument))
+        return ''.join(parts)
+
+    def fn_LEFT(self, cell, text, count=1):
+        count = 1 if count is MISSING else self.integer(count, cell)
+        return to_text(self.scalar(text, cell))[:count]
+
+    def fn_RIGHT(self, cell, text, count=1):
+        count = 1 if count is MISSING else self.integer(count, cell)
+        text = to_text(self.scalar(text, cell))
+        return text[len(text) - count:] if count else ''
+
+    def fn_MID(self, cell, text, start, count):
+        start, count = self.integer(start, cell), self.integer(count, cell)
+        if start < 1 or count < 0:
+            raise ExcelError('#VALUE!')
+        return to_text(self.scalar(text, cell))[start - 1:start - 1 + count]
+
+    def fn_LEN(self, cell, text):
+        return len(to_text(self.scalar(text, cell)))
+
+    def fn_UPPER(self, cell, text):
+        return to_text(self.scalar(text, cell)).upper()
+
+    def fn_LOWER(self, cell, text):
+        return to_text(self.scalar(text, cell)).lower()
+
+    def fn_TRIM(self, cell, text):
+        return ' '.join(part for part in to_text(self.scalar(text, cell)).split(' ') if part)
+
+    def fn_TODAY(self, cell):
+        return datetime.combine(date.today(), time())
+
+    def fn_NOW(self, cell):
+        return datetime.now()
+
+    def fn_DATE(self, cell, year, month, day):
+        year, month, day = (self.integer(value, cell) for value in (year, month, day))
+        if year < 1900:
+            year += 1900
+        first = datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+        return first + timedelta(days=day - 1)
+
+    def date_part(self, value, cell) -> datetime:
+        value = self.scalar(value, cell)
+        if isinstance(value, datetime):
+            return value
+        return from_excel(to_number(value))
+
+    def fn_YEAR(self, cell, value):
+        return self.date_part(value, cell).year
+
+    def fn_MONTH(self, cell, value):
+        return self.date_part(value, cell).month
+
+    def fn_DAY(self, cell, value):
+        return self.date_part(value, cell).day
+
+
+def recalculate_workbook(excel_path: str, workbook) -> Dict[str, int]:
+    """
+    Recalcula en `workbook` (cargado con data_only=True) las fórmulas que no traen
+    valor cacheado y sus dependientes. Devuelve cuántas había, cuántas se
+    escribieron y cuántas quedaron sin soporte.
+    """
+    evaluator = FormulaEvaluator.from_file(excel_path, workbook)
+    stale = evaluator.stale_cells()
+    if not stale:
+        return {'stale': 0, 'recalculated': 0, 'unsupported': 0}
+
+    evaluator.recalculate(stale)
+    return {
+        'stale': len(stale),
+        'recalculated': evaluator.apply(),
+        'unsupported': len(evaluator.unsupported)
+    }
@@ -0,0 +1,516 @@
+"""
+GRAFO DE DEPENDENCIAS DE FÓRMULAS
+Un tokenizador compilado (una sola expresión regular) reconoce referencias a
+celdas, rangos (A1:B9, A:A, 1:3), otras hojas ('Hoja X'!A1), referencias
+estructuradas a tablas (OC[Origen], V_Monte[[#This Row],[Ingreso]]) y nombres
+definidos. Con ellas se arma un grafo con nodos de celda y de rango: cada rango
+distinto es un solo nodo aunque lo usen miles de fórmulas (SUMIF sobre A:A).
+Responde "¿qué depende de X?" y da el orden topológico de recálculo.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter, range_boundaries
+
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+
+# Rangos más anchos que esto no se indexan por columna (p. ej. filas completas 1:3)
+WIDE_RANGE_COLUMNS = 64
+
+TOKEN = re.compile(r'''
+    (?P<string>"(?:[^"]|"")*")
+  | (?<![\w.$])
+    (?:(?P<book>\[\d+\])?(?P<sheet>'(?:[^']|'')+'|[^\W\d][\w.]*)!)?
+    (?:
+        (?P<range>\$?[A-Z]{1,3}\$?[0-9]+:\$?[A-Z]{1,3}\$?[0-9]+)
+      | (?P<columns>\$?[A-Z]{1,3}:\$?[A-Z]{1,3})
+      | (?P<rows>\$?[0-9]+:\$?[0-9]+)
+      | (?P<cell>\$?[A-Z]{1,3}\$?[0-9]+)
+    )(?![\w(\[])
+  | (?<![\w.$])(?P<table>[^\W\d][\w.]*)?\[(?P<spec>(?:[^\[\]']|'.|\[(?:[^\[\]']|'.)*\])*)\]
+  | (?<![\w.$])(?P<function>[A-Z_][\w.]*)\s*\(
+  | (?<![\w.$])(?P<name>[^\W\d][\w.]*)
+''', re.VERBOSE | re.IGNORECASE)
+
+# Partes de una referencia estructurada: [#This Row], [Columna]...
+SPEC_ITEM = re.compile(r"\[((?:[^\[\]']|'.)*)\]")
+SPEC_ESCAPE = re.compile(r"'(.)")
+
+CELL_PARTS = re.compile(r'\$?([A-Za-z]{1,3})\$?([0-9]+)')
+
+# (hoja, columna, fila)
+Cell = Tuple[str, int, int]
+
+# Pocas letras de columna distintas: se convierten una vez
+column_number = lru_cache(maxsize=None)(column_index_from_string)
+
+
+class Reference(NamedTuple):
+    """Bloque rectangular de una hoja (una celda si min == max)"""
+    sheet: str
+    min_col: int
+    min_row: int
+    max_col: int
+    max_row: int
+
+    @property
+    def is_cell(self) -> bool:
+        return self.min_col == self.max_col and self.min_row == self.max_row
+
+    def contains(self, sheet: str, col: int, row: int) -> bool:
+        return (sheet == self.sheet and self.min_col <= col <= self.max_col
+                and self.min_row <= row <= self.max_row)
+
+    def intersects(self, other: 'Reference') -> bool:
+        return (self.sheet == other.sheet
+                and self.min_col <= other.max_col and other.min_col <= self.max_col
+                and self.min_row <= other.max_row and other.min_row <= self.max_row)
+
+    def label(self) -> str:
+        start = f'{get_column_letter(self.min_col)}{self.min_row}'
+        if self.is_cell:
+            return f'{self.sheet}!{start}'
+        return f'{self.sheet}!{start}:{get_column_letter(self.max_col)}{self.max_row}'
+
+
+class Table(NamedTuple):
+    """Tabla de Excel (ListObject): bloque completo, columnas y filas de encabezado/totales"""
+    name: str
+    ref: Reference
+    columns: Tuple[str, ...]
+    header_rows: int = 1
+    totals_rows: int = 0
+
+    def column(self, name: str) -> Optional[int]:
+        name = SPEC_ESCAPE.sub(r'\1', name).strip().casefold()
+        for index, column in enumerate(self.columns):
+            if column.casefold() == name:
+                return self.ref.min_col + index
+        return None
+
+    def resolve(self, spec: str, row: Optional[int] = None) -> Optional[Reference]:
+        """'Origen', '@Ingreso', '[#This Row],[Ingreso]', '[#All]', '[Col1]:[Col2]'..."""
+        spec = spec.strip()
+        if spec.startswith('@'):
+            rest = spec[1:].strip()
+            spec = '[#This Row]' + (',' + (rest if rest.startswith('[') else f'[{rest}]') if rest else '')
+        items = SPEC_ITEM.findall(spec) if spec.startswith('[') else ([spec] if spec else [])
+
+        sections = [item.strip().casefold() for item in items if item.strip().startswith('#')]
+        columns = [self.column(item) for item in items if not item.strip().startswith('#')]
+        if None in columns:
+            return None
+
+        first_data = self.ref.min_row + self.header_rows
+        last_data = self.ref.max_row - self.totals_rows
+        spans = {
+            '#all': (self.ref.min_row, self.ref.max_row),
+            '#data': (first_data, last_data),
+            '#headers': (self.ref.min_row, first_data - 1),
+            '#totals': (last_data + 1, self.ref.max_row),
+            '#this row': (row, row)
+        }
+        rows = [spans.get(section) for section in sections or ['#data']]
+        if None in rows or (row is None and '#this row' in sections):
+            return None
+
+        min_col, max_col = (min(columns), max(columns)) if columns else (self.ref.min_col, self.ref.max_col)
+        return Reference(self.ref.sheet, min_col, min(r[0] for r in rows), max_col, max(r[1] for r in rows))
+
+
+def workbook_tables(workbook) -> List[Dict]:
+    """Definiciones de tablas de un libro de openpyxl (mismo formato que el lector en streaming)"""
+    tables = []
+    for ws in workbook.worksheets:
+        for table in ws.tables.values():
+            tables.append({
+                'name': table.displayName or table.name,
+                'sheet': ws.title,
+                'ref': table.ref,
+                'columns': [column.name for column in table.tableColumns],
+                'header_rows': 1 if table.headerRowCount is None else table.headerRowCount,
+                'totals_rows': table.totalsRowCount or 0
+            })
+    return tables
+
+
+def cell_label(cell: Cell) -> str:
+    sheet, col, row = cell
+    return f'{sheet}!{get_column_letter(col)}{row}'
+
+
+def unquote_sheet(sheet: str) -> str:
+    if sheet.startswith("'"):
+        return sheet[1:-1].replace("''", "'")
+    return sheet
+
+
+def split_cell(text: str) -> Tuple[int, int]:
+    """'$B$7' -> (2, 7)"""
+    match = CELL_PARTS.fullmatch(text)
+    if match is None:
+        raise ValueError(f'Coordenada inválida: {text}')
+    return column_number(match.group(1).upper()), int(match.group(2))
+
+
+def match_reference(match: re.Match, sheet: str) -> Reference:
+    """Convierte un token de referencia en un bloque absoluto"""
+    if match.group('sheet'):
+        sheet = unquote_sheet(match.group('sheet'))
+
+    if match.group('cell'):
+        col, row = split_cell(match.group('cell'))
+        return Reference(sheet, col, row, col, row)
+
+    if match.group('range'):
+        start, end = match.group('range').split(':')
+        (col1, row1), (col2, row2) = split_cell(start), split_cell(end)
+        return Reference(sheet, min(col1, col2), min(row1, row2), max(col1, col2), max(row1, row2))
+
+    if match.group('columns'):
+        col1, col2 = (column_index_from_string(part.replace('$', '').upper())
+                      for part in match.group('columns').split(':'))
+        return Reference(sheet, min(col1, col2), 1, max(col1, col2), MAX_ROW)
+
+    row1, row2 = (int(part.replace('$', '')) for part in match.group('rows').split(':'))
+    return Reference(sheet, 1, min(row1, row2), MAX_COLUMN, max(row1, row2))
+
+
+def tokenize(formula: str) -> Iterator[re.Match]:
+    """Tokens relevantes de la fórmula (cadenas literales incluidas, para saltarlas)"""
+    return TOKEN.finditer(formula)
+
+
+def formula_functions(formula: str) -> List[str]:
+    """Funciones llamadas, en orden de aparición (la más externa primero)"""
+    return [match.group('function').upper() for match in tokenize(formula) if match.group('function')]
+
+
+def structured_reference(match: re.Match, sheet: Optional[str], tables: Optional[Dict[str, Table]],
+                         cell: Optional[Tuple[int, int]]) -> Optional[Reference]:
+    """Resuelve Tabla[...] (o [@Columna] dentro de la tabla de la celda)"""
+    if not tables:
+        return None
+    col, row = cell if cell else (None, None)
+    if match.group('table'):
+        table = tables.get(match.group('table').upper())
+    else:
+        table = next((t for t in tables.values()
+                      if col is not None and t.ref.contains(sheet, col, row)), None)
+    if table is None:
+        return None
+
+    spec = match.group('spec')
+    if '@' not in spec and '#this row' not in spec.casefold():
+        row = None
+    return resolve_table(table, spec, row)
+
+
+@lru_cache(maxsize=4096)
+def resolve_table(table: Table, spec: str, row: Optional[int]) -> Optional[Reference]:
+    """Las mismas referencias a columnas se repiten en miles de fórmulas"""
+    return table.resolve(spec, row)
+
+
+def formula_references(formula: str, sheet: Optional[str] = None, names: Optional[Dict] = None,
+                       tables: Optional[Dict[str, Table]] = None,
+                       cell: Optional[Tuple[int, int]] = None) -> List[Tuple[str, List[Reference]]]:
+    """
+    Referencias de la fórmula en orden de aparición y sin repetir:
+    [(texto tal como aparece sin '$', bloques a los que apunta)].
+    Los nombres definidos se resuelven con `names` ({(hoja|None, NOMBRE): [bloques]})
+    y las tablas con `tables` ({NOMBRE: Table}); `cell` = (columna, fila) de la
+    fórmula, para [#This Row]. Sin `sheet` las referencias locales quedan con hoja ''.
+    """
+    references = []
+    seen = set()
+    for match in tokenize(formula):
+        if match.group('string') or match.group('function') or match.group('book'):
+            continue
+
+        if match.group('spec') is not None:
+            target = structured_reference(match, sheet, tables, cell)
+            if target is None:
+                continue
+            targets = [target]
+            text = match.group(0)
+        elif match.group('name'):
+            name = match.group('name').upper()
+            targets = None
+            if names:
+                targets = names.get((sheet, name)) or names.get((None, name))
+            if not targets:
+                continue
+            text = match.group('name')
+        else:
+            targets = [match_reference(match, sheet or '')]
+            text = match.group(0).replace('$', '')
+
+        if text not in seen:
+            seen.add(text)
+            references.append((text, targets))
+    return references
+
+
+class FormulaGraph:
+    """
+    Grafo de dependencias de fórmulas de un libro.
+    Nodos: celdas con fórmula y rangos referenciados (uno por rango distinto).
+    Aristas: precedente -> dependiente (celda -> fórmula, celda -> rango -> fórmula).
+    """
+
+    def __init__(self, sheetnames: Iterable[str] = (), defined_names: Iterable[Tuple[str, Optional[str], str]] = (),
+                 tables: Iterable[Dict] = ()):
+        # Excel no distingue mayúsculas en los nombres de hoja
+        self.sheets = {name.casefold(): name for name in sheetnames}
+        self.names: Dict[Tuple[Optional[str], str], List[Reference]] = {}
+        self.tables: Dict[str, Table] = {}
+        self.formulas: Dict[Cell, str] = {}
+        self.precedents: Dict[Cell, List[Reference]] = {}
+        self.cell_dependents: Dict[Cell, List[Cell]] = defaultdict(list)
+        self.range_dependents: Dict[Reference, List[Cell]] = defaultdict(list)
+        self._linked = False
+
+        for table in tables:
+            self.add_table(**table)
+        for name, scope, text in defined_names:
+            self.add_name(name, text, scope)
+
+    def sheet(self, name: str) -> str:
+        return self.sheets.get(name.casefold(), name)
+
+    def canonical(self, reference: Reference) -> Reference:
+        sheet = self.sheet(reference.sheet)
+        return reference if sheet == reference.sheet else reference._replace(sheet=sheet)
+
+    # ----------------------------------------------------------- construcción
+
+    def add_table(self, name: str, sheet: str, ref: str, columns: List[str], header_rows: int = 1,
+                  totals_rows: int = 0):
+        """Tabla del libro, para resolver sus referencias estructuradas"""
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        self.tables[name.upper()] = Table(name, Reference(self.sheet(sheet), min_col, min_row, max_col, max_row),
+                                          tuple(columns), header_rows, totals_rows)
+
+    def references(self, formula: str, sheet: Optional[str], coordinate: Optional[str] = None
+                   ) -> List[Tuple[str, List[Reference]]]:
+        """`formula_references` con los nombres y tablas del libro"""
+        cell = split_cell(coordinate) if coordinate else None
+        return formula_references(formula, sheet, self.names, self.tables, cell)
+
+    def add_name(self, name: str, text: str, scope: Optional[str] = None):
+        """Nombre definido del libro (o de una hoja, con `scope`)"""
+        targets = [self.canonical(reference)
+                   for _, references in formula_references(text.lstrip('='), scope)
+                   for reference in references if reference.sheet]
+        if targets:
+            self.names[(scope, name.upper())] = targets
+
+    def add_formula(self, sheet: str, coordinate: str, formula: str):
+        sheet = self.sheet(sheet)
+        col, row = split_cell(coordinate)
+        cell = (sheet, col, row)
+
+        precedents = []
+        for _, references in formula_references(formula, sheet, self.names, self.tables, (col, row)):
+            for reference in references:
+                reference = self.canonical(reference)
+                if reference not in precedents:
+                    precedents.append(reference)
+
+        self.formulas[cell] = formula
+        self.precedents[cell] = precedents
+        for reference in precedents:
+            if reference.is_cell:
+                self.cell_dependents[(reference.sheet, reference.min_col, reference.min_row)].append(cell)
+            else:
+                self.range_dependents[reference].append(cell)
+        self._linked = False
+
+    # ---------------------------------------------------------------- enlace
+
+    def _link(self):
+        """Índices por columna y aristas celda -> rango (se calcula una vez por cambio)"""
+        if self._linked:
+            return
+
+        # Filas con fórmula por (hoja, columna) y columnas con fórmula por hoja
+        formula_rows = defaultdict(list)
+        for sheet, col, row in self.formulas:
+            formula_rows[(sheet, col)].append(row)
+        formula_cols = defaultdict(list)
+        for (sheet, col), rows in formula_rows.items():
+            rows.sort()
+            formula_cols[sheet].append(col)
+        for cols in formula_cols.values():
+            cols.sort()
+
+        self.range_members: Dict[Reference, List[Cell]] = {}
+        self.member_of: Dict[Cell, List[Reference]] = defaultdict(list)
+        self.ranges_by_column: Dict[Tuple[str, int], List[Reference]] = defaultdict(list)
+        self.wide_ranges: Dict[str, List[Reference]] = defaultdict(list)
+
+        for reference in self.range_dependents:
+            cols = formula_cols.get(reference.sheet, [])
+            members = []
+            for col in cols[bisect_left(cols, reference.min_col):bisect_right(cols, reference.max_col)]:
+                rows = formula_rows[(reference.sheet, col)]
+                first, last = bisect_left(rows, reference.min_row), bisect_right(rows, reference.max_row)
+                members.extend((reference.sheet, col, row) for row in rows[first:last])
+            self.range_members[reference] = members
+            for member in members:
+                self.member_of[member].append(reference)
+
+            if reference.max_col - reference.min_col >= WIDE_RANGE_COLUMNS:
+                self.wide_ranges[reference.sheet].append(reference)
+            else:
+                for col in range(reference.min_col, reference.max_col + 1):
+                    self.ranges_by_column[(reference.sheet, col)].append(reference)
+
+        self._linked = True
+
+    def _successors(self, node) -> List:
+        """Dependientes inmediatos de un nodo del grafo (celda o rango)"""
+        if isinstance(node, Reference):
+            return self.range_dependents.get(node, [])
+        return self.cell_dependents.get(node, []) + self.member_of.get(node, [])
+
+    # -------------------------------------------------------------- consultas
+
+    def parse(self, text: str, sheet: Optional[str] = None) -> List[Reference]:
+        """'Ventas!B2', 'B2:B9' (con `sheet`) o un nombre definido -> bloques"""
+        references = [reference for _, targets in self.references(text, sheet)
+                      for reference in targets]
+        return [self.canonical(reference) for reference in references]
+
+    def direct_dependents(self, reference: Reference) -> List[Cell]:
+        """Fórmulas que leen alguna celda del bloque"""
+        self._link()
+        found = {}
+
+        # Referencias a celdas sueltas dentro del bloque
+        if reference.is_cell:
+            for cell in self.cell_dependents.get((reference.sheet, reference.min_col, reference.min_row), []):
+                found[cell] = None
+        else:
+            for (sheet, col, row), cells in self.cell_dependents.items():
+                if reference.contains(sheet, col, row):
+                    for cell in cells:
+                        found[cell] = None
+
+        # Rangos que se cruzan con el bloque
+        if reference.max_col - reference.min_col >= WIDE_RANGE_COLUMNS:
+            candidates = [r for r in self.range_dependents if r.sheet == reference.sheet]
+        else:
+            candidates = list(self.wide_ranges.get(reference.sheet, []))
+            for col in range(reference.min_col, reference.max_col + 1):
+                candidates.extend(self.ranges_by_column.get((reference.sheet, col), []))
+        for candidate in dict.fromkeys(candidates):
+            if candidate.intersects(reference):
+                for cell in self.range_dependents[candidate]:
+                    found[cell] = None
+        return list(found)
+
+    def dependents(self, text: str, sheet: Optional[str] = None, transitive: bool = False) -> List[str]:
+        """¿Qué fórmulas dependen de X? (directas, o todas las alcanzables)"""
+        result = {}
+        for reference in self.parse(text, sheet):
+            for cell in self.direct_dependents(reference):
+                result[cell] = None
+
+        if transitive:
+            for cell in self.downstream(list(result)):
+                result[cell] = None
+        return [cell_label(cell) for cell in result]
+
+    def downstream(self, cells: Iterable[Cell]) -> List[Cell]:
+        """Fórmulas alcanzables desde estas celdas (sin incluirlas), en orden de recorrido"""
+        self._link()
+        queue = deque(cells)
+        seen = set(queue)
+        found = []
+        while queue:
+            for node in self._successors(queue.popleft()):
+                if node not in seen:
+                    seen.add(node)
+                    queue.append(node)
+                    if not isinstance(node, Reference):
+                        found.append(node)
+        return found
+
+    def precedents_of(self, sheet: str, coordinate: str) -> List[str]:
+        col, row = split_cell(coordinate)
+        return [reference.label() for reference in self.precedents.get((self.sheet(sheet), col, row), [])]
+
+    def topological_order(self) -> Tuple[List[Cell], List[Cell]]:
+        """
+        Fórmulas en orden de cálculo (precedentes primero) y las que quedan
+        en referencias circulares o dependen de una.
+        """
+        self._link()
+        indegree = defaultdict(int)
+        for cell, references in self.precedents.items():
+            for reference in references:
+                if reference.is_cell:
+                    if (reference.sheet, reference.min_col, reference.min_row) in self.formulas:
+                        indegree[cell] += 1
+                else:
+                    indegree[cell] += 1
+        for reference, members in self.range_members.items():
+            indegree[reference] = len(members)
+
+        queue = deque(node for node in list(self.formulas) + list(self.range_members) if not indegree[node])
+        order = []
+        while queue:
+            node = queue.popleft()
+            if not isinstance(node, Reference):
+                order.append(node)
+            for successor in self._successors(node):
+                indegree[successor] -= 1
+                if not indegree[successor]:
+                    queue.append(successor)
+
+        ordered = set(order)
+        cyclic = [cell for cell in self.formulas if cell not in ordered]
+        return order, cyclic
+
+    def summary(self) -> Dict:
+        """Tamaño del grafo, profundidad máxima y celdas circulares"""
+        self._link()
+        order, cyclic = self.topological_order()
+
+        # Nivel de cada fórmula en la cadena de cálculo (los rangos se evalúan una vez)
+        depth = {}
+        for cell in order:
+            level = 0
+            for reference in self.precedents[cell]:
+                if reference.is_cell:
+                    level = max(level, depth.get((reference.sheet, reference.min_col, reference.min_row), 0))
+                else:
+                    if reference not in depth:
+                        depth[reference] = max((depth[member] for member in self.range_members[reference]),
+                                               default=0)
+                    level = max(level, depth[reference])
+            depth[cell] = level + 1
+
+        return {
+            'formula_cells': len(self.formulas),
+            'range_nodes': len(self.range_dependents),
+            'edges': sum(len(references) for references in self.precedents.values())
+                     + sum(len(members) for members in self.range_members.values()),
+            'max_depth': max((depth[cell] for cell in order), default=0),
+            'circular_cells': [cell_label(cell) for cell in cyclic]
+        }
+
+    def sheet_links(self) -> Dict[Tuple[str, str], int]:
+        """Referencias entre hojas: {(hoja con la fórmula, hoja referenciada): fórmulas}"""
+        links = defaultdict(int)
+        for (sheet, _, _), references in self.precedents.items():
+            for target in {reference.sheet for reference in references if reference.sheet != sheet}:
+                links[(sheet, target)] += 1
+        return dict(links)
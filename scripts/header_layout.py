@@ -0,0 +1,202 @@
+"""
+DETECCIÓN DE ENCABEZADOS
+Ubica la fila de encabezados de una hoja puntuando sus primeras filas por
+densidad de texto (máscaras numpy sobre todo el bloque), reconstruye los
+encabezados compuestos con los títulos de grupo combinados que hay encima
+("Ingresos / Fecha") y guarda el resultado por firma del bloque de
+encabezados: hojas con la misma cabecera (los bancos) se analizan una vez.
+"""
+
+import hashlib
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from openpyxl.utils.cell import range_boundaries
+
+from excel_streaming import StreamingWorkbookReader
+
+# Filas iniciales donde se buscan los encabezados
+SCAN_ROWS = 10
+
+# Celdas con texto necesarias para que una fila cuente como encabezado
+MIN_HEADER_CELLS = 3
+
+# Entre el título de grupo y el encabezado de la columna
+GROUP_SEPARATOR = ' / '
+
+# Firma del bloque de encabezados -> disposición detectada
+_layouts: Dict[str, 'HeaderLayout'] = {}
+
+
+def normalize(text: Any) -> str:
+    """Texto comparable: minúsculas, sin acentos ni espacios repetidos"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def header_matches(text: str, anchor: str) -> bool:
+    """El encabezado empieza por las palabras del ancla (admite plural: 'Clientes' ~ 'Cliente')"""
+    words = text.split()
+    anchor_words = anchor.split()
+    return len(words) >= len(anchor_words) and all(
+        word in (expected, expected + 's', expected + 'es') for word, expected in zip(words, anchor_words)
+    )
+
+
+def is_text(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+_text_cells = np.frompyfunc(is_text, 1, 1)
+
+
+def text_mask(rows: Sequence[Sequence]) -> np.ndarray:
+    """Matriz (filas x columnas) con True en las celdas con texto no vacío"""
+    width = max((len(row) for row in rows), default=0)
+    block = np.full((len(rows), width), None, dtype=object)
+    for idx, row in enumerate(rows):
+        block[idx, :len(row)] = row
+    if not block.size:
+        return np.zeros(block.shape, dtype=bool)
+    return _text_cells(block).astype(bool)
+
+
+@dataclass
+class HeaderLayout:
+    """
+    Encabezados de una hoja; filas y columnas 1-based como en Excel.
+    `header_row` es 0 si ninguna fila tiene texto suficiente. Se comparte entre
+    hojas con la misma firma: no modificarlo.
+    """
+    header_row: int = 0
+    group_rows: List[int] = field(default_factory=list)
+    headers: List[Optional[str]] = field(default_factory=list)
+    compound: List[Optional[str]] = field(default_factory=list)
+    candidates: Dict[int, List[str]] = field(default_factory=dict)
+
+    @property
+    def data_row(self) -> int:
+        return self.header_row + 1
+
+    def find_row(self, anchors: Dict[int, str]) -> Optional[int]:
+        """Primera fila candidata cuyas columnas empiezan por los textos dados"""
+        wanted = [(col - 1, normalize(text)) for col, text in anchors.items()]
+        for row, texts in self.candidates.items():
+            if all(idx < len(texts) and header_matches(texts[idx], text) for idx, text in wanted):
+                return row
+        return None
+
+    def data_start(self, default: int, anchors: Dict[int, str]) -> int:
+        """Fila siguiente a los encabezados esperados, o `default` si no aparecen"""
+        row = self.find_row(anchors)
+        return row + 1 if row is not None else default
+
+    def column(self, name: str) -> Optional[int]:
+        """Columna con ese encabezado (compuesto o simple)"""
+        wanted = normalize(name)
+        for names in (self.compound, self.headers):
+            for col, header in enumerate(names, start=1):
+                if header is not None and normalize(header) == wanted:
+                    return col
+        return None
+
+
+def layout_signature(rows: Sequence[Tuple], merged: Sequence[Tuple[int, int, int, int]]) -> str:
+    return hashlib.sha1(repr((rows, merged)).encode('utf-8')).hexdigest()
+
+
+def detect_layout(rows: Sequence[Sequence], merged_cells: Sequence[str] = ()) -> HeaderLayout:
+    """
+    Disposición de encabezados a partir de las filas desde la 1 (basta con las
+    primeras SCAN_ROWS) y los rangos combinados de la hoja.
+    Las anclas de rangos combinados de varias columnas son títulos de grupo: no
+    cuentan para la densidad de texto y titulan las columnas que cubren (salvo
+    un título que abarca toda la tabla, que es el de la hoja).
+    """
+    window = [tuple(row) for row in rows[:SCAN_ROWS]]
+    merged = sorted(
+        (min_row, min_col, max_row, max_col)
+        for min_col, min_row, max_col, max_row in (range_boundaries(ref) for ref in merged_cells)
+        if min_row <= len(window)
+    )
+
+    signature = layout_signature(window, merged)
+    cached = _layouts.get(signature)
+    if cached is not None:
+        return cached
+
+    mask = text_mask(window)
+    titles = np.zeros(mask.shape, dtype=bool)
+    for min_row, min_col, max_row, max_col in merged:
+        if max_col > min_col and min_col <= mask.shape[1]:
+            titles[min_row - 1, min_col - 1] = True
+
+    counts = (mask & ~titles).sum(axis=1)
+    dense = np.flatnonzero(counts >= MIN_HEADER_CELLS)
+
+    layout = HeaderLayout()
+    for idx in dense:
+        layout.candidates[int(idx) + 1] = [normalize(value) if is_text(value) else '' for value in window[idx]]
+
+    if len(dense):
+        layout.header_row = int(dense[0]) + 1
+        header_cells = window[layout.header_row - 1]
+        text_columns = np.flatnonzero(mask[layout.header_row - 1]) + 1
+        first_col, last_col = int(text_columns[0]), int(text_columns[-1])
+        for col in range(1, mask.shape[1] + 1):
+            value = header_cells[col - 1] if col <= len(header_cells) else None
+            leaf = value.strip() if is_text(value) else None
+            groups = []
+            for min_row, min_col, max_row, max_col in merged:
+                if not min_col <= col <= max_col:
+                    continue
+                anchor = window[min_row - 1][min_col - 1] if min_col <= len(window[min_row - 1]) else None
+                if not is_text(anchor):
+                    continue
+                if max_row < layout.header_row:
+                    if min_col <= first_col and max_col >= last_col:
+                        continue
+                    # Título de grupo encima de la fila de encabezados
+                    groups.append(anchor.strip())
+                    if min_row not in layout.group_rows:
+                        layout.group_rows.append(min_row)
+                elif leaf is None and min_row < layout.header_row <= max_row:
+                    # Encabezado combinado en vertical: el texto está en su primera fila
+                    leaf = anchor.strip()
+            layout.headers.append(leaf)
+            layout.compound.append(GROUP_SEPARATOR.join(groups + [leaf]) if leaf is not None else None)
+        layout.group_rows.sort()
+
+    _layouts[signature] = layout
+    return layout
+
+
+def worksheet_layout(ws) -> HeaderLayout:
+    """Disposición de una hoja openpyxl (las de sólo lectura no exponen sus combinadas)"""
+    rows = list(ws.iter_rows(min_row=1, max_row=SCAN_ROWS, values_only=True))
+    merged = getattr(ws, 'merged_cells', None)
+    return detect_layout(rows, [str(ref) for ref in merged.ranges] if merged is not None else ())
+
+
+def reader_layout(reader: StreamingWorkbookReader, sheet_name: str) -> HeaderLayout:
+    """
+    Disposición leyendo sólo las primeras filas del XML. Los rangos combinados
+    están al final de la hoja, así que aquí no hay títulos de grupo.
+    """
+    rows: List[Dict[int, Any]] = [{} for _ in range(SCAN_ROWS)]
+    for row in reader.iter_rows(sheet_name):
+        if row.index > SCAN_ROWS:
+            break
+        rows[row.index - 1] = row.values
+    width = max((max(values) for values in rows if values), default=0)
+    return detect_layout([tuple(values.get(col) for col in range(1, width + 1)) for values in rows])
+
+
+def sheet_layout(source, sheet_name: str) -> HeaderLayout:
+    """Disposición de una hoja del libro openpyxl o del lector en streaming"""
+    if isinstance(source, StreamingWorkbookReader):
+        return reader_layout(source, sheet_name)
+    return worksheet_layout(source[sheet_name])
@@ -4,19 +4,46 @@ IMPORTADOR COMPLETO EXCEL -> JSON
 Sistema de importación quirúrgica con reseteo total
 ============================================
 """
-import json
-import openpyxl
 import sys
 from datetime import datetime
 from collections import defaultdict
 
+from aggregates import FinancialAggregates, GroupedTotals
+from categorical import CategoricalStore
+from formula_eval import recalculate_workbook
+from header_layout import worksheet_layout
+from incremental_import import ImportWatermarks
+from json_stream import dump_json, iter_arrays
+from sheet_extent import data_rows
+from workbook_session import open_session
+
 # Configurar encoding para Windows
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Encabezados esperados por hoja (columna -> texto inicial): los datos empiezan en
+# la fila siguiente a la que los contiene; si no aparecen, en la fila documentada
+ENCABEZADOS = {
+    'Distribuidores': {1: 'OC', 3: 'Origen'},
+    'Control_Maestro': {1: 'Fecha', 4: 'Cliente'},
+    'Clientes': {5: 'Cliente'},
+    'Banco': {1: 'Ingreso'},
+    'Almacen_Monte': {1: 'Ingreso', 7: 'Salida'}
+}
+
+# Arreglos de registros del JSON de salida (se escriben en streaming)
+ENTITY_ARRAYS = ('ventas', 'compras', 'distribuidores', 'clientes', 'gastosAbonos', 'bancos', 'almacen', 'movimientos')
+
 class ImportadorExcelCompleto:
-    def __init__(self, excel_path, json_output_path):
+    def __init__(self, excel_path, json_output_path, compact=False, incremental=False, recalcular=True):
         self.excel_path = excel_path
         self.json_output_path = json_output_path
+        self.compact = compact
+        self.incremental = incremental
+        self.recalcular = recalcular
+        self.watermarks = None
+        # Clientes, distribuidores, conceptos... internados; los acumulados agrupan por código
+        self.categorias = CategoricalStore()
+        self.agregados = FinancialAggregates(self.categorias)
         self.wb = None
         self.data = {
             "ventas": [],
@@ -104,13 +131,36 @@ class ImportadorExcelCompleto:
         """Carga el archivo Excel"""
         self.log(f"Cargando Excel: {self.excel_path}")
         try:
-            self.wb = openpyxl.load_workbook(self.excel_path, data_only=True)
+            self.wb = open_session(self.excel_path).workbook(data_only=True)
             self.log(f"Excel cargado - Hojas: {', '.join(self.wb.sheetnames)}", "SUCCESS")
+            if self.recalcular:
+                self.recalcular_formulas()
             return True
         except Exception as e:
             self.log(f"Error al cargar Excel: {e}", "ERROR")
             return False
 
+    def recalcular_formulas(self):
+        """Fórmulas sin valor cacheado (archivo guardado sin recalcular): se evalúan aquí"""
+        stats = recalculate_workbook(self.excel_path, self.wb)
+        if stats['stale']:
+            self.log(f"{stats['recalculated']} fórmulas sin valor recalculadas", "SUCCESS")
+        if stats['unsupported']:
+            self.log(f"{stats['unsupported']} fórmulas no soportadas conservan su valor vacío", "WARNING")
+
+    def fila_datos(self, ws, encabezados, fila):
+        """Fila siguiente a los encabezados detectados en la hoja (`fila` si no se encuentran)"""
+        return worksheet_layout(ws).data_start(fila, encabezados)
+
+    def fila_inicial(self, ws, hoja, fila, min_col, max_col):
+        """Primera fila a procesar: en modo incremental, la siguiente a la marca de agua"""
+        if not self.watermarks:
+            return fila
+        inicio = self.watermarks.first_row(ws, hoja, fila, min_col, max_col)
+        if inicio > fila:
+            self.log(f"  ↻ {hoja}: incremental desde la fila {inicio}")
+        return inicio
+
     def procesar_distribuidores(self):
         """Procesa hoja de Distribuidores (Órdenes de Compra)"""
         self.log("Procesando Distribuidores...")
@@ -125,8 +175,9 @@ class ImportadorExcelCompleto:
         # Headers en fila 3 (índice 3)
         # Columnas: A=OC, B=Fecha, C=Origen, D=Cantidad, E=Costo Dist, F=Costo Trans,
         #           G=Costo/Unidad, H=Stock Actual, I=Costo Total, J=Pago Dist, K=Deuda
+        primera = self.fila_datos(ws, ENCABEZADOS['Distribuidores'], 4)
 
-        for row_idx in range(4, ws.max_row + 1):
+        for row_idx in data_rows(ws, primera, 1, 11):
             oc = self.safe_get_cell(ws, row_idx, 1)  # Columna A
 
             if not oc or str(oc).strip() == '':
@@ -160,26 +211,25 @@ class ImportadorExcelCompleto:
                 "estatus": "completada" if deuda <= 0 else "pendiente"
             }
 
-            self.data["compras"].append(compra)
+            self.data["compras"].append(self.categorias.add("compras", compra))
+            self.agregados.add_compra(compra)
             distribuidores_set.add(origen)
             self.stats["procesados"] += 1
             self.stats["exitosos"] += 1
 
         # Crear registros de distribuidores únicos
-        for dist_nombre in distribuidores_set:
-            # Calcular totales para este distribuidor
-            compras_dist = [c for c in self.data["compras"] if c["distribuidor"] == dist_nombre]
-            total_comprado = sum(c["costoTotal"] for c in compras_dist)
-            total_pagado = sum(c["pagoDistribuidor"] for c in compras_dist)
-            adeudo = sum(c["deuda"] for c in compras_dist)
+        # (totales acumulados al agregar cada compra, en orden de aparición)
+        for dist_nombre, totales in self.agregados.por_distribuidor.groups.items():
+            if dist_nombre not in distribuidores_set:
+                continue
 
             self.data["distribuidores"].append({
                 "id": f"DIST-{dist_nombre.upper().replace(' ', '-')}",
                 "nombre": dist_nombre,
-                "totalComprado": total_comprado,
-                "totalPagado": total_pagado,
-                "adeudo": adeudo,
-                "ordenesCompra": len(compras_dist),
+                "totalComprado": totales["totalComprado"],
+                "totalPagado": totales["totalPagado"],
+                "adeudo": totales["adeudo"],
+                "ordenesCompra": totales["count"],
                 "estado": "activo"
             })
 
@@ -202,7 +252,16 @@ class ImportadorExcelCompleto:
         # A=Fecha, B=OC Relacionada, C=Cantidad, D=Cliente, E=Bóveda Monte (destino)
         # F=Precio De Venta, G=Ingreso, H=Flete, I=Flete Utilidad, J=Utilidad, K=Estatus, L=Concepto
 
-        for row_idx in range(4, ws.max_row + 1):
+        primera = self.fila_datos(ws, ENCABEZADOS['Control_Maestro'], 4)
+        inicio = self.fila_inicial(ws, 'Control_Maestro', primera, 1, 12)
+        if inicio > primera:
+            # Ventas ya importadas en la corrida anterior
+            self.data["ventas"] = list(self.watermarks.previous["ventas"])
+            for venta in self.data["ventas"]:
+                self.categorias.add("ventas", venta)
+                self.agregados.add_venta(venta)
+
+        for row_idx in data_rows(ws, inicio, 1, 12):
             fecha = self.safe_date(self.safe_get_cell(ws, row_idx, 1))  # A
 
             # Si no hay fecha, saltar
@@ -253,7 +312,8 @@ class ImportadorExcelCompleto:
                 "bovedaMonte": destino_monto
             }
 
-            self.data["ventas"].append(venta)
+            self.data["ventas"].append(self.categorias.add("ventas", venta))
+            self.agregados.add_venta(venta)
             self.stats["procesados"] += 1
             self.stats["exitosos"] += 1
 
@@ -277,7 +337,8 @@ class ImportadorExcelCompleto:
         })
 
         # Headers en fila 4, columna E empieza "Clientes"
-        for row_idx in range(5, ws.max_row + 1):
+        primera = self.fila_datos(ws, ENCABEZADOS['Clientes'], 5)
+        for row_idx in data_rows(ws, primera, 5, 8):
             cliente = self.safe_get_cell(ws, row_idx, 5)  # E - Clientes
 
             if not cliente or str(cliente).strip() == '':
@@ -326,9 +387,18 @@ class ImportadorExcelCompleto:
             movimientos = []
             saldo_actual = 0
 
+            primera = self.fila_datos(ws, ENCABEZADOS['Banco'], 3)
+            inicio = self.fila_inicial(ws, hoja, primera, 1, 11)
+            if inicio > primera:
+                # Continuar desde los movimientos y el saldo de la corrida anterior
+                anterior = self.watermarks.previous
+                movimientos = [m for m in anterior["movimientos"] if m["id"].startswith(f"MOV-{hoja}-")]
+                saldo_actual = next(b["saldoActual"] for b in anterior["bancos"]
+                                    if b["id"] == f"BANCO-{hoja.upper()}")
+
             # Headers en fila 2
             # A=Ingresos, columnas 8-9=RF Actual, columna 10-11=Gastos
-            for row_idx in range(3, min(ws.max_row + 1, 100)):  # Limitar a 100 filas
+            for row_idx in data_rows(ws, inicio, 1, 11):
                 ingreso = self.safe_float(self.safe_get_cell(ws, row_idx, 1))  # A
                 fecha_ingreso = self.safe_date(self.safe_get_cell(ws, row_idx, 2))  # B
 
@@ -362,17 +432,21 @@ class ImportadorExcelCompleto:
                     })
 
             # Crear banco
+            self.categorias.extend("movimientos", movimientos)
+            por_tipo = GroupedTotals("tipo", {"monto": "monto"}, self.categorias.table("tipo"))
+            por_tipo.extend(movimientos)
             banco = {
                 "id": f"BANCO-{hoja.upper()}",
                 "nombre": nombre_banco,
                 "saldoActual": saldo_actual,
-                "totalIngresos": sum(m["monto"] for m in movimientos if m["tipo"] == "ingreso"),
-                "totalGastos": sum(m["monto"] for m in movimientos if m["tipo"] == "gasto"),
+                "totalIngresos": por_tipo.get("ingreso")["monto"],
+                "totalGastos": por_tipo.get("gasto")["monto"],
                 "movimientos": len(movimientos),
                 "estado": "activo"
             }
 
             self.data["bancos"].append(banco)
+            self.agregados.add_banco(banco)
             self.data["movimientos"].extend(movimientos)
             self.log(f"  ✅ {nombre_banco}: {len(movimientos)} movimientos, Saldo: ${saldo_actual:,.2f}")
 
@@ -394,7 +468,8 @@ class ImportadorExcelCompleto:
         stock_actual = 0
 
         # Headers en fila 1: A=Ingresos, E=RF Actual, G=Salida
-        for row_idx in range(2, min(ws.max_row + 1, 100)):
+        primera = self.fila_datos(ws, ENCABEZADOS['Almacen_Monte'], 2)
+        for row_idx in data_rows(ws, primera, 1, 7):
             ingreso = self.safe_int(self.safe_get_cell(ws, row_idx, 1))  # A
             rf_actual = self.safe_int(self.safe_get_cell(ws, row_idx, 5))  # E
             salida = self.safe_int(self.safe_get_cell(ws, row_idx, 7))  # G
@@ -406,7 +481,7 @@ class ImportadorExcelCompleto:
             if rf_actual > 0:
                 stock_actual = rf_actual
 
-        self.data["almacen"].append({
+        almacen = {
             "id": "ALMACEN-MONTE",
             "nombre": "Almacén Monte",
             "stockActual": stock_actual,
@@ -414,7 +489,9 @@ class ImportadorExcelCompleto:
             "totalSalidas": salidas,
             "ubicacion": "Monte",
             "estado": "activo"
-        })
+        }
+        self.data["almacen"].append(almacen)
+        self.agregados.add_almacen(almacen)
 
         self.data["resumen"]["ingresosAlmacen"] = ingresos
         self.data["resumen"]["salidasAlmacen"] = salidas
@@ -424,45 +501,14 @@ class ImportadorExcelCompleto:
         """Calcula métricas financieras finales"""
         self.log("Calculando métricas financieras...")
 
-        # Capital total (suma de saldos bancarios)
-        capital_total = sum(b["saldoActual"] for b in self.data["bancos"])
-
-        # Inventario actual (suma de stocks)
-        inventario_actual = sum(a["stockActual"] for a in self.data["almacen"])
+        # Las sumas ya se acumularon al agregar cada banco, almacén, venta y compra
+        metricas = self.agregados.metricas()
+        self.data["metricasFinancieras"] = metricas
 
-        # Cartera por cobrar (adeudos de ventas)
-        cartera_por_cobrar = sum(v["adeudo"] for v in self.data["ventas"])
-
-        # Cuentas por pagar (deudas a distribuidores)
-        cuentas_por_pagar = sum(c["deuda"] for c in self.data["compras"])
-
-        # Utilidad total
-        utilidad_total = sum(v["totalUtilidades"] for v in self.data["ventas"])
-
-        # Costo total inventario
-        costo_total_inventario = sum(c["costoTotal"] for c in self.data["compras"])
-
-        # Ventas totales
-        ventas_totales = sum(v["totalVenta"] for v in self.data["ventas"])
-
-        # Compras totales
-        compras_totales = sum(c["costoTotal"] for c in self.data["compras"])
-
-        self.data["metricasFinancieras"] = {
-            "capitalTotal": capital_total,
-            "inventarioActual": inventario_actual,
-            "carteraPorCobrar": cartera_por_cobrar,
-            "cuentasPorPagar": cuentas_por_pagar,
-            "utilidadTotal": utilidad_total,
-            "costoTotalInventario": costo_total_inventario,
-            "ventasTotales": ventas_totales,
-            "comprasTotales": compras_totales
-        }
-
-        self.log(f"💰 Capital Total: ${capital_total:,.2f}", "SUCCESS")
-        self.log(f"📦 Inventario: {inventario_actual} unidades", "SUCCESS")
-        self.log(f"💵 Por Cobrar: ${cartera_por_cobrar:,.2f}", "SUCCESS")
-        self.log(f"💳 Por Pagar: ${cuentas_por_pagar:,.2f}", "SUCCESS")
+        self.log(f"💰 Capital Total: ${metricas['capitalTotal']:,.2f}", "SUCCESS")
+        self.log(f"📦 Inventario: {metricas['inventarioActual']} unidades", "SUCCESS")
+        self.log(f"💵 Por Cobrar: ${metricas['carteraPorCobrar']:,.2f}", "SUCCESS")
+        self.log(f"💳 Por Pagar: ${metricas['cuentasPorPagar']:,.2f}", "SUCCESS")
 
     def guardar_json(self):
         """Guarda datos en archivo JSON"""
@@ -471,8 +517,11 @@ class ImportadorExcelCompleto:
         self.data["ultimaActualizacion"] = datetime.now().isoformat()
 
         try:
-            with open(self.json_output_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            # Streaming + escritura atómica (temporal y renombrado)
+            # Los arreglos de registros se entregan como iteradores
+            dump_json(iter_arrays(self.data, ENTITY_ARRAYS), self.json_output_path, compact=self.compact)
+            if self.watermarks:
+                self.watermarks.save()
             self.log("✅ JSON guardado exitosamente", "SUCCESS")
             return True
         except Exception as e:
@@ -488,6 +537,9 @@ class ImportadorExcelCompleto:
         if not self.cargar_excel():
             return False
 
+        if self.incremental:
+            self.watermarks = ImportWatermarks(self.json_output_path, 'importar_excel_completo')
+
         self.procesar_distribuidores()
         self.procesar_control_maestro()
         self.procesar_clientes()
@@ -505,6 +557,8 @@ class ImportadorExcelCompleto:
         self.log(f"✅ Exitosos: {self.stats['exitosos']}")
         self.log(f"❌ Errores: {self.stats['errores']}")
         self.log(f"⚠️  Warnings: {len(self.stats['warnings'])}")
+        internados = self.categorias.report()
+        self.log(f"🗜️  Categorías: {internados['distinct']} valores distintos en {internados['cells']} celdas")
 
         return True
 
@@ -512,5 +566,7 @@ if __name__ == "__main__":
     excel_path = r'c:\Users\xpovo\Documents\premium-ecosystem\Copia de Administación_General.xlsx'
     json_path = r'c:\Users\xpovo\Documents\premium-ecosystem\public\excel_data.json'
 
-    importador = ImportadorExcelCompleto(excel_path, json_path)
+    importador = ImportadorExcelCompleto(excel_path, json_path, compact='--compact' in sys.argv,
+                                         incremental='--incremental' in sys.argv,
+                                         recalcular='--no-recalc' not in sys.argv)
     importador.ejecutar()
@@ -9,12 +9,14 @@ Fecha: 2025-10-20
 Basado en: MAPEO_COMPLETO_EXCEL_IMPORTACION.md
 """
 
-import openpyxl
-import json
 import sys
 from datetime import datetime
 from pathlib import Path
 
+from json_stream import dump_json, iter_arrays
+from sheet_extent import data_rows
+from workbook_session import open_session
+
 # Configuración de encoding
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -66,7 +68,7 @@ print("="*100)
 
 # Cargar workbook
 print(f"\n📂 Cargando archivo: {EXCEL_PATH}")
-wb = openpyxl.load_workbook(EXCEL_PATH, data_only=True)
+wb = open_session(EXCEL_PATH).workbook(data_only=True)
 print(f"✅ Archivo cargado. Hojas encontradas: {wb.sheetnames}")
 
 # Estructura de datos final
@@ -159,7 +161,7 @@ ws_dist = wb['Distribuidores']
 
 distribuidores_unicos = {}
 
-for row in range(4, 100):
+for row in data_rows(ws_dist, 4, 1):
     oc = ws_dist.cell(row, 1).value
     if not oc:
         continue
@@ -223,7 +225,7 @@ print("="*100)
 
 ws_almacen = wb['Almacen_Monte']
 
-for row in range(4, 100):
+for row in data_rows(ws_almacen, 4, 1):
     oc = ws_almacen.cell(row, 1).value
     if not oc:
         continue
@@ -260,7 +262,7 @@ ws_clientes = wb['Clientes']
 
 clientes_map = {}
 
-for row in range(4, 50):
+for row in data_rows(ws_clientes, 4, 5):
     nombre = limpiar_valor(ws_clientes.cell(row, 5).value, 'texto')
     if not nombre:
         continue
@@ -296,7 +298,7 @@ ws_control = wb['Control_Maestro']
 
 ventas_por_cliente = {}
 
-for row in range(4, 200):
+for row in data_rows(ws_control, 4, 1):
     fecha = ws_control.cell(row, 1).value
     if not fecha:
         continue
@@ -381,7 +383,7 @@ print("\n" + "="*100)
 print("5️⃣  IMPORTANDO ALMACEN - SALIDAS")
 print("="*100)
 
-for row in range(4, 200):
+for row in data_rows(ws_almacen, 4, 7):
     fecha = ws_almacen.cell(row, 7).value
     if not fecha:
         continue
@@ -436,7 +438,7 @@ data["bancos"]["bovedaMonte"]["historico"] = rf_actual_boveda
 
 print(f"💰 RF Actual Bóveda Monte: ${rf_actual_boveda:,.2f}")
 
-for row in range(4, 200):
+for row in data_rows(ws_boveda, 4, 1):
     fecha = ws_boveda.cell(row, 1).value
     if not fecha:
         continue
@@ -469,7 +471,7 @@ print("\n" + "="*100)
 print("7️⃣  IMPORTANDO BÓVEDA MONTE - GASTOS")
 print("="*100)
 
-for row in range(4, 200):
+for row in data_rows(ws_boveda, 4, 7):
     fecha = ws_boveda.cell(row, 7).value
     if not fecha:
         continue
@@ -546,7 +548,7 @@ for hoja_name, banco_key, row_rf, col_rf, col_rf_actual in bancos_a_importar:
 
     # Importar ingresos
     count_ingresos = 0
-    for row in range(4, 100):
+    for row in data_rows(ws_banco, 4, 1):
         fecha = ws_banco.cell(row, 1).value
         if not fecha:
             continue
@@ -579,7 +581,7 @@ print("9️⃣  IMPORTANDO GYA (Gastos y Abonos)")
 print("="*100)
 
 count_gya = 0
-for row in range(4, 200):
+for row in data_rows(ws_control, 4, 15):
     fecha_gya = ws_control.cell(row, 15).value
     if not fecha_gya:
         continue
@@ -646,8 +648,11 @@ print(f"   Total: {len(data['gastosAbonos'])}")
 
 # Guardar JSON
 print(f"\n💾 Guardando datos en: {OUTPUT_PATH}")
-with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
+# Escritura atómica: el frontend nunca lee un archivo a medio escribir
+# Los arreglos de registros se entregan como iteradores
+streamed = iter_arrays(data, ('ventas', 'clientes', 'ordenesCompra', 'distribuidores', 'gastosAbonos'))
+streamed['almacen'] = iter_arrays(data['almacen'], ('stock', 'entradas', 'salidas'))
+dump_json(streamed, OUTPUT_PATH, compact='--compact' in sys.argv)
 
 print(f"✅ Archivo guardado exitosamente")
 
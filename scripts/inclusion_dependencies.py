@@ -0,0 +1,164 @@
+"""
+CLAVES FORÁNEAS POR CONTENCIÓN DE VALORES
+Una columna es clave foránea de otra si (casi) todos sus valores distintos
+aparecen en ella (dependencia de inclusión). Cada columna se resume una vez en
+un bosquejo: hashes de 64 bits de sus valores distintos, ordenados, cuyos K
+menores son su muestra MinHash. La contención de una columna en todas las
+columnas clave del libro se estima buscando su muestra en un índice ordenado
+con los hashes de todas ellas (búsqueda binaria vectorizada): el costo crece
+con el total de valores, no con los pares de columnas. Sólo los pares
+prometedores se verifican de forma exacta sobre los hashes completos.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+# Hashes menores por columna (muestra MinHash) con que se estima la contención
+SAMPLE_SIZE = 128
+
+# Contención estimada a partir de la cual se verifica el par
+MIN_ESTIMATED = 0.8
+
+# Contención exacta para reportar la relación
+MIN_CONTAINMENT = 0.95
+
+# Distintos / no nulos para que una columna cuente como clave referenciable
+KEY_UNIQUENESS = 0.9
+
+# Valores distintos mínimos de cada columna (los estatus y los números chicos
+# caben por casualidad en cualquier columna de IDs)
+MIN_DISTINCT = 3
+MIN_NUMERIC_DISTINCT = 10
+
+
+@dataclass
+class ColumnSketch:
+    """Resumen de una columna: hashes ordenados de sus valores distintos"""
+    sheet: str
+    column: Any
+    rows: int
+    hashes: np.ndarray
+    numeric: bool
+
+    @property
+    def distinct(self) -> int:
+        return len(self.hashes)
+
+    @property
+    def is_key(self) -> bool:
+        return self.distinct >= MIN_DISTINCT and self.distinct / self.rows >= KEY_UNIQUENESS
+
+    @property
+    def sample(self) -> np.ndarray:
+        # Los hashes están ordenados: los K primeros son los K menores
+        return self.hashes[:SAMPLE_SIZE]
+
+
+def key_text(value: Any) -> Optional[str]:
+    """Valor como texto comparable entre hojas (12, 12.0 y '12' coinciden)"""
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return None
+
+
+def column_sketch(sheet: str, column: Any, series: pd.Series) -> Optional[ColumnSketch]:
+    """Bosquejo de la columna, o None si no puede ser clave (fechas, decimales, booleanos)"""
+    values = series.dropna()
+    if values.empty or is_bool_dtype(values) or is_datetime64_any_dtype(values):
+        return None
+
+    if is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype=np.float64)
+        if not np.array_equal(numbers, np.floor(numbers)):
+            return None
+        keys = numbers.astype(np.int64).astype(str).astype(object)
+    else:
+        texts = (key_text(value) for value in values)
+        keys = np.array([text for text in texts if text is not None], dtype=object)
+        if not len(keys):
+            return None
+
+    distinct = pd.unique(keys)
+    numeric = all(key.lstrip('-').isdigit() for key in distinct)
+    hashes = np.unique(pd.util.hash_array(distinct, categorize=False))
+    return ColumnSketch(sheet, column, len(keys), hashes, numeric)
+
+
+def sketch_frame(sheet: str, df: pd.DataFrame) -> List[ColumnSketch]:
+    """Bosquejos de las columnas con encabezado de la hoja"""
+    sketches = []
+    for position, column in enumerate(df.columns):
+        if column is None:
+            continue
+        sketch = column_sketch(sheet, column, df.iloc[:, position])
+        if sketch is not None:
+            sketches.append(sketch)
+    return sketches
+
+
+def discover_inclusions(sketches: Sequence[ColumnSketch]) -> List[Dict]:
+    """Pares (columna -> columna clave de otra hoja) con contención >= MIN_CONTAINMENT"""
+    keys = [sketch for sketch in sketches if sketch.is_key]
+    if not keys:
+        return []
+
+    # Índice de todas las columnas clave: hash ordenado -> columna dueña
+    pool = np.concatenate([key.hashes for key in keys])
+    owners = np.concatenate([np.full(key.distinct, idx, dtype=np.int64) for idx, key in enumerate(keys)])
+    order = np.argsort(pool, kind='stable')
+    pool, owners = pool[order], owners[order]
+    key_sizes = np.array([key.distinct for key in keys])
+
+    relationships = []
+    for dependent in sketches:
+        if dependent.distinct < (MIN_NUMERIC_DISTINCT if dependent.numeric else MIN_DISTINCT):
+            continue
+
+        # Cada hash de la muestra aparece a lo sumo una vez por columna clave
+        sample = dependent.sample
+        lo = np.searchsorted(pool, sample, side='left')
+        hi = np.searchsorted(pool, sample, side='right')
+        lengths = hi - lo
+        if not lengths.any():
+            continue
+        ends = np.cumsum(lengths)
+        positions = np.arange(ends[-1]) - np.repeat(ends - lengths, lengths) + np.repeat(lo, lengths)
+        estimates = np.bincount(owners[positions], minlength=len(keys)) / len(sample)
+
+        promising = np.flatnonzero(
+            (estimates >= MIN_ESTIMATED) & (key_sizes >= dependent.distinct * MIN_CONTAINMENT)
+        )
+        for idx in promising:
+            key = keys[idx]
+            if key.sheet == dependent.sheet:
+                continue
+
+            # Verificación exacta sobre todos los valores distintos
+            contained = np.isin(dependent.hashes, key.hashes, assume_unique=True).sum()
+            containment = contained / dependent.distinct
+            if containment < MIN_CONTAINMENT:
+                continue
+
+            relationships.append({
+                'source_sheet': dependent.sheet,
+                'source_column': dependent.column,
+                'target_sheet': key.sheet,
+                'target_column': key.column,
+                'relationship_type': 'ONE_TO_ONE' if dependent.is_key else 'FOREIGN_KEY',
+                'containment': float(containment),
+                'estimated_containment': float(estimates[idx]),
+                'distinct_values': dependent.distinct,
+                'orphan_values': int(dependent.distinct - contained)
+            })
+
+    return relationships
@@ -0,0 +1,109 @@
+"""
+IMPORTACIÓN INCREMENTAL POR MARCA DE AGUA
+Para hojas que sólo crecen (bancos, Control_Maestro) guarda por hoja la última
+fila importada y el hash del contenido hasta ella. En la siguiente corrida,
+si esas filas no cambiaron, sólo se parsean las nuevas y se agregan a la
+salida anterior; si cambió alguna, esa hoja se reimporta completa.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from json_stream import dump_json
+from sheet_extent import last_data_row
+
+STATE_VERSION = 1
+
+
+def state_path_for(output_path: str) -> Path:
+    """Estado junto a la salida: public/excel_data.json -> public/.excel_data.watermarks.json"""
+    output = Path(output_path)
+    return output.with_name(f'.{output.stem}.watermarks.json')
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def hash_rows(digest, ws, first_row: int, last_row: int, min_col: int, max_col: int):
+    """Agrega al hash el contenido de las filas [first_row, last_row] del bloque de columnas"""
+    if last_row < first_row:
+        return
+    for row in ws.iter_rows(min_row=first_row, max_row=last_row, min_col=min_col, max_col=max_col,
+                            values_only=True):
+        digest.update(repr(row).encode('utf-8'))
+        digest.update(b'\n')
+
+
+class ImportWatermarks:
+    """
+    Marcas de agua de un importador sobre un archivo de salida.
+    Sólo se confía en ellas si la salida es la misma que se escribió junto con
+    el estado (mismo hash): si otro proceso la reescribió, todo es completo.
+    """
+
+    def __init__(self, output_path: str, importer: str):
+        self.output_path = Path(output_path)
+        self.state_path = state_path_for(output_path)
+        self.importer = importer
+        self.previous: Optional[Dict[str, Any]] = None
+        self.sheets: Dict[str, Dict] = {}
+        self.pending: Dict[str, Dict] = {}
+        self.resumed: Dict[str, int] = {}
+
+        try:
+            state = json.loads(self.state_path.read_text(encoding='utf-8'))
+            output = self.output_path.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return
+
+        if (state.get('version') == STATE_VERSION and state.get('importer') == importer
+                and state.get('output_digest') == hashlib.sha256(output).hexdigest()):
+            self.previous = json.loads(output)
+            self.sheets = state.get('sheets', {})
+
+    def first_row(self, ws, sheet_name: str, start_row: int, min_col: int, max_col: int) -> int:
+        """
+        Primera fila a parsear en esta corrida: la siguiente a la marca si las
+        filas ya importadas no cambiaron, o `start_row` (importación completa).
+        Registra la nueva marca, que se guarda con `save`.
+        """
+        last_row = max(last_data_row(ws, min_col, max_col), start_row - 1)
+        digest = hashlib.sha256()
+        resume_row = start_row
+
+        mark = self.sheets.get(sheet_name) if self.previous is not None else None
+        if (mark and mark['start_row'] == start_row and mark['columns'] == [min_col, max_col]
+                and mark['last_row'] <= last_row):
+            hash_rows(digest, ws, start_row, mark['last_row'], min_col, max_col)
+            if digest.hexdigest() == mark['digest']:
+                resume_row = mark['last_row'] + 1
+            else:
+                digest = hashlib.sha256()
+
+        # Un solo recorrido: se continúa el hash desde donde quedó
+        hash_rows(digest, ws, resume_row, last_row, min_col, max_col)
+
+        self.pending[sheet_name] = {
+            'start_row': start_row,
+            'columns': [min_col, max_col],
+            'last_row': last_row,
+            'digest': digest.hexdigest()
+        }
+        if resume_row > start_row:
+            self.resumed[sheet_name] = resume_row
+        return resume_row
+
+    def is_delta(self, sheet_name: str) -> bool:
+        return sheet_name in self.resumed
+
+    def save(self):
+        """Guarda las marcas de esta corrida; llamar después de escribir la salida"""
+        dump_json({
+            'version': STATE_VERSION,
+            'importer': self.importer,
+            'output_digest': file_digest(self.output_path),
+            'sheets': self.pending
+        }, str(self.state_path))
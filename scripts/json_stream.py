@@ -0,0 +1,132 @@
+"""
+ESCRITOR JSON EN STREAMING
+Escribe JSON registro a registro (los arreglos pueden ser generadores que se
+consumen a medida que producen datos) y reemplaza el archivo destino de forma
+atómica: quien lo lea nunca ve un archivo a medio escribir.
+"""
+
+import json
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO
+
+INDENT = 2
+
+
+def file_mode(path: Path) -> int:
+    """Permisos del archivo existente o los por defecto según la umask"""
+    try:
+        return stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_open(path: str, encoding: str = 'utf-8') -> Iterator[TextIO]:
+    """Archivo temporal en el mismo directorio que se renombra al destino al cerrar sin errores"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con 0600: usar los permisos que daría open()
+        os.chmod(tmp_path, file_mode(target))
+        os.replace(tmp_path, target)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class JSONStreamWriter:
+    """
+    Serializa diccionarios clave a clave y arreglos elemento a elemento.
+    Cada elemento se codifica completo con `json` y se escribe de inmediato;
+    con indentación el resultado es idéntico al de `json.dump(indent=2)`.
+    """
+
+    def __init__(self, f: TextIO, compact: bool = False, default: Optional[Callable] = None):
+        self.f = f
+        self.indent = None if compact else INDENT
+        self.separators = (',', ':') if compact else (',', ': ')
+        self.encoder = json.JSONEncoder(ensure_ascii=False, indent=self.indent,
+                                        separators=self.separators, default=default)
+
+    def newline(self, level: int) -> str:
+        return '' if self.indent is None else '\n' + ' ' * (self.indent * level)
+
+    def encode(self, value: Any, level: int) -> str:
+        """Valor completo; las líneas internas se desplazan al nivel actual"""
+        text = self.encoder.encode(value)
+        if self.indent is not None and level:
+            # Las cadenas JSON nunca contienen saltos de línea literales
+            text = text.replace('\n', self.newline(level))
+        return text
+
+    def write(self, value: Any, level: int = 0):
+        if isinstance(value, dict):
+            self.write_object(value, level)
+        elif isinstance(value, (list, tuple, Iterator)):
+            self.write_array(value, level)
+        else:
+            self.f.write(self.encode(value, level))
+
+    def write_object(self, value: dict, level: int):
+        if not value:
+            self.f.write('{}')
+            return
+
+        item_separator, key_separator = self.separators
+        inner = self.newline(level + 1)
+        self.f.write('{')
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                self.f.write(item_separator)
+            if not isinstance(key, str):
+                # Igual que json: 1 -> "1", True -> "true", None -> "null"
+                key = self.encoder.encode(key)
+            self.f.write(inner + self.encoder.encode(key) + key_separator)
+            self.write(item, level + 1)
+        self.f.write(self.newline(level) + '}')
+
+    def write_array(self, items, level: int):
+        item_separator = self.separators[0]
+        inner = self.newline(level + 1)
+        empty = True
+        for item in items:
+            self.f.write(('[' if empty else item_separator) + inner)
+            if isinstance(item, Iterator):
+                self.write_array(item, level + 1)
+            else:
+                self.f.write(self.encode(item, level + 1))
+            empty = False
+        self.f.write('[]' if empty else self.newline(level) + ']')
+
+
+def iter_arrays(value: Dict, keys: Iterable[str]) -> Dict:
+    """
+    Copia superficial de `value` con los arreglos de `keys` como iteradores:
+    dump_json los consume elemento a elemento (el resto se escribe igual).
+    """
+    streamed = dict(value)
+    for key in keys:
+        if isinstance(streamed.get(key), list):
+            streamed[key] = iter(streamed[key])
+    return streamed
+
+
+def dump_json(value: Any, path: str, compact: bool = False, default: Optional[Callable] = None):
+    """
+    Escribe `value` en `path` en streaming y de forma atómica.
+    Los arreglos pueden ser generadores: se escriben conforme se producen.
+    """
+    with atomic_open(path) as f:
+        JSONStreamWriter(f, compact=compact, default=default).write(value)
@@ -0,0 +1,111 @@
+"""
+BÚSQUEDA DE VARIAS PALABRAS CLAVE EN UNA PASADA
+Todos los conjuntos de palabras clave (categorías) se compilan una vez en una
+sola expresión con forma de trie (prefijos comunes factorizados), de modo que
+cada texto se recorre una vez sin importar cuántas palabras haya. Se toma la
+palabra más larga en cada coincidencia; las palabras contenidas en ella (o que
+empiezan dentro y la rebasan) se deducen de tablas precalculadas, así que se
+reportan todas las coincidencias como con `palabra in texto`.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence
+
+# Textos distintos cuyo resultado se recuerda (celdas y nombres se repiten mucho)
+CACHE_SIZE = 65536
+
+
+def trie_pattern(words: Sequence[str]) -> str:
+    """Alternativa equivalente a `w1|w2|...` con los prefijos comunes factorizados"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Fin de palabra en este nodo: el resto es opcional (codicioso: la más larga primero)
+        if '' in node:
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    return build(trie)
+
+
+class KeywordScanner:
+    """
+    Categorías de palabras clave -> una expresión compilada.
+    Las comparaciones son sin distinguir mayúsculas (texto y palabras en minúsculas).
+    """
+
+    def __init__(self, categories: Dict[str, Sequence[str]]):
+        self.categories = {name: [word.lower() for word in words] for name, words in categories.items()}
+        words = sorted({word for words in self.categories.values() for word in words if word})
+
+        # Palabra más larga en cada coincidencia (sin solape entre coincidencias)
+        self.pattern = re.compile(trie_pattern(words)) if words else None
+
+        # Palabra encontrada -> palabras contenidas en ella (incluida ella misma)
+        self.contained = {word: frozenset(other for other in words if other in word) for word in words}
+
+        # Palabra encontrada -> palabras que pueden empezar dentro de ella y seguir
+        # después (la pasada sin solape se las salta; se comprueban aparte)
+        self.straddling = {
+            word: tuple(
+                other for other in words
+                if other not in word and any(other.startswith(word[cut:]) for cut in range(1, len(word)))
+            )
+            for word in words
+        }
+
+        self.present = lru_cache(maxsize=CACHE_SIZE)(self._present)
+
+    def _present(self, text: str) -> FrozenSet[str]:
+        """Palabras clave (de cualquier categoría) que aparecen en el texto"""
+        if self.pattern is None:
+            return frozenset()
+        text = text.lower()
+        found = set()
+        for longest in set(self.pattern.findall(text)):
+            found |= self.contained[longest]
+            for other in self.straddling[longest]:
+                if other not in found and other in text:
+                    found.add(other)
+        return frozenset(found)
+
+    def found(self, text: str, category: str) -> List[str]:
+        """Palabras de la categoría presentes en el texto, en el orden en que se declararon"""
+        present = self.present(text)
+        if not present:
+            return []
+        return [word for word in self.categories[category] if word in present]
+
+    def first(self, text: str, category: str) -> Optional[str]:
+        """Primera palabra de la categoría (en orden declarado) presente en el texto"""
+        present = self.present(text)
+        if present:
+            for word in self.categories[category]:
+                if word in present:
+                    return word
+        return None
+
+    def matches(self, text: str, category: str) -> bool:
+        return self.first(text, category) is not None
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Todas las categorías con coincidencias y sus palabras, en una sola pasada"""
+        present = self.present(text)
+        if not present:
+            return {}
+        result = {}
+        for name, words in self.categories.items():
+            hits = [word for word in words if word in present]
+            if hits:
+                result[name] = hits
+        return result
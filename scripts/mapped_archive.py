@@ -0,0 +1,139 @@
+"""
+ACCESO MAPEADO EN MEMORIA A LAS PARTES DEL .xlsx
+El .xlsx es un zip de partes XML. Aquí el archivo se mapea en memoria (mmap),
+el directorio central se lee una vez y cada parte (xl/worksheets/sheetN.xml,
+xl/sharedStrings.xml...) se descomprime en streaming directamente desde el
+mapa, por bloques y sin copiar los datos comprimidos. Las cadenas compartidas
+se guardan en una tabla compacta (UTF-8 contiguo + offsets en un array) en
+lugar de un objeto str por cadena.
+"""
+
+import io
+import mmap
+import struct
+import zipfile
+import zlib
+from array import array
+from typing import List
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+# Bytes comprimidos que se entregan al descompresor en cada paso
+CHUNK_SIZE = 64 * 1024
+
+
+class SharedStringTable:
+    """Cadenas compartidas en un solo buffer UTF-8; se decodifican al pedirlas"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array('Q')
+
+    def append(self, text: str):
+        self.data += text.encode('utf-8')
+        self.ends.append(len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, index: int) -> str:
+        start = self.ends[index - 1] if index > 0 else 0
+        return self.data[start:self.ends[index]].decode('utf-8')
+
+    def nbytes(self) -> int:
+        return len(self.data) + self.ends.itemsize * len(self.ends)
+
+
+class InflateStream(io.RawIOBase):
+    """Lectura secuencial de una parte del zip, descomprimida desde el mapa"""
+
+    def __init__(self, source: memoryview, method: int, crc: int):
+        self.source = source
+        self.position = 0
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None
+        self.expected_crc = crc
+        self.crc = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        # Soltar la vista para que el mapa pueda cerrarse
+        self.source.release()
+        super().close()
+
+    def next_block(self, size: int):
+        """Hasta `size` bytes descomprimidos; vacío al terminar la parte"""
+        if self.decompressor is None:
+            block = self.source[self.position:self.position + size]
+            self.position += len(block)
+            return block
+
+        while True:
+            if self.decompressor.unconsumed_tail:
+                block = self.decompressor.decompress(self.decompressor.unconsumed_tail, size)
+            elif self.position < len(self.source):
+                chunk = self.source[self.position:self.position + CHUNK_SIZE]
+                self.position += len(chunk)
+                block = self.decompressor.decompress(chunk, size)
+            else:
+                return self.decompressor.flush()
+            if block:
+                return block
+
+    def readinto(self, buffer) -> int:
+        block = self.next_block(len(buffer))
+        if not block:
+            if self.crc != self.expected_crc:
+                raise zipfile.BadZipFile('CRC incorrecto en una parte del .xlsx')
+            return 0
+
+        self.crc = zlib.crc32(block, self.crc)
+        buffer[:len(block)] = block
+        return len(block)
+
+
+class MappedArchive:
+    """
+    Misma interfaz que usa el lector en streaming de `zipfile.ZipFile`
+    (namelist, getinfo, open, read, close) sobre el archivo mapeado.
+    Partes cifradas o con otra compresión se delegan en zipfile.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.zip = zipfile.ZipFile(self.map)
+
+    def namelist(self) -> List[str]:
+        return self.zip.namelist()
+
+    def getinfo(self, name: str) -> zipfile.ZipInfo:
+        return self.zip.getinfo(name)
+
+    def data_range(self, info: zipfile.ZipInfo) -> memoryview:
+        """Bytes comprimidos de la parte, sin copiarlos (tras su cabecera local)"""
+        header = LOCAL_HEADER.unpack_from(self.map, info.header_offset)
+        if header[0] != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f'Cabecera local inválida: {info.filename}')
+        start = info.header_offset + LOCAL_HEADER.size + header[9] + header[10]
+        return self.view[start:start + info.compress_size]
+
+    def open(self, name: str):
+        info = self.getinfo(name)
+        if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return self.zip.open(info)
+        stream = InflateStream(self.data_range(info), info.compress_type, info.CRC)
+        return io.BufferedReader(stream, CHUNK_SIZE)
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as source:
+            return source.read()
+
+    def close(self):
+        self.zip.close()
+        self.view.release()
+        self.map.close()
+        self.file.close()
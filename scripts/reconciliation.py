@@ -0,0 +1,357 @@
+"""
+CONCILIACIÓN E INTEGRIDAD REFERENCIAL
+Carga el dataset una sola vez (excel_data.json con sus cambios pendientes o la
+salida columnar del importador quirúrgico), recorre cada entidad una sola vez
+y en esa pasada alimenta todas las reglas que la leen: campos faltantes, IDs
+duplicados, referencias huérfanas, saldos derivados y totales que deben
+cuadrar entre entidades. Las reglas se declaran como datos (también desde un
+JSON) y el resultado es un reporte legible por máquina.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dataset_store import apply_change, read_log, sidecar_path
+from excel_entity_mapper import ENTITY_SPECS
+
+# Ejemplos de incidencias que se guardan por regla
+MAX_SAMPLES = 5
+
+# Diferencia máxima (en pesos) para considerar iguales dos montos
+DEFAULT_TOLERANCE = 0.01
+
+SEVERITIES = ['info', 'warning', 'error']
+
+
+def entity_records(data: Dict, path: str) -> List[Dict]:
+    """Registros de la entidad; las anidadas van con puntos ('almacen.entradas')"""
+    value: Any = data
+    for part in path.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value if isinstance(value, list) else []
+
+
+def number(value: Any) -> float:
+    """Monto como float (vacíos y textos no numéricos cuentan 0)"""
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def matches(record: Dict, where: Optional[Dict]) -> bool:
+    return not where or all(record.get(field) == value for field, value in where.items())
+
+
+class Rule(ABC):
+    """
+    Regla sobre una o más entidades. El motor llama `visit(entidad, registro)`
+    con cada registro de las entidades en `entities` y al final `result()`.
+    """
+    kind = ''
+
+    def __init__(self, name: str, severity: str = 'error'):
+        if severity not in SEVERITIES:
+            raise ValueError(f"Severidad no soportada: {severity} (opciones: {', '.join(SEVERITIES)})")
+        self.name = name
+        self.severity = severity
+        self.entities: Tuple[str, ...] = ()
+        self.checked = 0
+        self.issues = 0
+        self.samples: List[Any] = []
+
+    def issue(self, sample: Any):
+        self.issues += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(sample)
+
+    @abstractmethod
+    def visit(self, entity: str, record: Dict):
+        """Revisa un registro de una de las entidades de la regla"""
+
+    def finish(self):
+        """Incidencias que sólo se conocen al terminar la pasada"""
+
+    def details(self) -> Dict:
+        return {}
+
+    def result(self) -> Dict:
+        self.finish()
+        return {
+            'rule': self.name,
+            'kind': self.kind,
+            'entities': list(self.entities),
+            'status': self.severity if self.issues else 'ok',
+            'checked': self.checked,
+            'issues': self.issues,
+            'samples': self.samples,
+            **self.details()
+        }
+
+
+class RequiredFields(Rule):
+    """Registros a los que les falta algún campo (ausente del registro)"""
+    kind = 'required'
+
+    def __init__(self, name: str, entity: str, fields: List[str], severity: str = 'error'):
+        super().__init__(name, severity)
+        self.entities = (entity,)
+        self.fields = fields
+
+    def visit(self, entity: str, record: Dict):
+        self.checked += 1
+        missing = [field for field in self.fields if field not in record]
+        if missing:
+            self.issue({'id': record.get('id', 'Unknown'), 'missing': missing})
+
+
+class DuplicateKeys(Rule):
+    """Claves repetidas: cada registro de más con una clave ya vista es una incidencia"""
+    kind = 'duplicates'
+
+    def __init__(self, name: str, entity: str, key: str = 'id', severity: str = 'error'):
+        super().__init__(name, severity)
+        self.entities = (entity,)
+        self.key = key
+        self.seen = set()
+
+    def visit(self, entity: str, record: Dict):
+        self.checked += 1
+        value = record.get(self.key)
+        if value in self.seen:
+            self.issue(value)
+        else:
+            self.seen.add(value)
+
+
+class OrphanReferences(Rule):
+    """Valores de `field` que no existen como `target_key` en `target` (una incidencia por valor distinto)"""
+    kind = 'orphans'
+
+    def __init__(self, name: str, entity: str, field: str, target: str, target_key: str,
+                 ignore: Iterable[Any] = (None, ''), severity: str = 'error'):
+        super().__init__(name, severity)
+        self.entities = (entity, target)
+        self.source, self.field = entity, field
+        self.target, self.target_key = target, target_key
+        self.ignore = set(ignore)
+        self.references: Dict[Any, int] = {}
+        self.keys = set()
+        self.orphan_rows = 0
+
+    def visit(self, entity: str, record: Dict):
+        # Una misma entidad puede ser origen y destino (p. ej. jerarquías)
+        if entity == self.target:
+            self.keys.add(record.get(self.target_key))
+        if entity == self.source:
+            self.checked += 1
+            value = record.get(self.field)
+            if value not in self.ignore:
+                self.references[value] = self.references.get(value, 0) + 1
+
+    def finish(self):
+        for value, rows in self.references.items():
+            if value not in self.keys:
+                self.issue(value)
+                self.orphan_rows += rows
+
+    def details(self) -> Dict:
+        return {
+            'distinct_references': len(self.references),
+            'target_keys': len(self.keys),
+            'orphan_rows': self.orphan_rows
+        }
+
+
+class BalanceCheck(Rule):
+    """El saldo `field` es igual a max(0, `total` - `paid`)"""
+    kind = 'balance'
+
+    def __init__(self, name: str, entity: str, field: str, total: str, paid: str,
+                 tolerance: float = DEFAULT_TOLERANCE, severity: str = 'error'):
+        super().__init__(name, severity)
+        self.entities = (entity,)
+        self.field, self.total, self.paid = field, total, paid
+        self.tolerance = tolerance
+        self.difference = 0.0
+
+    def visit(self, entity: str, record: Dict):
+        self.checked += 1
+        total, paid = number(record.get(self.total)), number(record.get(self.paid))
+        expected = max(0.0, total - paid)
+        actual = number(record.get(self.field))
+        if abs(actual - expected) > self.tolerance:
+            self.difference += actual - expected
+            self.issue({
+                'id': record.get('id', 'Unknown'),
+                self.total: total,
+                self.paid: paid,
+                self.field: actual,
+                'expected': expected
+            })
+
+    def details(self) -> Dict:
+        return {'difference': self.difference}
+
+
+class TotalsMatch(Rule):
+    """La suma de `left` cuadra con la de `right`; cada lado es {'entity', 'field', 'where'}"""
+    kind = 'totals'
+
+    def __init__(self, name: str, left: Dict, right: Dict,
+                 tolerance: float = DEFAULT_TOLERANCE, severity: str = 'warning'):
+        super().__init__(name, severity)
+        self.sides = [left, right]
+        self.entities = tuple(dict.fromkeys(side['entity'] for side in self.sides))
+        self.totals = [0.0, 0.0]
+        self.rows = [0, 0]
+        self.tolerance = tolerance
+
+    def visit(self, entity: str, record: Dict):
+        self.checked += 1
+        for idx, side in enumerate(self.sides):
+            if side['entity'] == entity and matches(record, side.get('where')):
+                self.totals[idx] += number(record.get(side['field']))
+                self.rows[idx] += 1
+
+    def finish(self):
+        difference = self.totals[0] - self.totals[1]
+        if abs(difference) > self.tolerance:
+            self.issue({'difference': difference})
+
+    def details(self) -> Dict:
+        return {
+            'left': {**self.sides[0], 'rows': self.rows[0], 'total': self.totals[0]},
+            'right': {**self.sides[1], 'rows': self.rows[1], 'total': self.totals[1]},
+            'difference': self.totals[0] - self.totals[1]
+        }
+
+
+class Distribution(Rule):
+    """Conteo de registros por valor de un campo (informativa, sin incidencias)"""
+    kind = 'distribution'
+
+    def __init__(self, name: str, entity: str, field: str, severity: str = 'info'):
+        super().__init__(name, severity)
+        self.entities = (entity,)
+        self.field = field
+        self.counts: Dict[Any, int] = {}
+
+    def visit(self, entity: str, record: Dict):
+        self.checked += 1
+        value = record.get(self.field)
+        self.counts[value] = self.counts.get(value, 0) + 1
+
+    def details(self) -> Dict:
+        return {'field': self.field, 'counts': {str(value): count for value, count in self.counts.items()}}
+
+
+RULE_TYPES = {rule.kind: rule for rule in (RequiredFields, DuplicateKeys, OrphanReferences,
+                                           BalanceCheck, TotalsMatch, Distribution)}
+
+# Reglas sobre excel_data.json (lo que generan los importadores para el frontend)
+DATASET_RULES: List[Dict] = [
+    {'kind': 'required', 'name': 'entradas_completas', 'entity': 'almacen.entradas',
+     'fields': ['costoUnitario', 'costoTotal', 'proveedor', 'numeroFactura', 'nombre']},
+    {'kind': 'required', 'name': 'salidas_completas', 'entity': 'almacen.salidas',
+     'fields': ['precioVenta', 'valorTotal', 'motivoSalida', 'nombre']},
+    {'kind': 'duplicates', 'name': 'ventas_ids_unicos', 'entity': 'ventas'},
+    {'kind': 'duplicates', 'name': 'entradas_ids_unicos', 'entity': 'almacen.entradas'},
+    {'kind': 'duplicates', 'name': 'salidas_ids_unicos', 'entity': 'almacen.salidas'},
+    {'kind': 'duplicates', 'name': 'ordenes_compra_ids_unicos', 'entity': 'ordenesCompra'},
+    {'kind': 'orphans', 'name': 'ventas_clientes_registrados', 'entity': 'ventas', 'field': 'cliente',
+     'target': 'clientes', 'target_key': 'nombre', 'severity': 'warning'},
+    {'kind': 'orphans', 'name': 'ventas_oc_existente', 'entity': 'ventas', 'field': 'ocRelacionada',
+     'target': 'ordenesCompra', 'target_key': 'id', 'ignore': [None, '', 'N/A'], 'severity': 'warning'},
+    {'kind': 'balance', 'name': 'adeudo_oc', 'entity': 'ordenesCompra',
+     'field': 'adeudo', 'total': 'costoTotal', 'paid': 'pagado'},
+    {'kind': 'balance', 'name': 'adeudo_ventas', 'entity': 'ventas',
+     'field': 'adeudo', 'total': 'totalVenta', 'paid': 'montoPagado'},
+    {'kind': 'totals', 'name': 'boveda_ingresos_vs_ventas_pagadas',
+     'left': {'entity': 'bancos.bovedaMonte.ingresos', 'field': 'monto'},
+     'right': {'entity': 'ventas', 'field': 'costoBoveda', 'where': {'estatus': 'Pagado'}}},
+    {'kind': 'totals', 'name': 'adeudo_clientes_vs_ventas_pendientes',
+     'left': {'entity': 'clientes', 'field': 'adeudo'},
+     'right': {'entity': 'ventas', 'field': 'adeudo', 'where': {'estadoPago': 'pendiente'}}},
+    {'kind': 'distribution', 'name': 'ventas_por_estado_pago', 'entity': 'ventas', 'field': 'estadoPago'}
+]
+
+# Reglas sobre la salida columnar del importador quirúrgico (entidades de ENTITY_SPECS)
+COLUMNAR_RULES: List[Dict] = [
+    {'kind': 'required', 'name': f'{spec.name}_requeridos', 'entity': spec.name, 'fields': spec.required}
+    for spec in ENTITY_SPECS
+] + [
+    {'kind': 'duplicates', 'name': 'productos_codigo_unico', 'entity': 'productos', 'key': 'codigo'},
+    {'kind': 'duplicates', 'name': 'clientes_codigo_unico', 'entity': 'clientes', 'key': 'codigo'},
+    {'kind': 'duplicates', 'name': 'ventas_folio_unico', 'entity': 'ventas', 'key': 'folio'},
+    {'kind': 'orphans', 'name': 'ventas_clientes_registrados', 'entity': 'ventas', 'field': 'cliente_codigo',
+     'target': 'clientes', 'target_key': 'codigo', 'severity': 'warning'},
+    {'kind': 'orphans', 'name': 'inventario_productos_registrados', 'entity': 'inventario',
+     'field': 'producto_codigo', 'target': 'productos', 'target_key': 'codigo', 'severity': 'warning'}
+]
+
+
+def build_rules(specs: List[Dict]) -> List[Rule]:
+    """Reglas a partir de su declaración ({'kind': ..., 'name': ..., parámetros})"""
+    rules = []
+    for spec in specs:
+        params = dict(spec)
+        kind = params.pop('kind')
+        if kind not in RULE_TYPES:
+            raise ValueError(f"Tipo de regla no soportado: {kind} (opciones: {', '.join(RULE_TYPES)})")
+        rules.append(RULE_TYPES[kind](**params))
+    return rules
+
+
+def load_dataset(path: str) -> Dict:
+    """excel_data.json más los cambios pendientes de su registro, sin escribir nada"""
+    snapshot = Path(path)
+    data = json.loads(snapshot.read_text(encoding='utf-8'))
+    positions = {}
+    for change in read_log(sidecar_path(snapshot, '.changes.jsonl')):
+        apply_change(data, change, positions)
+    return data
+
+
+class ReconciliationEngine:
+    """Una pasada por entidad; cada registro pasa por todas las reglas que leen esa entidad"""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+
+    def run(self, data: Dict) -> Dict:
+        readers: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            for entity in rule.entities:
+                readers.setdefault(entity, []).append(rule)
+
+        rows = {}
+        for entity, rules in readers.items():
+            records = entity_records(data, entity)
+            rows[entity] = len(records)
+            visits = [rule.visit for rule in rules]
+            for record in records:
+                for visit in visits:
+                    visit(entity, record)
+
+        results = [rule.result() for rule in self.rules]
+        summary = {status: 0 for status in ['ok'] + SEVERITIES}
+        for result in results:
+            summary[result['status']] += 1
+
+        return {
+            'generated': datetime.now().isoformat(),
+            'entities': rows,
+            'summary': summary,
+            'rules': results
+        }
+
+
+def reconcile(data: Dict, specs: List[Dict] = None) -> Dict:
+    """Reporte de conciliación del dataset con las reglas dadas (por defecto DATASET_RULES)"""
+    return ReconciliationEngine(build_rules(DATASET_RULES if specs is None else specs)).run(data)
@@ -0,0 +1,72 @@
+"""
+DETECCIÓN DE LA EXTENSIÓN REAL DE DATOS
+Calcula una sola vez por hoja la última fila con valor de cada columna, para
+que los parsers recorran exactamente la región poblada sin topes fijos.
+`max_row` incluye filas con sólo formato; aquí sólo cuentan celdas con valor.
+"""
+
+import weakref
+from typing import Dict, Iterator, Optional, Tuple
+
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+# Hoja -> (número de celdas al calcular, última fila con valor por columna)
+_extents = weakref.WeakKeyDictionary()
+
+
+def is_empty(value) -> bool:
+    return value is None or value == ''
+
+
+def column_extents(ws) -> Dict[int, int]:
+    """Última fila con valor por columna (1-based); se recalcula si la hoja cambia"""
+    if isinstance(ws, ReadOnlyWorksheet):
+        # Sin celdas en memoria: una pasada por las filas, acotada por <dimension>
+        extents = {}
+        for row in ws.iter_rows():
+            for cell in row:
+                if not is_empty(cell.value) and hasattr(cell, 'column'):
+                    extents[cell.column] = cell.row
+        return extents
+
+    cells = ws._cells
+    cached = _extents.get(ws)
+    if cached is not None and cached[0] == len(cells):
+        return cached[1]
+
+    extents = {}
+    for (row, col), cell in cells.items():
+        if not is_empty(cell._value) and row > extents.get(col, 0):
+            extents[col] = row
+
+    _extents[ws] = (len(cells), extents)
+    return extents
+
+
+def forget_extents(ws):
+    """Descarta lo calculado para la hoja (p. ej. tras escribir valores en celdas existentes)"""
+    _extents.pop(ws, None)
+
+
+def last_data_row(ws, min_col: int = 1, max_col: Optional[int] = None) -> int:
+    """Última fila con valor dentro del bloque de columnas [min_col, max_col] (0 si está vacío)"""
+    max_col = max_col or min_col
+    extents = column_extents(ws)
+    return max((extents.get(col, 0) for col in range(min_col, max_col + 1)), default=0)
+
+
+def data_rows(ws, start_row: int, min_col: int = 1, max_col: Optional[int] = None) -> range:
+    """Filas a recorrer desde `start_row` hasta la última con datos del bloque de columnas"""
+    return range(start_row, last_data_row(ws, min_col, max_col) + 1)
+
+
+def block_rows(ws, start_row: int, min_col: int = 1, max_col: Optional[int] = None) -> Iterator[Tuple[int, Tuple]]:
+    """
+    (fila, valores de las columnas 1..max_col) desde `start_row` hasta la última
+    fila con datos del bloque [min_col, max_col]; las filas vacías también se entregan
+    """
+    rows = data_rows(ws, start_row, min_col, max_col)
+    if not rows:
+        return iter(())
+    return zip(rows, ws.iter_rows(min_row=rows.start, max_row=rows.stop - 1,
+                                  max_col=max_col or min_col, values_only=True))
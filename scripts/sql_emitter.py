@@ -0,0 +1,150 @@
+"""
+EMISOR MASIVO DE SQL
+Escribe las entidades mapeadas como INSERT multi-fila por lotes o como
+bloques COPY ... FROM STDIN (texto o CSV) de PostgreSQL, con literales tipados
+"""
+
+import argparse
+import json
+import math
+import numbers
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, TextIO
+
+SQL_MODES = ['insert', 'copy-text', 'copy-csv']
+DEFAULT_BATCH_SIZE = 500
+
+# Secuencias de escape del formato de texto de COPY
+COPY_TEXT_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r'
+})
+
+
+def positive_int(text: str) -> int:
+    """Tipo de argparse para tamaños de lote: entero >= 1"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"se esperaba un entero: {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"debe ser un entero >= 1: {value}")
+    return value
+
+
+def entity_columns(records: List[Dict], exclude: Iterable[str] = ('metadata',)) -> List[str]:
+    """Orden de columnas de la entidad (primera aparición), calculado una sola vez"""
+    excluded = set(exclude)
+    columns = {}
+    for record in records:
+        for key in record:
+            if key not in excluded:
+                columns[key] = None
+    return list(columns)
+
+
+def quote_text(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def sql_literal(value: Any) -> str:
+    """Literal SQL según el tipo de Python (números sin comillas, fechas tipadas)"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (numbers.Integral, Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NULL'
+        if math.isinf(value):
+            return "'Infinity'" if value > 0 else "'-Infinity'"
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    if isinstance(value, time):
+        return f"TIME '{value.isoformat()}'"
+    if isinstance(value, (dict, list)):
+        return quote_text(json.dumps(value, ensure_ascii=False, default=str))
+    return quote_text(str(value))
+
+
+def copy_value(value: Any) -> str:
+    """Valor en el formato de texto de COPY (\\N para NULL)"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, float) and math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (numbers.Integral, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return str(value).translate(COPY_TEXT_ESCAPES)
+
+
+def csv_value(value: Any) -> str:
+    """Valor CSV para COPY: NULL sin comillas, texto siempre entre comillas"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, (numbers.Number, datetime, date, time)):
+        return copy_value(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_insert_batches(f: TextIO, table: str, columns: List[str], records: List[Dict],
+                         batch_size: int = DEFAULT_BATCH_SIZE):
+    """Un INSERT multi-fila por cada `batch_size` registros"""
+    if batch_size < 1:
+        raise ValueError(f"batch_size debe ser >= 1: {batch_size}")
+    header = f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        f.write(header)
+        f.write(',\n'.join(
+            '  (' + ', '.join(sql_literal(record.get(col)) for col in columns) + ')'
+            for record in batch
+        ))
+        f.write(';\n')
+
+
+def write_copy(f: TextIO, table: str, columns: List[str], records: List[Dict], csv: bool = False):
+    """Bloque COPY ... FROM STDIN con los datos en línea (para psql)"""
+    options = ' WITH (FORMAT csv)' if csv else ''
+    f.write(f"COPY {table} ({', '.join(columns)}) FROM STDIN{options};\n")
+
+    if csv:
+        f.writelines(','.join(csv_value(record.get(col)) for col in columns) + '\n'
+                     for record in records)
+    else:
+        f.writelines('\t'.join(copy_value(record.get(col)) for col in columns) + '\n'
+                     for record in records)
+    f.write('\\.\n')
+
+
+def write_entity(f: TextIO, table: str, records: List[Dict], mode: str = 'insert',
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+    """Escribe una entidad completa en el modo indicado"""
+    if mode not in SQL_MODES:
+        raise ValueError(f"Modo SQL no soportado: {mode} (opciones: {', '.join(SQL_MODES)})")
+
+    columns = entity_columns(records)
+    if mode == 'insert':
+        write_insert_batches(f, table, columns, records, batch_size)
+    else:
+        write_copy(f, table, columns, records, csv=(mode == 'copy-csv'))
@@ -0,0 +1,182 @@
+"""
+SESIÓN COMPARTIDA SOBRE UN LIBRO EXCEL
+Abre el .xlsx una sola vez y entrega vistas por hoja bajo demanda (valores
+cacheados, fórmulas, DataFrame y, si hace falta, el libro openpyxl), que
+quedan en memoria para el resto de la corrida. Las herramientas que corren en
+el mismo proceso obtienen la misma sesión con `open_session`.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import openpyxl
+import pandas as pd
+from openpyxl.utils.cell import get_column_letter, range_boundaries
+
+from excel_streaming import SheetSnapshot, StreamingWorkbookReader, rows_to_frame
+from header_layout import SCAN_ROWS, HeaderLayout, detect_layout
+
+
+class WorkbookSession:
+    """
+    Un archivo abierto por corrida. Las vistas de hoja salen del lector en
+    streaming; el libro openpyxl sólo se carga (una vez por modo) para quien
+    necesita celdas con estilos o escribir valores. DataFrame y encabezados
+    reutilizan la rejilla densa de la hoja si ya se leyó; si no, se arman
+    recorriendo las filas sin guardarla. Las vistas de una hoja quedan en
+    memoria hasta `release(hoja)`.
+    Los objetos devueltos son compartidos: copiarlos antes de modificarlos.
+    """
+
+    def __init__(self, excel_path: str):
+        self.excel_path = excel_path
+        self.reader = StreamingWorkbookReader(excel_path)
+        self.snapshots: Dict[str, SheetSnapshot] = {}
+        self.formula_lists: Dict[str, List[Tuple[str, str]]] = {}
+        self.frames: Dict[Tuple[str, Optional[int]], pd.DataFrame] = {}
+        # Hoja -> (primeras SCAN_ROWS filas en rejilla densa, rangos combinados)
+        self.heads: Dict[str, Tuple[List[Tuple], List[str]]] = {}
+        self.digests: Dict[str, str] = {}
+        self.workbooks: Dict[bool, openpyxl.Workbook] = {}
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return self.reader.sheetnames
+
+    def snapshot(self, sheet_name: str) -> SheetSnapshot:
+        """Valores, fórmulas y metadatos de la hoja (una pasada por su XML)"""
+        if sheet_name not in self.snapshots:
+            self.snapshots[sheet_name] = self.reader.read_sheet(sheet_name)
+        return self.snapshots[sheet_name]
+
+    def values(self, sheet_name: str) -> List[Tuple]:
+        """Valores cacheados en rejilla densa desde A1 (como `sheet.values`)"""
+        return self.snapshot(sheet_name).rows
+
+    def formulas(self, sheet_name: str) -> List[Tuple[str, str]]:
+        """(coordenada, fórmula) de la hoja; sin la hoja completa en memoria si no se pidió"""
+        if sheet_name in self.snapshots:
+            return self.snapshots[sheet_name].formulas
+        if sheet_name not in self.formula_lists:
+            self.formula_lists[sheet_name] = [
+                (f'{get_column_letter(col)}{row.index}', formula)
+                for row in self.reader.iter_rows(sheet_name)
+                for col, formula in row.formulas.items()
+            ]
+        return self.formula_lists[sheet_name]
+
+    def frame(self, sheet_name: str, header: Optional[int] = 0) -> pd.DataFrame:
+        """El mismo DataFrame que `pd.read_excel(path, sheet_name, header=header)`"""
+        key = (sheet_name, header)
+        if key not in self.frames:
+            rows = self.snapshots[sheet_name].rows if sheet_name in self.snapshots else self.stream_rows(sheet_name)
+            self.frames[key] = rows_to_frame(rows, header=header)
+        return self.frames[key]
+
+    def layout(self, sheet_name: str) -> HeaderLayout:
+        """Fila de encabezados y encabezados compuestos (con los rangos combinados de la hoja)"""
+        if sheet_name in self.snapshots:
+            snapshot = self.snapshots[sheet_name]
+            return detect_layout(snapshot.rows[:SCAN_ROWS], snapshot.merged_cells)
+        if sheet_name not in self.heads:
+            # Los rangos combinados están después de los datos: hace falta toda la pasada
+            for _ in self.stream_rows(sheet_name):
+                pass
+        return detect_layout(*self.heads[sheet_name])
+
+    def stream_rows(self, sheet_name: str) -> Iterator[Tuple]:
+        """
+        Filas desde la 1 sin la hoja en memoria (las vacías como tuplas vacías,
+        sin rellenar a la derecha). Al terminar deja en `heads` la ventana de
+        encabezados igual a la de la rejilla densa de `snapshot`.
+        """
+        extras = SheetSnapshot(name=sheet_name)
+        head: List[Tuple[int, Dict]] = []
+        max_row = max_column = 0
+        next_row = 1
+        for row in self.reader.iter_rows(sheet_name, extras=extras):
+            if not row.values:
+                continue
+            while next_row < row.index:
+                yield ()
+                next_row += 1
+            if row.index <= SCAN_ROWS:
+                head.append((row.index, row.values))
+            max_row = row.index
+            max_column = max(max_column, max(row.values))
+            yield tuple(row.values.get(col) for col in range(1, max(row.values) + 1))
+            next_row += 1
+
+        # Como en read_sheet: los rangos combinados cuentan en las dimensiones
+        for merged in extras.merged_cells:
+            _, _, max_col, merged_max_row = range_boundaries(merged)
+            max_row = max(max_row, merged_max_row)
+            max_column = max(max_column, max_col)
+
+        window = [(None,) * max_column] * min(max_row, SCAN_ROWS)
+        for row_idx, values in head:
+            window[row_idx - 1] = tuple(values.get(col) for col in range(1, max_column + 1))
+        self.heads[sheet_name] = (window, extras.merged_cells)
+
+    def first_row(self, sheet_name: str) -> Tuple:
+        """Valores de la fila 1 (los encabezados de `frame`) sin leer la hoja entera"""
+        if sheet_name in self.snapshots:
+            rows = self.snapshots[sheet_name].rows
+            return rows[0] if rows else ()
+        for row in self.reader.iter_rows(sheet_name):
+            if row.index > 1 or not row.values:
+                break
+            return tuple(row.values.get(col) for col in range(1, max(row.values) + 1))
+        return ()
+
+    def sheet_digest(self, sheet_name: str) -> str:
+        """Hash del contenido de la hoja (clave de las cachés en disco)"""
+        if sheet_name not in self.digests:
+            self.digests[sheet_name] = self.reader.sheet_digest(sheet_name)
+        return self.digests[sheet_name]
+
+    def workbook(self, data_only: bool = True) -> openpyxl.Workbook:
+        """Libro openpyxl completo: valores cacheados (data_only) o texto de las fórmulas"""
+        if data_only not in self.workbooks:
+            self.workbooks[data_only] = openpyxl.load_workbook(self.excel_path, data_only=data_only)
+        return self.workbooks[data_only]
+
+    def release(self, sheet_name: str):
+        """
+        Suelta la rejilla, las fórmulas y los DataFrames de la hoja al terminar
+        con ella (se vuelven a leer si otra fase los pide). La ventana de
+        encabezados y el hash se conservan: son chicos.
+        """
+        self.snapshots.pop(sheet_name, None)
+        self.formula_lists.pop(sheet_name, None)
+        for key in [key for key in self.frames if key[0] == sheet_name]:
+            del self.frames[key]
+
+    def close(self):
+        self.reader.close()
+        self.snapshots.clear()
+        self.formula_lists.clear()
+        self.frames.clear()
+        self.heads.clear()
+        self.workbooks.clear()
+
+
+# Sesiones abiertas en este proceso: ruta -> (tamaño y fecha del archivo, sesión)
+_sessions: Dict[Path, Tuple[Tuple[int, int], WorkbookSession]] = {}
+
+
+def open_session(excel_path: str) -> WorkbookSession:
+    """Sesión compartida del proceso para el archivo (se reabre si cambió en disco)"""
+    path = Path(excel_path).resolve()
+    stat = path.stat()
+    stamp = (stat.st_size, stat.st_mtime_ns)
+
+    cached = _sessions.get(path)
+    if cached is not None:
+        if cached[0] == stamp:
+            return cached[1]
+        cached[1].close()
+
+    session = WorkbookSession(excel_path)
+    _sessions[path] = (stamp, session)
+    return session